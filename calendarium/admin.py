@@ -2,6 +2,7 @@
 from django.contrib import admin
 
 from calendarium.models import (
+    Calendar,
     Event,
     EventCategory,
     EventRelation,
@@ -10,18 +11,25 @@ from calendarium.models import (
 )
 
 
+class CalendarAdmin(admin.ModelAdmin):
+    """Custom admin for the ``Calendar`` model."""
+    model = Calendar
+    list_display = ('name', 'slug', )
+    prepopulated_fields = {'slug': ('name', )}
+
+
 class EventAdmin(admin.ModelAdmin):
     """Custom admin for the ``Event`` model."""
     model = Event
     fields = (
-        'title', 'start', 'end', 'description', 'category', 'created_by',
-        'rule', 'end_recurring_period', )
+        'title', 'start', 'end', 'description', 'calendar', 'category',
+        'created_by', 'rule', 'end_recurring_period', 'exdates', )
     list_display = (
-        'title', 'start', 'end', 'category', 'created_by', 'rule',
-        'end_recurring_period', )
+        'title', 'start', 'end', 'calendar', 'category', 'created_by', 'rule',
+        'end_recurring_period', 'next_occurrence_start', )
     search_fields = ('title', 'description', )
     date_hierarchy = 'start'
-    list_filter = ('category', )
+    list_filter = ('calendar', 'category', )
 
 
 class EventCategoryAdmin(admin.ModelAdmin):
@@ -31,6 +39,7 @@ class EventCategoryAdmin(admin.ModelAdmin):
     list_editable = ('color', )
 
 
+admin.site.register(Calendar, CalendarAdmin)
 admin.site.register(Event, EventAdmin)
 admin.site.register(EventCategory, EventCategoryAdmin)
 admin.site.register(EventRelation)
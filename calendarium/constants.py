@@ -18,6 +18,13 @@ FREQUENCY_CHOICES = (
 )
 
 
+# format of the exception dates of an event, as used by iCalendar's EXDATE
+EXDATE_FORMAT = '%Y%m%dT%H%M%SZ'
+
+# format of the UTC start in the pagination cursors of upcoming occurrences
+CURSOR_FORMAT = '%Y%m%dT%H%M%S%f'
+
+
 OCCURRENCE_DECISIONS = {
     'all': 'all',
     'following': 'following',
@@ -0,0 +1,301 @@
+"""
+Expansion of recurring events inside of the database.
+
+Events without a rule, that are shorter than a day, and events with a simple
+rule, i.e. a DAILY, WEEKLY or MONTHLY rule without any other parameter than
+``interval``, are expanded by a recursive common table expression (CTE) on
+SQLite and PostgreSQL. This allows to aggregate occurrences over large periods
+without loading a single event.
+
+All other events, e.g. events with BY* rules, and all events on other database
+backends fall back to the expansion in Python via ``Event.get_occurrences``.
+
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.functions import ExtractDay
+from django.utils.timezone import utc
+
+from .constants import FREQUENCIES
+from .utils import parse_exdates
+
+
+SQL_VENDORS = ('sqlite', 'postgresql')
+
+# the step of each frequency as tuple of days and months
+SQL_STEPS = {
+    FREQUENCIES['DAILY']: (1, 0),
+    FREQUENCIES['WEEKLY']: (7, 0),
+    FREQUENCIES['MONTHLY']: (0, 1),
+}
+
+
+def get_sql_step(rule):
+    """
+    Returns the step between two occurrences of the given ``Rule`` as tuple of
+    days and months or ``None``, if it can't be expanded in the database.
+
+    """
+    step = SQL_STEPS.get(rule.frequency)
+    params = rule.get_params()
+    if step is None or set(params) - set(['interval']):
+        return None
+    interval = int(params.get('interval', 1))
+    return step[0] * interval, step[1] * interval
+
+
+def _add(vendor, date, days, months):
+    if vendor == 'sqlite':
+        return (
+            "datetime({0}, '+' || ({1}) || ' days',"
+            " '+' || ({2}) || ' months')".format(date, days, months))
+    return (
+        "({0} + ({1}) * INTERVAL '1 day'"
+        " + ({2}) * INTERVAL '1 month')".format(date, days, months))
+
+
+def _shift(vendor, date, start, end):
+    if vendor == 'sqlite':
+        return (
+            'datetime(julianday({0}) + julianday({1})'
+            ' - julianday({2}))'.format(date, end, start))
+    return '({0} + ({1} - {2}))'.format(date, end, start)
+
+
+def _datetime(vendor, date):
+    if vendor == 'sqlite':
+        return 'datetime({0})'.format(date)
+    return date
+
+
+def _timestamp(vendor, value):
+    if vendor == 'sqlite':
+        return 'datetime({0})'.format(value)
+    return 'CAST({0} AS TIMESTAMP WITH TIME ZONE)'.format(value)
+
+
+def _steps_before(vendor, date, end, step_days):
+    if vendor == 'sqlite':
+        return (
+            'MAX(0, CAST((julianday({0}) - julianday({1})) / {2}'
+            ' AS INTEGER))'.format(date, end, step_days))
+    return (
+        'GREATEST(0, CAST(FLOOR(EXTRACT(EPOCH FROM ({0} - {1})) / 86400'
+        ' / {2}) AS INTEGER))'.format(date, end, step_days))
+
+
+def split_events(events):
+    """
+    Splits a queryset of events into the ones, that can be expanded in the
+    database, and the ones, that need to be expanded in Python.
+
+    :returns: A tuple of the SQL queryset, the Python queryset and a dict
+        mapping the pks of the simple rules to their steps.
+
+    """
+    rule_model = events.model._meta.get_field('rule').related_model
+    steps = {}
+    for rule in rule_model.objects.using(events.db).filter(
+            pk__in=events.exclude(rule=None).values('rule')):
+        step = get_sql_step(rule)
+        if step:
+            steps[rule.pk] = step
+    if connections[events.db].vendor not in SQL_VENDORS:
+        return events.none(), events, steps
+    # rrule skips months without the day of the start, which simple month
+    # arithmetic doesn't, so those series are left to Python
+    monthly_rules = [pk for pk, step in steps.items() if step[1]]
+    # events without a rule occur once on each day they span, so only the
+    # ones shorter than a day are a single row
+    sql_events = events.annotate(
+        utc_start_day=ExtractDay('start', tzinfo=utc)).filter(
+            Q(rule__isnull=True, end__lt=F('start') + timedelta(days=1))
+            | Q(rule__in=list(steps))).exclude(
+                rule__in=monthly_rules, utc_start_day__gt=28)
+    python_events = events.exclude(
+        pk__in=sql_events.values_list('pk', flat=True))
+    return sql_events, python_events, steps
+
+
+def get_expansion_sql(events, start, end, steps, columns=None):
+    """
+    Returns the SQL and its params to expand the given events in the period.
+
+    The resulting rows contain the expanded occurrences as ``event_id``,
+    ``start`` and ``finish`` columns, joined with the ``Event`` table as
+    ``e``. Persistent occurrences replace the generated ones with the same
+    original start and cancelled ones as well as exception dates are left
+    out.
+
+    :param events: A queryset of events with simple rules or without rule.
+    :param steps: A dict mapping the pks of the simple rules to their steps.
+    :param columns: A list of SQL expressions to select instead of the
+        occurrence columns.
+
+    """
+    connection = connections[events.db]
+    vendor = connection.vendor
+    qn = connection.ops.quote_name
+    event_model = events.model
+    occurrence_model = event_model._meta.get_field(
+        'occurrences').related_model
+    table = qn(event_model._meta.db_table)
+    occurrence_table = qn(occurrence_model._meta.db_table)
+    ev = dict(
+        (name, 'e.{0}'.format(qn(event_model._meta.get_field(name).column)))
+        for name in ['id', 'start', 'end', 'rule', 'end_recurring_period'])
+    occ = dict(
+        (name, 'p.{0}'.format(qn(
+            occurrence_model._meta.get_field(name).column)))
+        for name in ['event', 'start', 'end', 'original_start', 'cancelled'])
+    adapt = connection.ops.adapt_datetimefield_value
+    params = []
+
+    events_sql, events_params = events.values_list(
+        'pk', flat=True).query.get_compiler(connection=connection).as_sql()
+    params.extend(events_params)
+
+    rule_steps = []
+    for rule_pk, step in steps.items():
+        rule_steps.append(
+            'SELECT CAST(%s AS INTEGER), CAST(%s AS INTEGER),'
+            ' CAST(%s AS INTEGER)')
+        params.extend([rule_pk, step[0], step[1]])
+    if not rule_steps:
+        rule_steps.append(
+            'SELECT CAST(NULL AS INTEGER), CAST(NULL AS INTEGER),'
+            ' CAST(NULL AS INTEGER) WHERE 1 = 0')
+
+    exdates = []
+    for event_pk, value in events.exclude(exdates=None).exclude(
+            exdates='').values_list('pk', 'exdates'):
+        for exdate in parse_exdates(value):
+            exdates.append('SELECT CAST(%s AS INTEGER), {0}'.format(
+                _timestamp(vendor, '%s')))
+            params.extend([event_pk, adapt(exdate)])
+    if not exdates:
+        exdates.append('SELECT CAST(NULL AS INTEGER), {0} WHERE 1 = 0'.format(
+            _timestamp(vendor, 'NULL')))
+
+    start_param = _datetime(vendor, '%s')
+    end_param = _datetime(vendor, '%s')
+    end_recurring_period = _datetime(vendor, ev['end_recurring_period'])
+    occ_start = _add(
+        vendor, ev['start'], 'o.n * COALESCE(r.days, 0)',
+        'o.n * COALESCE(r.months, 0)')
+    next_start = _add(
+        vendor, ev['start'], '(o.n + 1) * r.days', '(o.n + 1) * r.months')
+    first_step = _steps_before(
+        vendor, start_param, ev['end'], '(r.days + 31 * r.months)')
+    # the params of the first step, the recursion, the cancelled filter and
+    # the final period filter
+    params.extend([adapt(start), adapt(end), False, adapt(end), adapt(start)])
+
+    sql = '''
+        WITH RECURSIVE base(id) AS (
+            {events_sql}
+        ), rule_steps(rule_id, days, months) AS (
+            {rule_steps}
+        ), exdates(event_id, exdate) AS (
+            {exdates}
+        ), occ(event_id, n) AS (
+            SELECT {ev[id]}, CASE WHEN r.rule_id IS NULL THEN 0
+                ELSE {first_step} END
+            FROM {table} e
+            LEFT JOIN rule_steps r ON r.rule_id = {ev[rule]}
+            WHERE {ev[id]} IN (SELECT id FROM base)
+            UNION ALL
+            SELECT o.event_id, o.n + 1
+            FROM occ o
+            JOIN {table} e ON {ev[id]} = o.event_id
+            JOIN rule_steps r ON r.rule_id = {ev[rule]}
+            WHERE {next_start} < {end_param}
+            AND ({ev[end_recurring_period]} IS NULL
+                 OR {next_start} <= {end_recurring_period})
+        ), expanded(event_id, start, finish) AS (
+            SELECT o.event_id, {occ_start},
+                {occ_finish}
+            FROM occ o
+            JOIN {table} e ON {ev[id]} = o.event_id
+            LEFT JOIN rule_steps r ON r.rule_id = {ev[rule]}
+            WHERE (r.rule_id IS NULL OR {ev[end_recurring_period]} IS NULL
+                   OR {occ_start} <= {end_recurring_period})
+            AND NOT EXISTS (
+                SELECT 1 FROM {occurrence_table} p
+                WHERE {occ[event]} = o.event_id
+                AND {original_start} = {occ_start})
+            AND NOT EXISTS (
+                SELECT 1 FROM exdates d
+                WHERE d.event_id = o.event_id AND d.exdate = {occ_start})
+            UNION ALL
+            SELECT {occ[event]}, {p_start}, {p_end}
+            FROM {occurrence_table} p
+            WHERE {occ[event]} IN (SELECT id FROM base)
+            AND {occ[cancelled]} = %s
+        )
+        SELECT {columns}
+        FROM expanded x
+        JOIN {table} e ON {ev[id]} = x.event_id
+        WHERE x.start < {end_param} AND x.finish >= {start_param}
+    '''.format(
+        events_sql=events_sql,
+        rule_steps=' UNION ALL '.join(rule_steps),
+        exdates=' UNION ALL '.join(exdates),
+        table=table,
+        occurrence_table=occurrence_table,
+        ev=ev,
+        occ=occ,
+        first_step=first_step,
+        next_start=next_start,
+        end_param=end_param,
+        start_param=start_param,
+        end_recurring_period=end_recurring_period,
+        occ_start=occ_start,
+        occ_finish=_shift(vendor, occ_start, ev['start'], ev['end']),
+        original_start=_datetime(vendor, occ['original_start']),
+        p_start=_datetime(vendor, occ['start']),
+        p_end=_datetime(vendor, occ['end']),
+        columns=', '.join(columns or ['x.event_id', 'x.start', 'x.finish']),
+    )
+    return sql, params
+
+
+def count_occurrences(events, start, end, group_by=None):
+    """
+    Returns the amount of occurrences of the given events in the period.
+
+    :param events: A queryset of ``Event`` instances.
+    :param group_by: Optional name of an ``Event`` field, e.g. ``'category'``.
+        If given, a dict mapping the field's values to their amounts is
+        returned instead of the total amount.
+
+    """
+    attname = None
+    if group_by:
+        attname = events.model._meta.get_field(group_by).attname
+    counts = defaultdict(int)
+    sql_events, python_events, steps = split_events(events)
+    if sql_events.exists():
+        connection = connections[events.db]
+        columns = ['COUNT(*)']
+        if attname:
+            column = 'e.{0}'.format(connection.ops.quote_name(
+                events.model._meta.get_field(group_by).column))
+            columns = [column, 'COUNT(*)']
+        sql, params = get_expansion_sql(
+            sql_events, start, end, steps, columns=columns)
+        if attname:
+            sql = '{0} GROUP BY {1}'.format(sql, column)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for row in cursor.fetchall():
+                counts[row[0] if attname else None] += row[-1]
+    for event in python_events:
+        amount = len(list(event.get_occurrences(start, end, using=events.db)))
+        counts[getattr(event, attname) if attname else None] += amount
+    if attname:
+        return dict(counts)
+    return counts[None]
@@ -1,11 +1,14 @@
 """Forms for the ``calendarium`` app."""
 from django import forms
 from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
 from django.forms.models import model_to_dict
 from django.utils.timezone import datetime, timedelta
 
 from .constants import OCCURRENCE_DECISION_CHOICESS, OCCURRENCE_DECISIONS
 from .models import Event, Occurrence
+from .utils import format_exdates, pin_reads_to_primary
 
 
 class OccurrenceForm(forms.ModelForm):
@@ -36,56 +39,77 @@ class OccurrenceForm(forms.ModelForm):
         model = Occurrence
         exclude = []
 
+    def get_changes(self):
+        """Returns the changed fields mapped to their new values."""
+        return dict(
+            (key, value) for key, value in iter(self.cleaned_data.items())
+            if value != self.initial.get(key) and self.initial.get(key))
+
+    def get_occurrence_updates(self, changes):
+        """
+        Returns the kwargs to apply the changes to persistent occurrences with
+        one ``UPDATE``.
+
+        Since we can't just set a new datetime, datetime fields are shifted by
+        the delta of the change on the occurrence form instance.
+
+        """
+        updates = {}
+        for field_name in [field.name for field in Occurrence._meta.fields]:
+            value = changes.get(field_name)
+            # the event is never changed by the form, only re-assigned on
+            # splitting the series
+            if not value or field_name in ['id', 'event']:
+                continue
+            if type(value) != datetime:
+                updates[field_name] = value
+            else:
+                delta = value - self.initial.get(field_name)
+                updates[field_name] = F(field_name) + delta
+        return updates
+
     def save(self):
+        # writes always go to the primary database, even if the instance was
+        # read from a replica
+        using = DEFAULT_DB_ALIAS
+        with transaction.atomic(using=using):
+            self._save(using)
+        pin_reads_to_primary()
+
+    def _save(self, using):
         cleaned_data = self.cleaned_data
         if cleaned_data['decision'] == OCCURRENCE_DECISIONS['all']:
-            changes = dict(
-                (key, value) for key, value in iter(cleaned_data.items())
-                if value != self.initial.get(key) and self.initial.get(key))
+            changes = self.get_changes()
             event = self.instance.event
+
+            # apply the changes to all persistent occurrences at once
+            updates = self.get_occurrence_updates(changes)
+            if updates:
+                Occurrence.objects.using(using).filter(event=event).update(
+                    **updates)
+
             # for each field on the event, check for new data in cleaned_data
             for field_name in [field.name for field in event._meta.fields]:
                 value = changes.get(field_name)
                 if value:
                     setattr(event, field_name, value)
-            event.save()
-
-            # repeat for persistent occurrences
-            for occ in event.occurrences.all():
-                for field_name in [field.name for field in occ._meta.fields]:
-                    value = changes.get(field_name)
-                    if value:
-                        # since we can't just set a new datetime, we have to
-                        # adjust the datetime fields according to the changes
-                        # on the occurrence form instance
-                        if type(value) != datetime:
-                            setattr(occ, field_name, value)
-                        else:
-                            initial_time = self.initial.get(field_name)
-                            occ_time = getattr(occ, field_name)
-                            delta = value - initial_time
-                            new_time = occ_time + delta
-                            setattr(occ, field_name, new_time)
-                occ.save()
-
-            # get everything from initial and compare to cleaned_data to
-            # retrieve what has been changed
-            # apply those changes to the persistent occurrences (and the main
-            # event)
+            event.save(using=using)
         elif cleaned_data['decision'] == OCCURRENCE_DECISIONS['this one']:
-            self.instance.save()
+            self.instance.save(using=using)
         elif cleaned_data['decision'] == OCCURRENCE_DECISIONS['following']:
-            # get the changes
-            changes = dict(
-                (key, value) for key, value in iter(cleaned_data.items())
-                if value != self.initial.get(key) and self.initial.get(key))
+            changes = self.get_changes()
 
             # change the old event
             old_event = self.instance.event
+            old_event_pk = old_event.pk
+            following = Occurrence.objects.using(using).filter(
+                event=old_event,
+                original_start__gte=self.instance.original_start)
             end_recurring_period = self.instance.event.end_recurring_period
+            exdates = old_event.get_exdates()
             old_event.end_recurring_period = self.instance.start - timedelta(
                 days=1)
-            old_event.save()
+            old_event.save(using=using)
 
             # the instance occurrence holds the info for the new event, that we
             # use to update the old event's fields
@@ -96,11 +120,31 @@ class OccurrenceForm(forms.ModelForm):
             for field_name in [field.name for field in new_event._meta.fields]:
                 if (field_name == 'created_by' and
                         event_kwargs.get('created_by')):
-                    value = User.objects.get(pk=event_kwargs.get(field_name))
+                    value = User.objects.using(using).get(
+                        pk=event_kwargs.get(field_name))
                 elif field_name in ['rule', 'category']:
                     continue
                 else:
                     value = event_kwargs.get(field_name)
                 if value:
                     setattr(new_event, field_name, value)
-            new_event.save()
+
+            # the new series starts at the new start of this occurrence, so the
+            # original datetimes of the following occurrences are shifted to
+            # keep them replacing the generated ones
+            start_delta = self.instance.start - self.instance.original_start
+            end_delta = self.instance.end - self.instance.original_end
+            updates = self.get_occurrence_updates(changes)
+            updates.update({
+                'original_start': F('original_start') + start_delta,
+                'original_end': F('original_end') + end_delta,
+            })
+            new_event.exdates = format_exdates([
+                exdate + start_delta for exdate in exdates
+                if exdate >= self.instance.original_start])
+            new_event.save(using=using)
+            following.update(event=new_event, **updates)
+            # the stored next occurrences might be one of the re-assigned ones
+            new_event.update_next_occurrence_start(using=using)
+            Event.objects.using(using).get(
+                pk=old_event_pk).update_next_occurrence_start(using=using)
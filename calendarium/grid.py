@@ -0,0 +1,231 @@
+"""
+Assignment of occurrences to the days of the calendar views.
+
+The ``OccurrenceGrid`` buckets the occurrences of a period by the ordinals of
+the days they cover in one pass, so that building a month, week or day is
+linear in the amount of occurrences instead of filtering all occurrences for
+every single day.
+
+"""
+import calendar
+from functools import lru_cache
+
+from django.utils import translation
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+from django.utils.timezone import timedelta, utc
+from django.utils.translation import ugettext
+
+from .settings import SHIFT_WEEKSTART
+from .utils import format_url, now
+
+
+def get_firstweekday():
+    """Returns the first day of the week (0 is Monday) for the grids."""
+    return SHIFT_WEEKSTART % 7
+
+
+@lru_cache(maxsize=1024)
+def get_month_skeleton(year, month, firstweekday=None):
+    """
+    Returns the weeks of a month as tuple of tuples of seven day numbers,
+    where days outside of the month are 0.
+
+    The skeletons are cached and immutable, so they can be shared by all
+    threads. Unlike ``calendar.setfirstweekday`` this never touches the global
+    state of the ``calendar`` module.
+
+    """
+    if firstweekday is None:
+        firstweekday = get_firstweekday()
+    return tuple(
+        tuple(week) for week in calendar.Calendar(
+            firstweekday).monthdayscalendar(year, month))
+
+
+@lru_cache(maxsize=128)
+def _get_weekday_headers(language, firstweekday):
+    with translation.override(language):
+        return tuple(
+            ugettext(calendar.day_name[(firstweekday + day) % 7])
+            for day in range(7))
+
+
+def get_weekday_headers(firstweekday=None):
+    """
+    Returns the translated names of the weekdays in the order of the grid,
+    cached for each language and first day of the week.
+
+    """
+    if firstweekday is None:
+        firstweekday = get_firstweekday()
+    return _get_weekday_headers(translation.get_language(), firstweekday)
+
+
+class GridCell(list):
+    """
+    The occurrences of a day, that are shown in a cell of a grid.
+
+    :more: The amount of further occurrences, that don't fit into the cell.
+    :more_url: The URL, that renders the further occurrences.
+
+    """
+    more = 0
+    more_url = None
+
+
+class OccurrenceGrid(object):
+    """
+    The occurrences of a period, bucketed by the days they cover.
+
+    Occurrences, that last several days, are added to each of their days.
+    Events without a rule already generate one occurrence for each day they
+    last, so those are only added to the day they start.
+
+    :param occurrences: The occurrences, e.g. of ``get_occurrences``.
+    :param start: The first day of the grid.
+    :param end: The end of the grid. Days from ``end`` on are left out.
+    :param tz: The timezone, that defines the days. Defaults to UTC, like the
+        dates of the calendar views.
+
+    """
+    def __init__(self, occurrences, start, end, tz=utc):
+        self.tz = tz
+        self.today = now().astimezone(tz).date()
+        self.buckets = {}
+        first_ordinal = self.get_ordinal(start)
+        last_ordinal = self.get_ordinal(end - timedelta(microseconds=1))
+        for occ in occurrences:
+            start_ordinal = self.get_ordinal(occ.start)
+            end_ordinal = start_ordinal
+            if occ.end > occ.start and occ.event.rule_id is not None:
+                # an occurrence, that ends at midnight, doesn't cover that day
+                end_ordinal = self.get_ordinal(
+                    occ.end - timedelta(microseconds=1))
+            for ordinal in range(
+                    max(start_ordinal, first_ordinal),
+                    min(end_ordinal, last_ordinal) + 1):
+                self.buckets.setdefault(ordinal, []).append(occ)
+
+    def get_ordinal(self, date):
+        if hasattr(date, 'astimezone'):
+            date = date.astimezone(self.tz).date()
+        return date.toordinal()
+
+    def get_occurrences(self, date):
+        """Returns the list of occurrences on the given date or datetime."""
+        return self.buckets.get(self.get_ordinal(date), [])
+
+    def get_cell(self, date, limit=0):
+        """
+        Returns the ``GridCell`` of the given date with at most ``limit``
+        occurrences. If ``limit`` is ``0``, all occurrences are shown.
+
+        """
+        occurrences = self.get_occurrences(date)
+        if not limit or len(occurrences) <= limit:
+            return GridCell(occurrences)
+        cell = GridCell(occurrences[:limit])
+        cell.more = len(occurrences) - limit
+        return cell
+
+    def is_today(self, date):
+        return self.get_ordinal(date) == self.today.toordinal()
+
+
+def get_grid_categories(occurrences):
+    """
+    Returns the distinct categories of the given occurrences ordered by their
+    pk, e.g. to define one CSS class for each of them.
+
+    """
+    categories = {}
+    for occurrence in occurrences:
+        category = occurrence.event.category
+        if category:
+            categories[category.pk] = category
+    return [categories[pk] for pk in sorted(categories)]
+
+
+def render_month_grid(month, date, weekdays, categories, calendar=None):
+    """
+    Returns the same HTML as ``partials/calendar_month_grid.html``, but
+    without the overhead of the template engine.
+
+    :param month: The weeks of ``MonthView``.
+    :param date: A date of the month.
+    :param weekdays: The headers of the weekdays.
+    :param categories: The categories to define CSS classes for.
+    :param calendar: Optional ``Calendar`` to scope the links by.
+
+    """
+    scope = {'calendar': calendar.slug} if calendar else {}
+    html = []
+    if categories:
+        html.append('<style>')
+        for category in categories:
+            html.append(
+                '.calendarium-category-{0}{{background-color:#{1}}}'.format(
+                    category.pk, escape(category.color)))
+        html.append('</style>')
+    html.append('<table class="table" id="calendar-month"><tr><th></th>')
+    for weekday in weekdays:
+        html.append('<th>{0}</th>'.format(escape(weekday)))
+    html.append('</tr>')
+    view = escape(ugettext('View'))
+    for week in month:
+        if not week:
+            continue
+        first_day = max(week[0][0], 1)
+        html.append(
+            '<tr><td class="calendarium-week-link"><a href="{0}">{1}</a></td>'
+            .format(format_url(
+                'calendar_week',
+                year=date.replace(day=first_day).isocalendar()[0],
+                week=date.replace(day=first_day).isocalendar()[1],
+                **scope), view))
+        for day, occurrences, current in week:
+            if day == 0:
+                css_class = 'calendarium-empty'
+            elif current:
+                css_class = 'calendarium-current'
+            else:
+                css_class = 'calendarium-day'
+            html.append(
+                '<td class="{0}"><div class="calendarium-relative">'.format(
+                    css_class))
+            if day != 0:
+                html.append(
+                    '<a class="calendarium-date" href="{0}">{1}</a>'.format(
+                        format_url(
+                            'calendar_day', year=date.year, month=date.month,
+                            day=day, **scope), day))
+                for occurrence in occurrences:
+                    html.append(render_occurrence(occurrence, calendar))
+                if getattr(occurrences, 'more', 0):
+                    html.append(
+                        '<a class="calendarium-more" href="{0}">+{1} {2}</a>'
+                        .format(escape(occurrences.more_url),
+                                occurrences.more, escape(ugettext('more'))))
+            html.append('</div></td>')
+        html.append('</tr>')
+    html.append('</table>')
+    return mark_safe(''.join(html))
+
+
+def render_occurrence(occurrence, calendar=None):
+    """Returns the HTML of an occurrence in a cell of the month grid."""
+    scope = {'calendar': calendar.slug} if calendar else {}
+    category_id = occurrence.event.category_id
+    title = str(occurrence)
+    return (
+        '<p class="alert{0}"><a title="{1}" href="{2}">{3}</a></p>'.format(
+            ' calendarium-category-{0}'.format(category_id)
+            if category_id else '',
+            escape(title),
+            format_url(
+                'calendar_occurrence_detail', pk=occurrence.event_id,
+                year=occurrence.start.year, month=occurrence.start.month,
+                day=occurrence.start.day, **scope),
+            escape(Truncator(title).chars(22))))
@@ -0,0 +1,290 @@
+"""
+Reading and writing of iCalendar (RFC 5545) files.
+
+Only what's needed to map VEVENTs to events is supported. Files are read and
+written as a stream of lines, so that even huge calendars never have to be
+held in memory at once.
+
+"""
+import re
+
+from django.utils import timezone
+from django.utils.timezone import timedelta
+
+try:
+    import pytz
+except ImportError:  # pragma: no cover
+    pytz = None
+
+from .constants import FREQUENCIES
+
+
+DURATION_RE = re.compile(
+    r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$')
+
+# RRULE parts mapped to the keyword arguments of ``dateutil.rrule.rrule``
+RRULE_PARAMS = {
+    'INTERVAL': 'interval',
+    'COUNT': 'count',
+    'BYMONTH': 'bymonth',
+    'BYMONTHDAY': 'bymonthday',
+    'BYYEARDAY': 'byyearday',
+    'BYWEEKNO': 'byweekno',
+    'BYSETPOS': 'bysetpos',
+    'BYHOUR': 'byhour',
+    'BYMINUTE': 'byminute',
+    'BYSECOND': 'bysecond',
+}
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+UTC_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+def unfold(lines):
+    """Yields the logical lines of the given physical lines."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            current = (current or '') + line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line):
+    """
+    Returns the name, the parameters and the value of a content line.
+
+    Parameter values may be quoted, so they may contain ``:`` and ``;``.
+
+    """
+    params = {}
+    index = 0
+    length = len(line)
+    while index < length and line[index] not in ';:':
+        index += 1
+    name = line[:index].upper()
+    while index < length and line[index] == ';':
+        start = index + 1
+        index = line.index('=', start)
+        key = line[start:index].upper()
+        index += 1
+        if line[index:index + 1] == '"':
+            end = line.index('"', index + 1)
+            value = line[index + 1:end]
+            index = end + 1
+        else:
+            end = index
+            while end < length and line[end] not in ';:':
+                end += 1
+            value = line[index:end]
+            index = end
+        params[key] = value
+    return name, params, line[index + 1:]
+
+
+def iter_events(lines):
+    """
+    Yields the properties of each VEVENT as dict, that maps property names to
+    lists of ``(params, value)`` tuples. Nested components, e.g. VALARMs, are
+    skipped.
+
+    """
+    properties = None
+    depth = 0
+    for line in unfold(lines):
+        if not line:
+            continue
+        name, params, value = parse_line(line)
+        if name == 'BEGIN':
+            if properties is None and value.upper() == 'VEVENT':
+                properties = {}
+            elif properties is not None:
+                depth += 1
+        elif name == 'END' and properties is not None:
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT':
+                yield properties
+                properties = None
+        elif properties is not None and not depth:
+            properties.setdefault(name, []).append((params, value))
+
+
+def get_value(properties, name, default=None):
+    """Returns the params and the value of the first property of a name."""
+    values = properties.get(name)
+    if not values:
+        return {}, default
+    return values[0]
+
+
+def unescape(value):
+    """Returns the given TEXT value without its escape sequences."""
+    return re.sub(
+        r'\\([\\;,nN])',
+        lambda match: '\n' if match.group(1) in 'nN' else match.group(1),
+        value)
+
+
+def get_timezone(params, default_tz):
+    tzid = params.get('TZID')
+    if tzid and pytz:
+        try:
+            return pytz.timezone(tzid)
+        except pytz.UnknownTimeZoneError:
+            pass
+    return default_tz
+
+
+def parse_datetime(value, params, default_tz):
+    """
+    Returns the aware datetime of a DATE or DATE-TIME value.
+
+    Dates are returned as the midnight of the day. Floating times and times
+    with an unknown ``TZID`` are interpreted in the given default timezone.
+
+    """
+    value = value.strip()
+    if len(value) == 8:
+        date = timezone.datetime.strptime(value, '%Y%m%d')
+        return timezone.make_aware(date, get_timezone(params, default_tz))
+    if value.endswith('Z'):
+        return timezone.datetime.strptime(
+            value, UTC_FORMAT).replace(tzinfo=timezone.utc)
+    date = timezone.datetime.strptime(value, '%Y%m%dT%H%M%S')
+    return timezone.make_aware(date, get_timezone(params, default_tz))
+
+
+def parse_datetimes(values, default_tz):
+    """Returns all datetimes of a list of ``(params, value)`` tuples."""
+    return [
+        parse_datetime(date, params, default_tz)
+        for params, value in values for date in value.split(',') if date]
+
+
+def parse_duration(value):
+    """Returns the ``timedelta`` of a DURATION value."""
+    match = DURATION_RE.match(value.strip())
+    if not match:
+        raise ValueError('Invalid duration: {0}'.format(value))
+    parts = dict((key, int(amount or 0)) for key, amount in iter(
+        match.groupdict().items()) if key != 'sign')
+    duration = timedelta(**parts)
+    return -duration if match.group('sign') == '-' else duration
+
+
+def parse_rrule(value, default_tz):
+    """
+    Returns the frequency, the ``dateutil.rrule`` parameters and the until
+    date of a RRULE value.
+
+    :raises ValueError: If the rule can't be represented by a ``Rule``.
+
+    """
+    parts = dict(
+        part.split('=', 1) for part in value.upper().split(';') if part)
+    frequency = parts.pop('FREQ', None)
+    if frequency not in FREQUENCIES:
+        raise ValueError('Unsupported frequency: {0}'.format(frequency))
+    until = None
+    if 'UNTIL' in parts:
+        until = parse_datetime(parts.pop('UNTIL'), {}, default_tz)
+    params = {}
+    for part, amount in iter(parts.items()):
+        if part in RRULE_PARAMS:
+            numbers = [int(number) for number in amount.split(',')]
+            params[RRULE_PARAMS[part]] = (
+                numbers[0] if part in ['INTERVAL', 'COUNT'] else numbers)
+        elif part == 'WKST':
+            params['wkst'] = WEEKDAYS.index(amount)
+        elif part == 'BYDAY':
+            weekdays = []
+            for day in amount.split(','):
+                position = day[:-2]
+                if position:
+                    # an ordinal weekday like ``1MO`` equals ``bysetpos``
+                    if len(amount.split(',')) > 1 or 'bysetpos' in params:
+                        raise ValueError(
+                            'Unsupported weekdays: {0}'.format(amount))
+                    params['bysetpos'] = [int(position)]
+                weekdays.append(WEEKDAYS.index(day[-2:]))
+            params['byweekday'] = weekdays
+        else:
+            raise ValueError('Unsupported rule part: {0}'.format(part))
+    if params.get('interval') == 1:
+        del params['interval']
+    return frequency, params, until
+
+
+def escape(value):
+    """Returns the given text as escaped TEXT value."""
+    return re.sub(r'([\\;,])', r'\\\1', value or '').replace(
+        '\r\n', '\n').replace('\n', '\\n')
+
+
+def fold(line, limit=75):
+    """
+    Returns the given content line folded into lines of at most ``limit``
+    octets, each ending with CRLF.
+
+    """
+    lines = []
+    current = ''
+    length = 0
+    for char in line:
+        size = len(char.encode('utf-8'))
+        if length + size > limit:
+            lines.append(current)
+            # the leading space of a continuation line counts as well
+            current = ' '
+            length = 1
+        current += char
+        length += size
+    lines.append(current)
+    return ''.join('{0}\r\n'.format(part) for part in lines)
+
+
+def format_line(name, value, params=None):
+    """Returns the folded content line of a property."""
+    return fold('{0}{1}:{2}'.format(name, ''.join(
+        ';{0}={1}'.format(key, param) for key, param in sorted(
+            (params or {}).items())), value))
+
+
+def format_datetime(value):
+    """Returns the given aware datetime as UTC DATE-TIME value."""
+    return value.astimezone(timezone.utc).strftime(UTC_FORMAT)
+
+
+def format_rrule(frequency, params, until=None):
+    """
+    Returns the RRULE value of a frequency, its ``dateutil.rrule`` parameters
+    and the until date. This is the inverse of ``parse_rrule``.
+
+    :raises ValueError: If a parameter has no RRULE equivalent.
+
+    """
+    names = dict((value, key) for key, value in RRULE_PARAMS.items())
+    parts = ['FREQ={0}'.format(frequency)]
+    for param, amount in sorted(params.items()):
+        amounts = amount if isinstance(amount, (list, tuple)) else [amount]
+        if param in names:
+            value = ','.join(str(int(number)) for number in amounts)
+            parts.append('{0}={1}'.format(names[param], value))
+        elif param == 'byweekday':
+            parts.append('BYDAY={0}'.format(','.join(
+                WEEKDAYS[int(day)] for day in amounts)))
+        elif param == 'wkst':
+            parts.append('WKST={0}'.format(WEEKDAYS[int(amounts[0])]))
+        else:
+            raise ValueError('Unsupported rule parameter: {0}'.format(param))
+    if until and 'count' not in params:
+        parts.append('UNTIL={0}'.format(format_datetime(until)))
+    return ';'.join(parts)
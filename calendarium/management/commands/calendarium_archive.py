@@ -0,0 +1,43 @@
+"""
+Moves finished events into the archive tables.
+
+Run this command periodically, e.g. once a day, to keep the live ``Event`` and
+``Occurrence`` tables small. Events, whose occurrences all ended more than
+``CALENDARIUM_ARCHIVE_AFTER_DAYS`` days ago, are archived along with their
+occurrences and relations.
+
+"""
+from django.core.management.base import BaseCommand
+from django.utils.timezone import timedelta
+
+from ... import settings as calendarium_settings
+from ...models import Event
+from ...utils import now
+
+
+class Command(BaseCommand):
+    help = 'Moves finished events into the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            dest='days',
+            default=calendarium_settings.ARCHIVE_AFTER_DAYS,
+            help='Archive the events, that ended more than that many days'
+                 ' ago.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=calendarium_settings.BATCH_SIZE,
+            help='Amount of events to archive in one transaction.',
+        )
+
+    def handle(self, *args, **options):
+        count = Event.objects.archive(
+            before=now() - timedelta(days=options['days']),
+            batch_size=options['batch_size'])
+        if options['verbosity']:
+            self.stdout.write('Archived {0} events.'.format(count))
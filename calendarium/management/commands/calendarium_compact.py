@@ -0,0 +1,178 @@
+"""
+Removes persisted data, that doesn't change any occurrence.
+
+Over time the ``Occurrence`` table collects rows, that are identical to the
+occurrences the rule of their event generates anyway, and series, that end
+with a run of cancelled occurrences. This command deletes the former and
+collapses the latter into the ``end_recurring_period`` of the series.
+
+Occurrences, that are referenced by any other model, are never deleted.
+
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import timedelta
+
+from ... import settings as calendarium_settings
+from ...models import Change, Event, Occurrence, log_change
+from ...utils import (
+    delete_in_batches,
+    format_exdates,
+    invalidate_occurrence_cache,
+)
+
+
+def get_noop_candidates():
+    """
+    Returns the occurrences, that look like generated ones, i.e. they are
+    neither cancelled, moved nor changed and not referenced by other models.
+
+    """
+    candidates = Occurrence.objects.filter(
+        Q(created_by=F('event__created_by'))
+        | Q(created_by__isnull=True, event__created_by__isnull=True),
+        cancelled=False,
+        start=F('original_start'),
+        end=F('original_end'),
+        title=F('event__title'),
+        description=F('event__description'),
+    )
+    for relation in Occurrence._meta.related_objects:
+        candidates = candidates.filter(
+            **{'{0}__isnull'.format(relation.name): True})
+    return candidates
+
+
+def is_generated(event, start, end):
+    """Returns ``True``, if the rule of the event generates this period."""
+    if end - start != event.end - event.start:
+        return False
+    if not event.rule:
+        return start == event.start
+    if event.end_recurring_period and start > event.end_recurring_period:
+        return False
+    # seeking the rule to the start keeps it from expanding the series from
+    # its beginning for each candidate
+    rr = event.get_rrule_object(after=start)
+    return rr.after(start, inc=True) == start
+
+
+def get_series_end(event, cancelled):
+    """
+    Returns the start of the last occurrence of a series, that isn't
+    cancelled, or ``None``, if every occurrence is cancelled.
+
+    The dates are looked up in windows before the end of the series, that
+    double in size, each with a rule seeked to its start.
+
+    """
+    until = event.end_recurring_period
+    span = timedelta(days=7)
+    while True:
+        after = max(event.start, until - span)
+        dates = event.get_rrule_object(after=after).between(
+            after, until, inc=True)
+        for date in reversed(dates):
+            if date not in cancelled:
+                return date
+        if after == event.start:
+            return None
+        until = after
+        span *= 2
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes persisted occurrences, that equal generated ones, and'
+        ' collapses trailing cancellations into the end of their series.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            default=False,
+            help='Only report what would be reclaimed.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=calendarium_settings.BATCH_SIZE,
+            help='Amount of events to compact in one transaction.',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.noop_count = 0
+        self.cancelled_count = 0
+        self.event_count = 0
+        candidates = get_noop_candidates()
+        series = Event.objects.filter(
+            rule__isnull=False, end_recurring_period__isnull=False).filter(
+                Q(exdates__gt='') | Q(occurrences__cancelled=True))
+        event_pks = sorted(
+            set(candidates.values_list('event', flat=True))
+            | set(series.values_list('pk', flat=True)))
+        self.batch_size = options['batch_size']
+        for index in range(0, len(event_pks), self.batch_size):
+            with transaction.atomic():
+                for event in Event.objects.filter(
+                        pk__in=event_pks[index:index + self.batch_size]):
+                    self.compact(event, candidates.filter(event=event))
+        if self.event_count and not self.dry_run and (
+                calendarium_settings.CACHE_TIMEOUT):
+            invalidate_occurrence_cache(everything=True)
+        if options['verbosity']:
+            self.stdout.write(
+                '{0} {1} occurrences and {2} trailing cancellations of {3}'
+                ' events.'.format(
+                    'Would reclaim' if self.dry_run else 'Reclaimed',
+                    self.noop_count, self.cancelled_count, self.event_count))
+
+    def compact(self, event, candidates):
+        """Compacts the occurrences of one event."""
+        noop_pks = [
+            pk for pk, start, end in candidates.values_list(
+                'pk', 'original_start', 'original_end')
+            if is_generated(event, start, end)]
+
+        trailing_pks = []
+        exdates = event.get_exdates()
+        series_end = event.end_recurring_period
+        if event.rule and event.end_recurring_period:
+            cancelled = dict(event.occurrences.filter(
+                cancelled=True).values_list('original_start', 'pk'))
+            last_start = get_series_end(event, cancelled)
+            if last_start:
+                trailing_pks = [
+                    pk for start, pk in cancelled.items()
+                    if start > last_start]
+                trailing_exdates = [
+                    date for date in exdates if date > last_start]
+                if trailing_pks or trailing_exdates:
+                    series_end = last_start
+                    self.cancelled_count += len(trailing_exdates)
+                    exdates = [date for date in exdates if date <= last_start]
+
+        if not noop_pks and series_end == event.end_recurring_period:
+            return
+        self.event_count += 1
+        self.noop_count += len(noop_pks)
+        self.cancelled_count += len(trailing_pks)
+        if self.dry_run:
+            return
+        pks = noop_pks + trailing_pks
+        for index in range(0, len(pks), self.batch_size):
+            delete_in_batches(Occurrence.objects.filter(
+                pk__in=pks[index:index + self.batch_size]))
+        if series_end != event.end_recurring_period:
+            # the occurrences stay the same, so the signals are not needed
+            Event.objects.filter(pk=event.pk).update(
+                end_recurring_period=series_end,
+                exdates=format_exdates(exdates) or None)
+            # but the series is written differently now
+            log_change(
+                Change.EVENT, event, event_id=event.pk,
+                calendar_id=event.calendar_id)
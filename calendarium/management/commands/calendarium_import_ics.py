@@ -0,0 +1,264 @@
+"""
+Imports the events of an iCalendar (``.ics``) file.
+
+The file is read as a stream in three passes, so that its size doesn't matter:
+
+1. The overrides of single occurrences, i.e. the VEVENTs with a
+   ``RECURRENCE-ID``, are collected. Cancelled ones become exception dates.
+2. The events are created in batches with ``bulk_create``. Equal RRULEs share
+   one ``Rule``. Only events, that have overrides, are saved one by one,
+   because their pks are needed for their occurrences.
+3. The overrides are created as ``Occurrence`` instances in batches.
+
+The occurrence cache is invalidated only once at the end. Since the events are
+created without signals, one change of the whole calendar is logged for the
+clients, that synchronize with the change log.
+
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.timezone import timedelta
+
+from ... import ics
+from ... import settings as calendarium_settings
+from ...models import (
+    Calendar,
+    Change,
+    Event,
+    EventCategory,
+    Occurrence,
+    Rule,
+    log_change,
+)
+from ...utils import (
+    defer_occurrence_cache_invalidation,
+    format_exdates,
+    invalidate_occurrence_cache,
+)
+
+
+def get_uid(properties):
+    return ics.get_value(properties, 'UID', '')[1].strip()
+
+
+def get_recurrence_id(properties, default_tz):
+    params, value = ics.get_value(properties, 'RECURRENCE-ID')
+    if value is None:
+        return None
+    return ics.parse_datetime(value, params, default_tz)
+
+
+def get_period(properties, default_tz):
+    """Returns the start and the end of a VEVENT."""
+    params, value = ics.get_value(properties, 'DTSTART')
+    if value is None:
+        raise ValueError('Missing DTSTART')
+    start = ics.parse_datetime(value, params, default_tz)
+    end_params, end = ics.get_value(properties, 'DTEND')
+    duration = ics.get_value(properties, 'DURATION')[1]
+    if end is not None:
+        end = ics.parse_datetime(end, end_params, default_tz)
+    elif duration is not None:
+        end = start + ics.parse_duration(duration)
+    elif params.get('VALUE') == 'DATE':
+        end = start + timedelta(days=1)
+    else:
+        end = start
+    return start, max(start, end)
+
+
+def get_text(properties, name, max_length=None):
+    value = ics.unescape(ics.get_value(properties, name, '')[1])
+    return value[:max_length] if max_length else value
+
+
+class Command(BaseCommand):
+    help = 'Imports the events of an iCalendar file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the .ics file.')
+        parser.add_argument(
+            '--calendar',
+            dest='calendar',
+            help='Slug of the calendar, the events are added to.',
+        )
+        parser.add_argument(
+            '--category',
+            dest='category',
+            help='Slug of the category of the imported events.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=calendarium_settings.BATCH_SIZE,
+            help='Amount of events to create in one query.',
+        )
+
+    def handle(self, *args, **options):
+        self.path = options['path']
+        self.batch_size = options['batch_size']
+        self.default_tz = timezone.get_current_timezone()
+        self.calendar = self.category = None
+        try:
+            if options['calendar']:
+                self.calendar = Calendar.objects.get(slug=options['calendar'])
+            if options['category']:
+                self.category = EventCategory.objects.get(
+                    slug=options['category'])
+        except (Calendar.DoesNotExist, EventCategory.DoesNotExist) as ex:
+            raise CommandError(str(ex))
+        self.rules = {}
+        for rule in Rule.objects.all():
+            self.rules.setdefault(self.get_rule_key(
+                rule.frequency, rule.get_params()), rule)
+        self.event_count = self.occurrence_count = 0
+        self.rule_count = self.skipped_count = 0
+
+        with defer_occurrence_cache_invalidation():
+            overridden, cancelled = self.collect_overrides()
+            masters = self.import_events(overridden, cancelled)
+            self.import_occurrences(masters)
+            for event in Event.objects.filter(pk__in=[
+                    master[0] for master in masters.values()]):
+                event.update_next_occurrence_start()
+            if calendarium_settings.CACHE_TIMEOUT:
+                invalidate_occurrence_cache(
+                    self.calendar.pk if self.calendar else None)
+            if self.event_count:
+                log_change(Change.CALENDAR, self.calendar, calendar_id=(
+                    self.calendar.pk if self.calendar else None))
+        if options['verbosity']:
+            self.stdout.write(
+                'Imported {0} events with {1} occurrences and {2} new rules.'
+                ' Skipped {3} events.'.format(
+                    self.event_count, self.occurrence_count, self.rule_count,
+                    self.skipped_count))
+
+    def iter_events(self):
+        with open(self.path, encoding='utf-8') as ics_file:
+            for properties in ics.iter_events(ics_file):
+                yield properties
+
+    def get_rule_key(self, frequency, params):
+        return frequency, json.dumps(params, sort_keys=True)
+
+    def get_rule(self, value):
+        """Returns the ``Rule`` and the until date of a RRULE value."""
+        frequency, params, until = ics.parse_rrule(value, self.default_tz)
+        key = self.get_rule_key(frequency, params)
+        if key not in self.rules:
+            self.rules[key] = Rule.objects.create(
+                name=value[:32], description=value, frequency=frequency,
+                params=key[1] if params else None)
+            self.rule_count += 1
+        return self.rules[key], until
+
+    def collect_overrides(self):
+        """
+        Returns the UIDs of the events with overridden occurrences and a dict
+        mapping UIDs to the original starts of their cancelled occurrences.
+
+        """
+        overridden = set()
+        cancelled = {}
+        for properties in self.iter_events():
+            try:
+                recurrence_id = get_recurrence_id(properties, self.default_tz)
+            except ValueError:
+                continue
+            if recurrence_id is None:
+                continue
+            uid = get_uid(properties)
+            if ics.get_value(properties, 'STATUS', '')[1].upper() == (
+                    'CANCELLED'):
+                cancelled.setdefault(uid, []).append(recurrence_id)
+            else:
+                overridden.add(uid)
+        return overridden, cancelled
+
+    def get_event(self, properties, exdates):
+        start, end = get_period(properties, self.default_tz)
+        event = Event(
+            calendar=self.calendar, category=self.category, start=start,
+            end=end, title=get_text(properties, 'SUMMARY', 256),
+            description=get_text(properties, 'DESCRIPTION'))
+        rrule = ics.get_value(properties, 'RRULE')[1]
+        if rrule:
+            event.rule, event.end_recurring_period = self.get_rule(rrule)
+            exdates = exdates + ics.parse_datetimes(
+                properties.get('EXDATE', []), self.default_tz)
+            event.exdates = format_exdates(set(exdates)) or None
+        return event
+
+    def import_events(self, overridden, cancelled):
+        """
+        Creates the events and returns a dict mapping the UIDs of the events
+        with overrides to their pk, length, title and description.
+
+        """
+        masters = {}
+        batch = []
+        for properties in self.iter_events():
+            uid = get_uid(properties)
+            try:
+                if get_recurrence_id(properties, self.default_tz):
+                    continue
+                event = self.get_event(properties, cancelled.get(uid, []))
+            except ValueError:
+                self.skipped_count += 1
+                continue
+            self.event_count += 1
+            if uid and uid in overridden and uid not in masters:
+                event.save()
+                masters[uid] = (
+                    event.pk, event.end - event.start, event.title,
+                    event.description)
+                continue
+            # ``bulk_create`` skips ``save``, which computes this field
+            event.next_occurrence_start = event.get_next_occurrence_start()
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                self.create(Event, batch)
+                batch = []
+        self.create(Event, batch)
+        return masters
+
+    def import_occurrences(self, masters):
+        batch = []
+        for properties in self.iter_events():
+            uid = get_uid(properties)
+            if uid not in masters:
+                continue
+            try:
+                original_start = get_recurrence_id(
+                    properties, self.default_tz)
+                if original_start is None or ics.get_value(
+                        properties, 'STATUS', '')[1].upper() == 'CANCELLED':
+                    continue
+                start, end = get_period(properties, self.default_tz)
+            except ValueError:
+                self.skipped_count += 1
+                continue
+            pk, length, title, description = masters[uid]
+            batch.append(Occurrence(
+                event_id=pk, start=start, end=end,
+                original_start=original_start,
+                original_end=original_start + length,
+                title=get_text(properties, 'SUMMARY', 256) or title,
+                description=get_text(
+                    properties, 'DESCRIPTION') or description))
+            self.occurrence_count += 1
+            if len(batch) >= self.batch_size:
+                self.create(Occurrence, batch)
+                batch = []
+        self.create(Occurrence, batch)
+
+    def create(self, model, objects):
+        if objects:
+            with transaction.atomic():
+                model.objects.bulk_create(objects, ignore_conflicts=(
+                    model is Occurrence))
@@ -0,0 +1,36 @@
+"""
+Refreshes the stored start of the next occurrence of events.
+
+Run this command periodically, e.g. every few minutes, so that
+``Event.next_occurrence_start`` moves on once an occurrence has started. After
+upgrading, run it once with ``--all`` to fill the column of existing events.
+
+"""
+from django.core.management.base import BaseCommand
+
+from ...models import Event
+from ...utils import now
+
+
+class Command(BaseCommand):
+    help = 'Refreshes Event.next_occurrence_start, where it has passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='all',
+            default=False,
+            help='Refresh all events instead of only the passed ones.',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if not options['all']:
+            events = events.filter(next_occurrence_start__lt=now())
+        count = 0
+        for event in events.iterator():
+            event.update_next_occurrence_start()
+            count += 1
+        if options['verbosity']:
+            self.stdout.write('Refreshed {0} events.'.format(count))
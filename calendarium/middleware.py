@@ -0,0 +1,43 @@
+"""Middlewares of the ``calendarium`` app."""
+import time
+
+from . import settings as calendarium_settings
+from .utils import get_pinned_until, pin_reads_to_primary
+
+
+class PinReadsMiddleware(object):
+    """
+    Keeps the reads of a client pinned to the primary database across its
+    requests, e.g. for the redirect right after it saved an occurrence.
+
+    ``pin_reads_to_primary`` only pins the reads of the current thread. This
+    middleware stores the end of a pin, that was set during a request, in a
+    cookie and restores it for the following requests of the same client.
+    It also removes the pin of the thread after each request, so that it
+    never leaks into the requests of other clients.
+
+    """
+    cookie_name = 'calendarium_pinned_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        now = time.time()
+        try:
+            until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            until = 0
+        # a client can't pin itself for longer than a write would
+        until = min(until, now + calendarium_settings.PIN_READS_AFTER_WRITE)
+        pin_reads_to_primary(until=until)
+        try:
+            response = self.get_response(request)
+            pinned_until = get_pinned_until()
+        finally:
+            pin_reads_to_primary(until=0)
+        if pinned_until > max(until, now):
+            response.set_cookie(
+                self.cookie_name, str(pinned_until),
+                max_age=int(pinned_until - now) + 1, httponly=True)
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 3.0.14 on 2026-10-19 15:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Calendar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=256, verbose_name='Name')),
+                ('slug', models.SlugField(max_length=256, unique=True, verbose_name='Slug')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='calendar',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='calendarium.Calendar', verbose_name='Calendar'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['calendar', 'start'], name='calendarium_calenda_322306_idx'),
+        ),
+    ]
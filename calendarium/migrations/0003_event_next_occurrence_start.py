@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-19 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0002_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='next_occurrence_start',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Next occurrence'),
+        ),
+    ]
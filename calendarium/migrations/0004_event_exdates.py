@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0003_event_next_occurrence_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='exdates',
+            field=models.TextField(blank=True, null=True, verbose_name='Exception dates'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+# the same format as ``calendarium.constants.EXDATE_FORMAT``
+EXDATE_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+def cancelled_occurrences_to_exdates(apps, schema_editor):
+    """Moves cancelled occurrences of recurring events to ``exdates``."""
+    Event = apps.get_model('calendarium', 'Event')
+    Occurrence = apps.get_model('calendarium', 'Occurrence')
+    db_alias = schema_editor.connection.alias
+    cancelled = Occurrence.objects.using(db_alias).filter(
+        cancelled=True, event__rule__isnull=False)
+    for event in Event.objects.using(db_alias).filter(
+            pk__in=cancelled.values('event')).iterator():
+        exdates = set(event.exdates.split(',')) if event.exdates else set()
+        for original_start in cancelled.filter(event=event).values_list(
+                'original_start', flat=True):
+            exdates.add(original_start.astimezone(timezone.utc).strftime(
+                EXDATE_FORMAT))
+        event.exdates = ','.join(sorted(exdates))
+        event.save(update_fields=['exdates'])
+    cancelled.delete()
+
+
+def exdates_to_cancelled_occurrences(apps, schema_editor):
+    """Creates a cancelled occurrence for every exception date."""
+    Event = apps.get_model('calendarium', 'Event')
+    Occurrence = apps.get_model('calendarium', 'Occurrence')
+    db_alias = schema_editor.connection.alias
+    for event in Event.objects.using(db_alias).exclude(exdates=None).exclude(
+            exdates='').iterator():
+        occurrences = []
+        for value in event.exdates.split(','):
+            start = timezone.datetime.strptime(value, EXDATE_FORMAT).replace(
+                tzinfo=timezone.utc)
+            end = start + (event.end - event.start)
+            occurrences.append(Occurrence(
+                event=event, start=start, end=end, original_start=start,
+                original_end=end, title=event.title,
+                description=event.description, cancelled=True))
+        Occurrence.objects.using(db_alias).bulk_create(occurrences)
+        event.exdates = None
+        event.save(update_fields=['exdates'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0004_event_exdates'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            cancelled_occurrences_to_exdates,
+            exdates_to_cancelled_occurrences,
+        ),
+    ]
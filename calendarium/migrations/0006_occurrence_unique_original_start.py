@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-19 16:22
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def delete_duplicate_occurrences(apps, schema_editor):
+    """Keeps only the latest occurrence of each original start."""
+    Occurrence = apps.get_model('calendarium', 'Occurrence')
+    occurrences = Occurrence.objects.using(schema_editor.connection.alias)
+    duplicates = occurrences.values('event', 'original_start').annotate(
+        count=Count('pk'), latest=Max('pk')).filter(count__gt=1)
+    for duplicate in duplicates.iterator():
+        occurrences.filter(
+            event=duplicate['event'],
+            original_start=duplicate['original_start'],
+        ).exclude(pk=duplicate['latest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0005_cancelled_occurrences_to_exdates'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_occurrences, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='occurrence',
+            unique_together={('event', 'original_start')},
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.0.14 on 2026-10-19 16:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import filer.fields.image
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.FILER_IMAGE_MODEL),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('calendarium', '0006_occurrence_unique_original_start'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='Start date')),
+                ('end', models.DateTimeField(verbose_name='End date')),
+                ('description', models.TextField(blank=True, max_length=2048, verbose_name='Description')),
+                ('creation_date', models.DateTimeField(verbose_name='Creation date')),
+                ('end_recurring_period', models.DateTimeField(blank=True, null=True, verbose_name='End of recurring')),
+                ('exdates', models.TextField(blank=True, null=True, verbose_name='Exception dates')),
+                ('next_occurrence_start', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Next occurrence')),
+                ('title', models.CharField(max_length=256, verbose_name='Title')),
+                ('calendar', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_events', to='calendarium.Calendar', verbose_name='Calendar')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_events', to='calendarium.EventCategory', verbose_name='Category')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Created by')),
+                ('image', filer.fields.image.FilerImageField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.FILER_IMAGE_MODEL, verbose_name='Image')),
+                ('rule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='calendarium.Rule', verbose_name='Rule')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOccurrence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='Start date')),
+                ('end', models.DateTimeField(verbose_name='End date')),
+                ('description', models.TextField(blank=True, max_length=2048, verbose_name='Description')),
+                ('creation_date', models.DateTimeField(verbose_name='Creation date')),
+                ('original_start', models.DateTimeField(verbose_name='Original start')),
+                ('original_end', models.DateTimeField(verbose_name='Original end')),
+                ('cancelled', models.BooleanField(default=False, verbose_name='Cancelled')),
+                ('title', models.CharField(blank=True, max_length=256, verbose_name='Title')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Created by')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='calendarium.ArchivedEvent', verbose_name='Event')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedEventRelation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.IntegerField()),
+                ('relation_type', models.CharField(blank=True, max_length=32, null=True, verbose_name='Relation type')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.ContentType')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='calendarium.ArchivedEvent', verbose_name='Event')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedoccurrence',
+            index=models.Index(fields=['start', 'end'], name='calendarium_start_9bac4a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedevent',
+            index=models.Index(fields=['calendar', 'start'], name='calendarium_calenda_8586f0_idx'),
+        ),
+    ]
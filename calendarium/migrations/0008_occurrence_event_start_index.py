@@ -0,0 +1,17 @@
+# Generated by Django 3.0.14 on 2026-10-19 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0007_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='occurrence',
+            index=models.Index(fields=['event', 'start'], name='calendarium_event_i_7834e6_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-19 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0008_occurrence_event_start_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('event', 'Event'), ('occurrence', 'Occurrence'), ('rule', 'Rule'), ('calendar', 'Calendar')], max_length=16, verbose_name='Model')),
+                ('object_id', models.IntegerField(blank=True, null=True, verbose_name='Object ID')),
+                ('event_id', models.IntegerField(blank=True, null=True, verbose_name='Event ID')),
+                ('calendar_id', models.IntegerField(blank=True, null=True, verbose_name='Calendar ID')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Deleted')),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='Creation date')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['calendar_id', 'id'], name='calendarium_calenda_9f90f3_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.14 on 2026-10-19 17:13
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def set_series_end(apps, schema_editor):
+    """
+    Sets the end of the series of the events, that were archived with all of
+    their occurrences.
+
+    """
+    ArchivedEvent = apps.get_model('calendarium', 'ArchivedEvent')
+    db_alias = schema_editor.connection.alias
+    for event in ArchivedEvent.objects.using(db_alias).annotate(
+            last_end=Max('occurrences__end')).iterator():
+        event.series_end = max(event.end, event.last_end or event.end)
+        event.save(update_fields=['series_end'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendarium', '0009_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedevent',
+            name='series_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='End of the series'),
+        ),
+        migrations.RunPython(set_series_end, migrations.RunPython.noop),
+    ]
@@ -7,38 +7,99 @@ django-schedule:
 https://github.com/thauber/django-schedule/tree/master/schedule/models
 
 """
+import heapq
 import json
+from bisect import bisect_left
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.urls import reverse
-from django.db import models
-from django.db.models import Q
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import Max, Min, Q
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
 from django.template.defaultfilters import slugify
-from django.utils.timezone import timedelta
+from django.utils.timezone import datetime, timedelta, utc
 from django.utils.translation import ugettext_lazy as _
 
 from dateutil import rrule
+from dateutil.relativedelta import relativedelta
 from django_libs.models import ColorField
 from filer.fields.image import FilerImageField
 
 from .constants import FREQUENCY_CHOICES, OCCURRENCE_DECISIONS, FREQUENCIES
-from .utils import OccurrenceReplacer
+from .expansion import count_occurrences
+from .settings import (
+    ARCHIVE_AFTER_DAYS,
+    BATCH_SIZE,
+    CACHE_TIMEOUT,
+    CHANGE_LOG,
+)
+from .utils import (
+    OccurrenceReplacer,
+    delete_in_batches,
+    get_occurrences_cache_key,
+    format_exdates,
+    get_read_db,
+    invalidate_occurrence_cache,
+    is_next_occurrence_update_skipped,
+    now,
+    parse_exdates,
+    pin_reads_to_primary,
+    skip_next_occurrence_update,
+    skip_next_occurrence_updates,
+)
+
+
+def get_categories(category):
+    """Returns the given ``EventCategory`` or iterable of them as list."""
+    if not category:
+        return []
+    if isinstance(category, models.Model):
+        return [category]
+    return list(category)
+
+
+def get_category_filter(categories, prefix=''):
+    """
+    Returns a ``Q`` object, that matches everything in one of the categories
+    or in one of their sub categories.
+
+    """
+    return (
+        Q(**{'{0}category__in'.format(prefix): categories})
+        | Q(**{'{0}category__parent__in'.format(prefix): categories}))
+
+
+def tag_categories(occurrences, categories, using=None):
+    """
+    Sets ``matched_categories`` of each occurrence to the list of the given
+    categories, that its event belongs to, either directly or as sub category.
+
+    """
+    matches = dict((category.pk, [category]) for category in categories)
+    by_pk = dict((category.pk, category) for category in categories)
+    for pk, parent_pk in EventCategory.objects.using(using).filter(
+            parent__in=categories).values_list('pk', 'parent'):
+        matches.setdefault(pk, []).append(by_pk[parent_pk])
+    for occurrence in occurrences:
+        occurrence.matched_categories = matches.get(
+            occurrence.event.category_id, [])
+
+
+def get_occurrence_key(occurrence):
+    """Returns the ``(start, event_id)`` key, that orders occurrences."""
+    return occurrence.start, occurrence.event_id
 
 
 class EventModelManager(models.Manager):
     """Custom manager for the ``Event`` model class."""
-    def get_occurrences(self, start, end, category=None):
-        """Returns a list of events and occurrences for the given period."""
-        # we always want the time of start and end to be at 00:00
-        start = start.replace(minute=0, hour=0)
-        end = end.replace(minute=0, hour=0)
-        # if we recieve the date of one day as start and end, we need to set
-        # end one day forward
-        if start == end:
-            end = start + timedelta(days=1)
-        # retrieving relevant events
+    def _get_relevant_events(self, end, category=None, using=None,
+                             calendar=None):
+        """Returns the events, that might have occurrences before end."""
         # TODO currently for events with a rule, I can't properly find out when
         # the last occurrence of the event ends, or find a way to filter that,
         # so I'm still fetching **all** events before this period, that have a
@@ -48,24 +109,476 @@ class EventModelManager(models.Manager):
         # Django < 1.6 compatibility
         getQuerySet = (self.get_query_set if hasattr(
             self, 'get_query_set') else self.get_queryset)
-        qs = getQuerySet()
+        qs = getQuerySet().using(using)
+        if calendar:
+            qs = qs.filter(calendar=calendar)
 
-        if category:
+        categories = get_categories(category)
+        if categories:
             qs = qs.filter(start__lt=end)
-            relevant_events = qs.filter(
-                Q(category=category) |
-                Q(category__parent=category)
-            )
+            relevant_events = qs.filter(get_category_filter(categories))
         else:
             relevant_events = qs.filter(start__lt=end)
+        return relevant_events
+
+    def _expand(self, start, end, categories, using, calendar,
+                prefetch_relations=False):
+        """
+        Returns the unsorted occurrences of the live events in the period.
+
+        The events and their persisted occurrences are fetched with one query
+        each and every series is expanded once.
+
+        """
+        relevant_events = self._get_relevant_events(
+            end, category=categories, using=using,
+            calendar=calendar).select_related('rule', 'category')
+        if prefetch_relations:
+            relevant_events = relevant_events.prefetch_related(
+                'eventrelation_set__content_object')
+        # the persisted occurrences of all events are fetched at once
+        persisted = {}
+        for occurrence in Occurrence.objects.using(using).filter(
+                event__in=relevant_events.values('pk')):
+            persisted.setdefault(occurrence.event_id, []).append(occurrence)
         # get all occurrences for those events that don't already have a
         # persistent match and that lie in this period.
         all_occurrences = []
         for event in relevant_events:
-            all_occurrences.extend(event.get_occurrences(start, end))
-
-        # sort and return
-        return sorted(all_occurrences, key=lambda x: x.start)
+            if prefetch_relations:
+                event.relation_counts = event.get_relation_counts()
+            persistent_occurrences = persisted.get(event.pk, [])
+            for occurrence in persistent_occurrences:
+                occurrence.event = event
+            all_occurrences.extend(event.get_occurrences(
+                start, end, using=using,
+                persistent_occurrences=persistent_occurrences))
+        return all_occurrences
+
+    def get_occurrences(self, start, end, category=None, using=None,
+                        calendar=None, include_archived=False,
+                        prefetch_relations=False):
+        """
+        Returns a list of events and occurrences for the given period.
+
+        :param category: Optional ``EventCategory`` or iterable of them. The
+            union of all given categories and their sub categories is queried
+            and expanded at once. Each occurrence gets ``matched_categories``,
+            the list of the given categories it belongs to.
+        :param using: Optional database alias to read from. Defaults to the
+            ``CALENDARIUM_READ_DB`` setting.
+        :param calendar: Optional ``Calendar``. If given, only the events of
+            this calendar are queried.
+        :param include_archived: If ``True``, the occurrences of archived
+            events are returned as well.
+        :param prefetch_relations: If ``True``, the ``EventRelation`` instances
+            of the events and their content objects are fetched up front with
+            one query per content type, and each event gets a
+            ``relation_counts`` dict mapping relation types to their amounts.
+
+        """
+        # we always want the time of start and end to be at 00:00
+        start = start.replace(minute=0, hour=0)
+        end = end.replace(minute=0, hour=0)
+        # if we recieve the date of one day as start and end, we need to set
+        # end one day forward
+        if start == end:
+            end = start + timedelta(days=1)
+        calendar_pk = calendar.pk if calendar else None
+        categories = get_categories(category)
+        if CACHE_TIMEOUT:
+            cache_key = get_occurrences_cache_key(
+                calendar_pk, start.isoformat(), end.isoformat(),
+                sorted(category.pk for category in categories),
+                include_archived, prefetch_relations)
+            cached_occurrences = cache.get(cache_key)
+            if cached_occurrences is not None:
+                return cached_occurrences
+        using = get_read_db(using)
+        all_occurrences = self._expand(
+            start, end, categories, using, calendar, prefetch_relations)
+        if include_archived:
+            all_occurrences.extend(ArchivedEvent.objects.get_occurrences(
+                start, end, category=categories, using=using,
+                calendar=calendar))
+        if categories:
+            tag_categories(all_occurrences, categories, using=using)
+
+        # sort, cache and return
+        all_occurrences = sorted(all_occurrences, key=lambda x: x.start)
+        if CACHE_TIMEOUT:
+            cache.set(cache_key, all_occurrences, CACHE_TIMEOUT)
+        return all_occurrences
+
+    def get_occurrences_for_windows(self, windows, category=None,
+                                    using=None, calendar=None):
+        """
+        Returns the occurrences for many periods at once, e.g. for a row of
+        mini calendars.
+
+        The events are fetched once and each series is expanded once over
+        the hull of all periods, instead of once per period.
+
+        :param windows: A list of ``(start, end)`` tuples.
+        :param category: Optional ``EventCategory`` or iterable of them, see
+            ``get_occurrences``.
+        :returns: A list with the sorted list of occurrences of each window,
+            in the order of the given windows. Occurrences, that overlap
+            several windows, are part of each of them.
+
+        """
+        windows = list(windows)
+        if not windows:
+            return []
+        categories = get_categories(category)
+        using = get_read_db(using)
+        hull_start = min(window[0] for window in windows)
+        hull_end = max(window[1] for window in windows)
+        all_occurrences = sorted(self._expand(
+            hull_start, hull_end, categories, using, calendar),
+            key=lambda x: x.start)
+        if categories:
+            tag_categories(all_occurrences, categories, using=using)
+        starts = [occ.start for occ in all_occurrences]
+        # no occurrence, that starts before this, can reach into a window
+        max_length = max(
+            [occ.end - occ.start for occ in all_occurrences] or [timedelta()])
+        results = []
+        for start, end in windows:
+            first = bisect_left(starts, start - max_length)
+            last = bisect_left(starts, end)
+            results.append([
+                occ for occ in all_occurrences[first:last]
+                if occ.end >= start])
+        return results
+
+    def _get_future_events(self, after, category=None, using=None,
+                           calendar=None):
+        """Returns the events, that might have occurrences after the date."""
+        events = self.get_queryset().using(using)
+        if calendar:
+            events = events.filter(calendar=calendar)
+        categories = get_categories(category)
+        if categories:
+            events = events.filter(get_category_filter(categories))
+        return events.filter(
+            Q(rule__isnull=True, end__gte=after)
+            | Q(rule__isnull=False, end_recurring_period__isnull=True)
+            | Q(rule__isnull=False, end_recurring_period__gte=after)
+            | Q(occurrences__start__gte=after)).distinct()
+
+    def _iter_occurrences(self, events, after, using, end=None):
+        """
+        Yields the occurrences of the events, that start at or after the
+        given date, ordered by their start and the pk of their event.
+
+        Every series is expanded lazily from ``after`` on and the series are
+        merged, so only the persisted occurrences after the date are held in
+        memory, never all occurrences. If the caller stops at ``end``, only
+        the persisted occurrences before it are loaded.
+
+        """
+        events_by_pk = dict((event.pk, event) for event in events)
+        overridden = {}
+        persisted = []
+        if end is None:
+            period = Q(start__gte=after) | Q(original_start__gte=after)
+        else:
+            period = (
+                Q(start__gte=after, start__lt=end)
+                | Q(original_start__gte=after, original_start__lt=end))
+        for occurrence in Occurrence.objects.using(using).filter(
+                period, event__in=events.values('pk')):
+            occurrence.event = events_by_pk[occurrence.event_id]
+            overridden.setdefault(occurrence.event_id, set()).add(
+                occurrence.original_start)
+            if not occurrence.cancelled and occurrence.start >= after:
+                persisted.append(occurrence)
+
+        def generate(event):
+            skipped = overridden.get(event.pk, ())
+            for date in event._get_start_gen(after):
+                if date not in skipped:
+                    yield event._create_occurrence(date)
+
+        return heapq.merge(
+            sorted(persisted, key=get_occurrence_key),
+            *[generate(event) for event in events_by_pk.values()],
+            key=get_occurrence_key)
+
+    def iter_occurrences(self, start, end, category=None, using=None,
+                         calendar=None):
+        """
+        Yields the occurrences in the given period ordered by their start,
+        while the series are expanded, e.g. to stream them to a client.
+
+        Unlike ``get_occurrences`` the period is taken as is and nothing is
+        cached.
+
+        """
+        using = get_read_db(using)
+        events = self._get_future_events(
+            start, category=category, using=using, calendar=calendar).filter(
+                start__lt=end).select_related('rule', 'category')
+        lengths = [
+            event_end - event_start
+            for event_start, event_end in events.values_list('start', 'end')]
+        # occurrences, that started before, may reach into the period
+        after = start - max(lengths or [timedelta()])
+        for occurrence in self._iter_occurrences(
+                events, after, using, end=end):
+            if occurrence.start >= end:
+                return
+            if occurrence.end >= start:
+                yield occurrence
+
+    def get_upcoming_occurrences(self, amount, cursor=None, category=None,
+                                 using=None, calendar=None):
+        """
+        Returns a page of the next occurrences, ordered by their start and
+        the pk of their event, and the cursor of the following page.
+
+        Every series is expanded lazily from the cursor on and the series are
+        merged, so a page costs the same at any depth. Only occurrences, that
+        start at or after the cursor, are returned.
+
+        :param amount: The amount of occurrences of the page.
+        :param cursor: Optional ``(start, event_id)`` tuple of the last
+            occurrence of the previous page. Defaults to now.
+        :param category: Optional ``EventCategory`` or iterable of them.
+        :returns: A tuple of the list of occurrences and the cursor of the
+            next page, or ``None``, if there are no more occurrences.
+
+        """
+        using = get_read_db(using)
+        after, after_event_id = cursor or (now(), None)
+        events = self._get_future_events(
+            after, category=category, using=using,
+            calendar=calendar).select_related('rule')
+        occurrences = []
+        for occurrence in self._iter_occurrences(events, after, using):
+            key = get_occurrence_key(occurrence)
+            if after_event_id is not None and key <= (after, after_event_id):
+                continue
+            occurrences.append(occurrence)
+            if len(occurrences) >= amount:
+                return occurrences, key
+        return occurrences, None
+
+    def get_occurrence_counts(self, start, end, category=None, using=None,
+                              calendar=None, group_by=None):
+        """
+        Returns the amount of occurrences in the given period.
+
+        Events without a rule or with a simple rule are expanded and counted
+        inside of the database, see ``calendarium.expansion``.
+
+        :param group_by: Optional name of an ``Event`` field, e.g.
+            ``'category'``. If given, a dict mapping the field's values to
+            their amounts is returned instead of the total amount.
+
+        """
+        relevant_events = self._get_relevant_events(
+            end, category=category, using=get_read_db(using),
+            calendar=calendar)
+        return count_occurrences(
+            relevant_events, start, end, group_by=group_by)
+
+    def materialize(self, start, end, category=None, calendar=None,
+                    batch_size=None):
+        """
+        Persists all occurrences in the given period, that are not persisted,
+        yet, e.g. to attach data to each of them.
+
+        The occurrences are created by ``bulk_create`` in batches of
+        ``batch_size`` (default: ``CALENDARIUM_BATCH_SIZE``) rows. Rows, that
+        were persisted in the meantime, are left as they are.
+
+        :returns: The amount of occurrences, that were not persisted, when
+            the persisted ones were read. Occurrences, that were persisted
+            concurrently after that, are skipped by ``bulk_create``, but
+            still counted, since it doesn't report the inserted rows.
+
+        """
+        using = DEFAULT_DB_ALIAS
+        batch_size = batch_size or BATCH_SIZE
+        relevant_events = self._get_relevant_events(
+            end, category=category, using=using, calendar=calendar)
+        manager = Occurrence.objects.using(using)
+        count = 0
+        batch = []
+        with transaction.atomic(using=using):
+            lengths = [
+                event_end - event_start for event_start, event_end
+                in relevant_events.values_list('start', 'end')]
+            # occurrences, that started before, may reach into the period
+            after = start - max(lengths or [timedelta()])
+            # persisted occurrences are unique by their original start
+            persisted = set(manager.filter(
+                event__in=relevant_events.values('pk'),
+                original_start__gte=after,
+                original_start__lt=end).values_list(
+                    'event', 'original_start'))
+            for event in relevant_events.select_related('rule').iterator():
+                for occ in event._get_occurrence_gen(start, end):
+                    if occ.start >= end or (
+                            event.pk, occ.original_start) in persisted:
+                        continue
+                    batch.append(occ)
+                    if len(batch) >= batch_size:
+                        manager.bulk_create(batch, ignore_conflicts=True)
+                        count += len(batch)
+                        batch = []
+            manager.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        # the occurrences replace equal generated ones, so only the cached
+        # instances are outdated
+        if CACHE_TIMEOUT and count:
+            invalidate_occurrence_cache(
+                calendar.pk if calendar else None, everything=not calendar)
+        pin_reads_to_primary()
+        return count
+
+    def archive(self, before=None, calendar=None, batch_size=None):
+        """
+        Moves the finished events, whose occurrences all ended before the
+        given date, into the archive tables along with their occurrences and
+        relations.
+
+        Like for live events, only the persisted occurrences are archived.
+        The end of the last occurrence is stored as ``series_end``, so that
+        archived series are found without expanding them.
+
+        Events, that are referenced by any other model, are kept.
+
+        :param before: Defaults to ``CALENDARIUM_ARCHIVE_AFTER_DAYS`` days
+            ago.
+        :param batch_size: The amount of events to archive in one transaction.
+            Defaults to ``CALENDARIUM_BATCH_SIZE``.
+        :returns: The amount of archived events.
+
+        """
+        using = DEFAULT_DB_ALIAS
+        before = before or now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+        batch_size = batch_size or BATCH_SIZE
+        events = self.get_queryset().using(using).filter(
+            Q(rule__isnull=True, end__lt=before)
+            | Q(rule__isnull=False, end_recurring_period__lt=before)).exclude(
+                occurrences__end__gte=before)
+        if calendar:
+            events = events.filter(calendar=calendar)
+        for relation in self.model._meta.related_objects:
+            if relation.related_model not in [Occurrence, EventRelation]:
+                events = events.filter(
+                    **{'{0}__isnull'.format(relation.name): True})
+        pks = sorted(set(events.values_list('pk', flat=True)))
+        count = 0
+        for index in range(0, len(pks), batch_size):
+            with transaction.atomic(using=using):
+                for event in self.get_queryset().using(using).filter(
+                        pk__in=pks[index:index + batch_size]):
+                    count += ArchivedEvent.archive(event, before, using)
+        return count
+
+    def get_upcoming(self, until=None, using=None, calendar=None):
+        """
+        Returns the events, that happen again, ordered by the start of their
+        next occurrence.
+
+        This only uses the stored ``next_occurrence_start``, so it can be
+        sliced and paginated in the database.
+
+        :param until: Optional datetime to only return the events, that
+            happen again before it.
+
+        """
+        qs = self.get_queryset().using(get_read_db(using)).filter(
+            next_occurrence_start__gte=now())
+        if until:
+            qs = qs.filter(next_occurrence_start__lt=until)
+        if calendar:
+            qs = qs.filter(calendar=calendar)
+        return qs.order_by('next_occurrence_start')
+
+
+class ArchivedEventManager(models.Manager):
+    """Custom manager for the ``ArchivedEvent`` model class."""
+    def get_occurrences(self, start, end, category=None, using=None,
+                        calendar=None):
+        """
+        Returns a list of the archived occurrences in the given period as
+        unsaved ``Occurrence`` instances.
+
+        Archived series are stored with their changed occurrences only, like
+        live ones. They are found by a range query on their first start and
+        the ``series_end`` and expanded like live events.
+
+        """
+        using = get_read_db(using)
+        events = self.get_queryset().using(using).filter(
+            start__lt=end, series_end__gte=start).select_related(
+                'rule', 'category')
+        if calendar:
+            events = events.filter(calendar=calendar)
+        categories = get_categories(category)
+        if categories:
+            events = events.filter(get_category_filter(categories))
+        persisted = {}
+        for archived_occurrence in ArchivedOccurrence.objects.using(
+                using).filter(event__in=events.values('pk')):
+            persisted.setdefault(archived_occurrence.event_id, []).append(
+                archived_occurrence)
+        occurrences = []
+        for archived_event in events:
+            event = archived_event.as_event()
+            occurrences.extend(event.get_occurrences(
+                start, end, using=using, persistent_occurrences=[
+                    archived_occurrence.as_occurrence(event)
+                    for archived_occurrence in persisted.get(
+                        archived_event.pk, [])]))
+        return occurrences
+
+
+class ChangeManager(models.Manager):
+    """Custom manager for the ``Change`` model."""
+    def get_token(self, using=None):
+        """Returns the pk of the latest change or ``0``."""
+        return self.get_queryset().using(using).aggregate(
+            token=Max('pk'))['token'] or 0
+
+    def get_changed_events(self, token, latest, calendar=None, using=None):
+        """
+        Returns the pks of the events, that have changed after the first
+        token up to the latest one, or ``None``, if everything has to be
+        synchronized again, e.g. after an import.
+
+        Events, whose rule has changed, are included.
+
+        """
+        changes = self.get_queryset().using(using).filter(
+            pk__gt=token, pk__lte=latest)
+        if calendar:
+            # rules and imports without a calendar concern every calendar
+            changes = changes.filter(
+                Q(calendar_id=calendar.pk)
+                | Q(model__in=[Change.RULE, Change.CALENDAR],
+                    calendar_id__isnull=True))
+        event_pks = set()
+        rule_pks = set()
+        for model, object_id, event_id in changes.values_list(
+                'model', 'object_id', 'event_id').iterator():
+            if model == Change.CALENDAR:
+                return None
+            if model == Change.RULE:
+                rule_pks.add(object_id)
+            else:
+                event_pks.add(event_id)
+        if rule_pks:
+            events = Event.objects.using(using).filter(rule__in=rule_pks)
+            if calendar:
+                events = events.filter(calendar=calendar)
+            event_pks.update(events.values_list('pk', flat=True))
+        return event_pks
 
 
 class EventModelMixin(models.Model):
@@ -110,19 +623,70 @@ class EventModelMixin(models.Model):
         abstract = True
 
 
+class Calendar(models.Model):
+    """
+    A container for events, e.g. the calendar of one department.
+
+    All queries and caches can be scoped by a calendar, so that their cost
+    only depends on the amount of events inside of that calendar.
+
+    :name: The name of the calendar.
+    :slug: The unique slug of the calendar, used in its URLs.
+
+    """
+    name = models.CharField(
+        max_length=256,
+        verbose_name=_('Name'),
+    )
+
+    slug = models.SlugField(
+        max_length=256,
+        verbose_name=_('Slug'),
+        unique=True,
+    )
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('calendar_current_month', kwargs={
+            'calendar': self.slug})
+
+    def get_occurrences(self, start, end, category=None, using=None,
+                        prefetch_relations=False):
+        """Returns a list of occurrences of this calendar's events."""
+        return Event.objects.get_occurrences(
+            start, end, category=category, using=using, calendar=self,
+            prefetch_relations=prefetch_relations)
+
+
 class Event(EventModelMixin):
     """
     Hold the information about an event in the calendar.
 
+    :calendar: FK to the ``Calendar`` this event belongs to.
     :created_by: FK to the ``User``, who created this event.
     :category: FK to the ``EventCategory`` this event belongs to.
     :rule: FK to the definition of the recurrence of an event.
     :end_recurring_period: The possible end of the recurring definition.
+    :exdates: Comma separated UTC start dates of cancelled occurrences in
+        the iCalendar format, e.g. ``20160207T100000Z``.
+    :next_occurrence_start: The start of the next occurrence, that has not
+        started yet. Refreshed on save and by the
+        ``calendarium_refresh_next_occurrences`` command.
     :title: The title of the event.
     :image: Optional image of the event.
 
     """
 
+    calendar = models.ForeignKey(
+        'Calendar',
+        verbose_name=_('Calendar'),
+        related_name='events',
+        null=True, blank=True,
+        on_delete=models.CASCADE,
+    )
+
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         verbose_name=_('Created by'),
@@ -151,6 +715,18 @@ class Event(EventModelMixin):
         blank=True, null=True,
     )
 
+    exdates = models.TextField(
+        verbose_name=_('Exception dates'),
+        blank=True, null=True,
+    )
+
+    next_occurrence_start = models.DateTimeField(
+        verbose_name=_('Next occurrence'),
+        blank=True, null=True,
+        db_index=True,
+        editable=False,
+    )
+
     title = models.CharField(
         max_length=256,
         verbose_name=_('Title'),
@@ -165,6 +741,16 @@ class Event(EventModelMixin):
 
     objects = EventModelManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['calendar', 'start']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.next_occurrence_start = self.get_next_occurrence_start(
+            using=kwargs.get('using') or DEFAULT_DB_ALIAS)
+        return super(Event, self).save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('calendar_event_detail', kwargs={'pk': self.pk})
 
@@ -183,7 +769,7 @@ class Event(EventModelMixin):
     def _get_date_gen(self, rr, start, end):
         """Returns a generator to create the start dates for occurrences."""
         date = rr.after(start)
-        while end and date <= end or not(end):
+        while date is not None and (not end or date <= end):
             yield date
             date = rr.after(date)
 
@@ -200,15 +786,11 @@ class Event(EventModelMixin):
                 end = self.end_recurring_period
             # making start date generator
             occ_start_gen = self._get_date_gen(
-                self.get_rrule_object(),
+                self.get_rrule_object(after=start - length),
                 start - length, end)
 
-            # choosing the first item from the generator to initiate
-            occ_start = next(occ_start_gen)
-            while not end or (end and occ_start <= end):
-                occ_end = occ_start + length
-                yield self._create_occurrence(occ_start, occ_end)
-                occ_start = next(occ_start_gen)
+            for occ_start in occ_start_gen:
+                yield self._create_occurrence(occ_start, occ_start + length)
         else:
             # check if event is in the period
             if (not end or self.start < end) and self.end >= start:
@@ -218,20 +800,26 @@ class Event(EventModelMixin):
                                 dtstart=self.start),
                     start - length, self.end)
 
-                # choosing the first item from the generator to initiate
-                try:
-                    occ_start = next(occ_start_gen)
-                    while not end or (end and occ_start <= end):
-                        occ_end = occ_start + length
-                        yield self._create_occurrence(occ_start, occ_end)
-                        occ_start = next(occ_start_gen)
-                except StopIteration:
-                    pass
-
-    def get_occurrences(self, start, end=None):
-        """Returns all occurrences from start to end."""
+                for occ_start in occ_start_gen:
+                    if end and occ_start > end:
+                        break
+                    yield self._create_occurrence(
+                        occ_start, occ_start + length)
+
+    def get_occurrences(self, start, end=None, using=None,
+                        persistent_occurrences=None):
+        """
+        Returns all occurrences from start to end.
+
+        :param persistent_occurrences: Optional list of all persisted
+            occurrences of this event, e.g. when they were fetched for many
+            events at once. By default they are queried.
+
+        """
         # get persistent occurrences
-        persistent_occurrences = self.occurrences.all()
+        if persistent_occurrences is None:
+            persistent_occurrences = self.occurrences.using(
+                get_read_db(using))
 
         # setup occ_replacer with p_occs
         occ_replacer = OccurrenceReplacer(persistent_occurrences)
@@ -242,8 +830,9 @@ class Event(EventModelMixin):
         # get additional occs, that we need to take into concern
         additional_occs = occ_replacer.get_additional_occurrences(
             start, end)
-        occ = next(occurrence_gen)
-        while not end or (occ.start < end or any(additional_occs)):
+        for occ in occurrence_gen:
+            if end and not (occ.start < end or any(additional_occs)):
+                break
             if occ_replacer.has_occurrence(occ):
                 p_occ = occ_replacer.get_occurrence(occ)
 
@@ -261,10 +850,156 @@ class Event(EventModelMixin):
                 final_occ = estimated_occ
             if not final_occ.cancelled:
                 yield final_occ
-            try:
-                occ = next(occurrence_gen)
-            except StopIteration:
+
+    def delete_series(self, using=DEFAULT_DB_ALIAS):
+        """
+        Deletes this event along with all of its occurrences and relations.
+
+        Other than ``delete``, this removes the occurrences and relations by
+        batched raw ``DELETE`` queries, so they are neither loaded into memory
+        nor is a signal sent for each of them. The caches are invalidated once
+        by deleting the event itself.
+
+        """
+        with transaction.atomic(using=using):
+            delete_in_batches(self.occurrences.using(using))
+            delete_in_batches(self.eventrelation_set.using(using))
+            self.delete(using=using)
+
+    def get_adjacent_occurrence_starts(self, date):
+        """
+        Returns the original starts of the occurrences right before and right
+        after the one starting at the given date as tuple. Each of them is
+        ``None``, if there is none.
+
+        Both are looked up with rule arithmetic, so this also finishes for
+        series without an end.
+
+        """
+        if not self.rule:
+            return None, None
+        rr = self.get_rrule_object()
+        previous, following = rr.before(date), rr.after(date)
+        if following and self.end_recurring_period and (
+                following > self.end_recurring_period):
+            following = None
+        return previous, following
+
+    def get_next_occurrence_start(self, after=None, using=None):
+        """
+        Returns the start of the next occurrence, that starts at or after the
+        given datetime (default: now), or ``None`` if there is none.
+
+        Only the dates of the rule up to the first one, that has not been
+        overridden by a persistent occurrence, are computed, so this also
+        finishes for series without an end. Only the persistent occurrences,
+        that start or originally started after the datetime, are read.
+
+        """
+        after = after or now()
+        next_start = None
+        overridden = set()
+        if self.pk:
+            occurrences = self.occurrences.using(get_read_db(using)).filter(
+                Q(start__gte=after) | Q(original_start__gte=after))
+            for original_start, start, cancelled in occurrences.values_list(
+                    'original_start', 'start', 'cancelled'):
+                overridden.add(original_start)
+                if not cancelled and start >= after and (
+                        next_start is None or start < next_start):
+                    next_start = start
+        if self.rule:
+            rr = self.get_rrule_object(after=after)
+            date = rr.after(after, inc=True)
+            while date and date in overridden:
+                date = rr.after(date)
+            if date and self.end_recurring_period and (
+                    date > self.end_recurring_period):
+                date = None
+        elif self.start >= after and self.start not in overridden:
+            date = self.start
+        else:
+            date = None
+        if date and (next_start is None or date < next_start):
+            next_start = date
+        return next_start
+
+    def update_next_occurrence_start(self, using=DEFAULT_DB_ALIAS):
+        """Recomputes and stores ``next_occurrence_start`` of this event."""
+        self.next_occurrence_start = self.get_next_occurrence_start(
+            using=using)
+        Event.objects.using(using).filter(pk=self.pk).update(
+            next_occurrence_start=self.next_occurrence_start)
+
+    def get_occurrence(self, date, using=None):
+        """
+        Returns the first occurrence, that starts on the given date, or
+        ``None``.
+
+        Persisted occurrences are looked up by an index on their event and
+        start. Generated ones are found by seeking the rule to the date, so
+        the lookup takes the same time at any depth of the series.
+
+        :param date: A date or datetime. Days are UTC days, like in the
+            calendar views.
+
+        """
+        day_start = datetime(date.year, date.month, date.day, tzinfo=utc)
+        day_end = day_start + timedelta(days=1)
+        occurrences = self.occurrences.using(get_read_db(using))
+        persisted = occurrences.filter(
+            start__gte=day_start, start__lt=day_end).order_by('start').first()
+
+        generated = None
+        for occ_start in self._get_start_gen(day_start):
+            if occ_start >= day_end or (
+                    persisted and persisted.start <= occ_start):
+                break
+            if not occurrences.filter(original_start=occ_start).exists():
+                generated = self._create_occurrence(occ_start)
                 break
+        return generated or persisted
+
+    def _get_start_gen(self, after):
+        """
+        Yields the starts of the generated occurrences from ``after`` on in
+        their order. The rule is seeked to ``after``, so this is cheap at any
+        depth of the series.
+
+        """
+        if self.rule:
+            rr = self.get_rrule_object(after=after)
+            last_start = self.end_recurring_period
+        else:
+            # events without a rule have one occurrence for each of their days
+            rr = rrule.rrule(rrule.DAILY, dtstart=self.start, until=self.end)
+            last_start = None
+        for date in rr:
+            if last_start and date > last_start:
+                return
+            if date >= after:
+                yield date
+
+    def get_relations(self, relation_type=None):
+        """
+        Returns the ``EventRelation`` instances of this event, optionally only
+        the ones of the given type.
+
+        Uses the prefetched relations, e.g. of
+        ``Event.objects.get_occurrences(..., prefetch_relations=True)``.
+
+        """
+        return [
+            relation for relation in self.eventrelation_set.all()
+            if relation_type in (None, relation.relation_type)]
+
+    def get_relation_counts(self):
+        """Returns a dict mapping the relation types to their amounts."""
+        counts = {}
+        for relation in self.get_relations():
+            counts[relation.relation_type] = counts.get(
+                relation.relation_type, 0) + 1
+        return counts
 
     def get_parent_category(self):
         """Returns the main category of this event."""
@@ -272,12 +1007,76 @@ class Event(EventModelMixin):
             return self.category.parent
         return self.category
 
-    def get_rrule_object(self):
-        """Returns the rrule object for this ``Event``."""
+    def get_rrule_object(self, after=None):
+        """
+        Returns the rrule object for this ``Event``.
+
+        If the event has exception dates, a ``rruleset`` is returned, that
+        never generates the cancelled occurrences.
+
+        :param after: Optional datetime. If given, the rule may start at a
+            later date of the series before it, so that looking up dates after
+            it doesn't iterate over the whole series. Only the dates from
+            ``after`` on are the same as the ones of the full rule.
+
+        """
         if self.rule:
             params = self.rule.get_params()
             frequency = 'rrule.{0}'.format(self.rule.frequency)
-            return rrule.rrule(eval(frequency), dtstart=self.start, **params)
+            dtstart = self.start
+            if after and after > self.start and 'count' not in params:
+                dtstart, params = self._seek_rrule(after, params)
+            rr = rrule.rrule(eval(frequency), dtstart=dtstart, **params)
+            exdates = self.get_exdates()
+            if not exdates:
+                return rr
+            rset = rrule.rruleset()
+            rset.rrule(rr)
+            for exdate in exdates:
+                rset.exdate(exdate)
+            return rset
+
+    def _seek_rrule(self, after, params):
+        """
+        Returns the latest start of a period of the rule before ``after`` and
+        the params, that generate the same dates from that start on.
+
+        The start is moved by whole multiples of the interval, so all BY*
+        params keep their meaning. The day and month, that ``rrule`` would
+        otherwise take from the start, are made explicit.
+
+        """
+        interval = int(params.get('interval', 1))
+        frequency = self.rule.frequency
+        if frequency in ['DAILY', 'WEEKLY']:
+            days = 1 if frequency == 'DAILY' else 7
+            steps = (after - self.start).days // (days * interval)
+            return self.start + timedelta(
+                days=steps * days * interval), params
+        params = dict(params)
+        by_day = ['bymonthday', 'byweekday', 'byyearday', 'byweekno']
+        # ``byeaster`` selects the days as well, ``0`` being Easter Sunday
+        if not any(params.get(key) for key in by_day) and (
+                params.get('byeaster') is None):
+            params['bymonthday'] = self.start.day
+            if frequency == 'YEARLY' and not params.get('bymonth'):
+                params['bymonth'] = self.start.month
+        # one month less, so that the start stays before ``after``
+        months = max(0, (after.year - self.start.year) * 12 + (
+            after.month - self.start.month) - 1)
+        if frequency == 'YEARLY':
+            months = months // 12 * 12
+            interval *= 12
+        months = months // interval * interval
+        return self.start + relativedelta(months=months), params
+
+    def get_exdates(self):
+        """Returns the start dates of the cancelled occurrences."""
+        return parse_exdates(self.exdates)
+
+    def add_exdate(self, date):
+        """Cancels the occurrence starting at the given date. Doesn't save."""
+        self.exdates = format_exdates(self.get_exdates() + [date])
 
 
 class EventCategory(models.Model):
@@ -413,46 +1212,54 @@ class Occurrence(EventModelMixin):
         blank=True,
     )
 
+    class Meta:
+        unique_together = ('event', 'original_start')
+        indexes = [
+            models.Index(fields=['event', 'start']),
+        ]
+
     def category(self):
         return self.event.category
 
     def delete_period(self, period):
         """Deletes a set of occurrences based on the given decision."""
-        # check if this is the last or only one
-        is_last = False
-        is_only = False
-        gen = self.event.get_occurrences(
-            self.start, self.event.end_recurring_period)
-        occs = list(set([occ.pk for occ in gen]))
-        if len(occs) == 1:
-            is_only = True
-        elif len(occs) > 1 and self.pk == occs[-1]:
-            is_last = True
+        # all writes go to the primary database, so we also read from there
+        using = DEFAULT_DB_ALIAS
+        # check if this is the first, the last or the only one
+        previous, following = self.event.get_adjacent_occurrence_starts(
+            self.original_start)
         if period == OCCURRENCE_DECISIONS['all']:
             # delete all persistent occurrences along with the parent event
-            self.event.occurrences.all().delete()
-            self.event.delete()
+            self.event.delete_series(using=using)
         elif period == OCCURRENCE_DECISIONS['this one']:
             # check if it is the last one. If so, shorten the recurring period,
             # otherwise cancel the event
-            if is_last:
-                self.event.end_recurring_period = self.start - timedelta(
-                    days=1)
-                self.event.save()
-            elif is_only:
-                self.event.occurrences.all().delete()
-                self.event.delete()
+            if previous is None and following is None:
+                self.event.delete_series(using=using)
+            elif following is None:
+                self.event.end_recurring_period = previous
+                if self.pk:
+                    self.delete(using=using)
+                self.event.save(using=using)
             else:
-                self.cancelled = True
-                self.save()
+                # store the cancellation as exception date of the series and
+                # drop a persistent override, if there is any
+                self.event.add_exdate(self.original_start)
+                if self.pk:
+                    self.delete(using=using)
+                self.event.save(using=using)
         elif period == OCCURRENCE_DECISIONS['following']:
-            # just shorten the recurring period
-            self.event.end_recurring_period = self.start - timedelta(days=1)
-            self.event.occurrences.filter(start__gte=self.start).delete()
-            if is_only:
-                self.event.delete()
+            if previous is None:
+                self.event.delete_series(using=using)
             else:
-                self.event.save()
+                # just shorten the recurring period. Saving the event updates
+                # its next occurrence once for all deleted occurrences
+                self.event.end_recurring_period = previous
+                with skip_next_occurrence_updates(self.event.pk):
+                    self.event.occurrences.using(using).filter(
+                        start__gte=self.start).delete()
+                self.event.save(using=using)
+        pin_reads_to_primary()
 
     def get_absolute_url(self):
         return reverse(
@@ -499,3 +1306,415 @@ class Rule(models.Model):
         if self.params:
             return json.loads(self.params)
         return {}
+
+
+def copy_fields(instance, model, exclude=None, **kwargs):
+    """
+    Returns an unsaved instance of the model with the values of all fields,
+    that it shares with the given instance.
+
+    """
+    values = {}
+    exclude = exclude or []
+    for field in model._meta.concrete_fields:
+        if field.name not in exclude and hasattr(instance, field.attname):
+            values[field.attname] = getattr(instance, field.attname)
+    values.update(kwargs)
+    return model(**values)
+
+
+class ArchivedEvent(EventModelMixin):
+    """
+    A finished ``Event``, that has been moved out of the live tables.
+
+    It has the same fields and primary key as the original event. See
+    ``EventModelManager.archive``.
+
+    """
+    creation_date = models.DateTimeField(
+        verbose_name=_('Creation date'),
+    )
+
+    calendar = models.ForeignKey(
+        'Calendar',
+        verbose_name=_('Calendar'),
+        related_name='archived_events',
+        null=True, blank=True,
+        on_delete=models.CASCADE,
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Created by'),
+        related_name='+',
+        blank=True, null=True,
+        on_delete=models.SET_NULL,
+    )
+
+    category = models.ForeignKey(
+        'EventCategory',
+        verbose_name=_('Category'),
+        related_name='archived_events',
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    rule = models.ForeignKey(
+        'Rule',
+        verbose_name=_('Rule'),
+        related_name='+',
+        blank=True, null=True,
+        on_delete=models.SET_NULL,
+    )
+
+    end_recurring_period = models.DateTimeField(
+        verbose_name=_('End of recurring'),
+        blank=True, null=True,
+    )
+
+    exdates = models.TextField(
+        verbose_name=_('Exception dates'),
+        blank=True, null=True,
+    )
+
+    next_occurrence_start = models.DateTimeField(
+        verbose_name=_('Next occurrence'),
+        blank=True, null=True,
+        editable=False,
+    )
+
+    series_end = models.DateTimeField(
+        verbose_name=_('End of the series'),
+        blank=True, null=True,
+        editable=False,
+    )
+
+    title = models.CharField(
+        max_length=256,
+        verbose_name=_('Title'),
+    )
+
+    image = FilerImageField(
+        verbose_name=_('Image'),
+        related_name='+',
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    objects = ArchivedEventManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['calendar', 'start'])]
+
+    @classmethod
+    def archive(cls, event, before, using=DEFAULT_DB_ALIAS):
+        """
+        Moves the event with its persisted occurrences and relations into the
+        archive, if all of its occurrences ended before the given date.
+
+        :returns: ``1`` if the event was archived, otherwise ``0``.
+
+        """
+        first_start = event.occurrences.using(using).aggregate(
+            first_start=Min('start'))['first_start']
+        start = min(event.start, first_start or event.start)
+        series_end = event.end
+        for occ in event.get_occurrences(start, before, using=using):
+            if occ.end >= before:
+                return 0
+            series_end = max(series_end, occ.end)
+        cls.objects.using(using).bulk_create([
+            copy_fields(event, cls, series_end=series_end)])
+        ArchivedOccurrence.objects.using(using).bulk_create([
+            copy_fields(occ, ArchivedOccurrence, exclude=['id'])
+            for occ in event.occurrences.using(using).iterator()
+        ], batch_size=BATCH_SIZE)
+        ArchivedEventRelation.objects.using(using).bulk_create([
+            copy_fields(relation, ArchivedEventRelation, exclude=['id'])
+            for relation in event.eventrelation_set.using(using).iterator()
+        ], batch_size=BATCH_SIZE)
+        event.delete_series(using=using)
+        return 1
+
+    def as_event(self):
+        """Returns an unsaved ``Event`` with the values of this one."""
+        return copy_fields(self, Event)
+
+
+class ArchivedEventRelation(models.Model):
+    """An ``EventRelation`` of an ``ArchivedEvent``."""
+    event = models.ForeignKey(
+        'ArchivedEvent',
+        verbose_name=_("Event"),
+        on_delete=models.CASCADE,
+    )
+
+    content_type = models.ForeignKey(
+        ContentType,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+
+    object_id = models.IntegerField()
+
+    content_object = GenericForeignKey(
+        'content_type',
+        'object_id',
+    )
+
+    relation_type = models.CharField(
+        verbose_name=_('Relation type'),
+        max_length=32,
+        blank=True, null=True,
+    )
+
+    def __str__(self):
+        return u'type "{0}" for "{1}"'.format(
+            self.relation_type, self.event.title)
+
+
+class ArchivedOccurrence(EventModelMixin):
+    """
+    A persisted occurrence of an ``ArchivedEvent``.
+
+    """
+    creation_date = models.DateTimeField(
+        verbose_name=_('Creation date'),
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Created by'),
+        related_name='+',
+        blank=True, null=True,
+        on_delete=models.SET_NULL,
+    )
+
+    event = models.ForeignKey(
+        'ArchivedEvent',
+        verbose_name=_('Event'),
+        related_name='occurrences',
+        on_delete=models.CASCADE,
+    )
+
+    original_start = models.DateTimeField(
+        verbose_name=_('Original start'),
+    )
+
+    original_end = models.DateTimeField(
+        verbose_name=_('Original end'),
+    )
+
+    cancelled = models.BooleanField(
+        verbose_name=_('Cancelled'),
+        default=False,
+    )
+
+    title = models.CharField(
+        max_length=256,
+        verbose_name=_('Title'),
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=['start', 'end'])]
+
+    def as_occurrence(self, event=None):
+        """Returns an unsaved ``Occurrence`` with the values of this one."""
+        return copy_fields(
+            self, Occurrence, exclude=['id', 'event'],
+            event=event or self.event.as_event())
+
+
+class Change(models.Model):
+    """
+    An entry of the append-only log of changes to events, occurrences and
+    rules, that clients use to synchronize only what has changed.
+
+    The pk of the latest entry is the sync token of a client. Entries are
+    written on saving and deleting, if ``CALENDARIUM_CHANGE_LOG`` is set.
+    Moving an event to another calendar logs its deletion for the old one.
+
+    The pks are given out when a change is written, not when it is
+    committed. A transaction, that commits after a client has synchronized,
+    might have written a change below that client's token, which is then
+    never returned to it. Clients should therefore synchronize without a
+    token from time to time.
+
+    :model: The kind of the changed object. ``calendar`` means, that any
+        event of the calendar might have changed, e.g. by a bulk import.
+    :object_id: The pk of the changed object.
+    :event_id: The pk of the event, whose series has changed.
+    :calendar_id: The pk of the calendar of the event or ``None``.
+    :deleted: ``True``, if the object was deleted.
+    :creation_date: When the change happened.
+
+    """
+    EVENT = 'event'
+    OCCURRENCE = 'occurrence'
+    RULE = 'rule'
+    CALENDAR = 'calendar'
+    MODEL_CHOICES = (
+        (EVENT, _('Event')),
+        (OCCURRENCE, _('Occurrence')),
+        (RULE, _('Rule')),
+        (CALENDAR, _('Calendar')),
+    )
+
+    model = models.CharField(
+        verbose_name=_('Model'),
+        choices=MODEL_CHOICES,
+        max_length=16,
+    )
+
+    object_id = models.IntegerField(
+        verbose_name=_('Object ID'),
+        blank=True, null=True,
+    )
+
+    event_id = models.IntegerField(
+        verbose_name=_('Event ID'),
+        blank=True, null=True,
+    )
+
+    calendar_id = models.IntegerField(
+        verbose_name=_('Calendar ID'),
+        blank=True, null=True,
+    )
+
+    deleted = models.BooleanField(
+        verbose_name=_('Deleted'),
+        default=False,
+    )
+
+    creation_date = models.DateTimeField(
+        verbose_name=_('Creation date'),
+        auto_now_add=True,
+    )
+
+    objects = ChangeManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['calendar_id', 'id'])]
+
+
+def log_change(model, instance=None, event_id=None, calendar_id=None,
+               deleted=False, using=None):
+    """Adds an entry to the change log, if it is enabled."""
+    if not CHANGE_LOG:
+        return
+    Change.objects.using(using).create(
+        model=model, object_id=instance.pk if instance else None,
+        event_id=event_id, calendar_id=calendar_id, deleted=deleted)
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_calendar(sender, instance, using, **kwargs):
+    # the calendar, the event is moved away from, is changed as well
+    instance._old_calendar_id = None
+    if (CACHE_TIMEOUT or CHANGE_LOG) and instance.pk:
+        instance._old_calendar_id = Event.objects.using(using).filter(
+            pk=instance.pk).values_list('calendar_id', flat=True).first()
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Event)
+def invalidate_event_cache(sender, instance, **kwargs):
+    if not CACHE_TIMEOUT:
+        return
+    invalidate_occurrence_cache(instance.calendar_id)
+    old_calendar_id = getattr(instance, '_old_calendar_id', None)
+    if old_calendar_id and old_calendar_id != instance.calendar_id:
+        invalidate_occurrence_cache(old_calendar_id)
+
+
+@receiver(post_delete, sender=Occurrence)
+@receiver(post_save, sender=Occurrence)
+def invalidate_occurrence_event_cache(sender, instance, **kwargs):
+    if not CACHE_TIMEOUT:
+        return
+    calendar_pk = Event.objects.filter(pk=instance.event_id).values_list(
+        'calendar_id', flat=True).first()
+    invalidate_occurrence_cache(calendar_pk)
+
+
+@receiver(post_delete, sender=EventRelation)
+@receiver(post_save, sender=EventRelation)
+def invalidate_relation_event_cache(sender, instance, **kwargs):
+    # relations are cached along with the occurrences of their event
+    invalidate_occurrence_event_cache(sender, instance, **kwargs)
+
+
+@receiver(pre_delete, sender=Event)
+def skip_deleted_event_updates(sender, instance, **kwargs):
+    # the occurrences are deleted before their event, which doesn't need to
+    # be updated for each of them
+    skip_next_occurrence_update(instance.pk)
+
+
+@receiver(post_delete, sender=Event)
+def stop_skipping_deleted_event_updates(sender, instance, **kwargs):
+    skip_next_occurrence_update(instance.pk, skip=False)
+
+
+@receiver(post_delete, sender=Occurrence)
+@receiver(post_save, sender=Occurrence)
+def update_event_next_occurrence_start(sender, instance, using, **kwargs):
+    if is_next_occurrence_update_skipped(instance.event_id):
+        return
+    event = Event.objects.using(using).filter(pk=instance.event_id).first()
+    if event:
+        event.update_next_occurrence_start(using=using)
+
+
+@receiver(post_save, sender=Rule)
+def update_rule_events_next_occurrence_start(sender, instance, using,
+                                             **kwargs):
+    for event in Event.objects.using(using).filter(rule=instance):
+        event.update_next_occurrence_start(using=using)
+
+
+@receiver(post_delete, sender=EventCategory)
+@receiver(post_save, sender=EventCategory)
+@receiver(post_delete, sender=Rule)
+@receiver(post_save, sender=Rule)
+def invalidate_all_caches(sender, instance, **kwargs):
+    if CACHE_TIMEOUT:
+        invalidate_occurrence_cache(everything=True)
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Event)
+def log_event_change(sender, instance, using, **kwargs):
+    log_change(
+        Change.EVENT, instance, event_id=instance.pk,
+        calendar_id=instance.calendar_id, deleted='created' not in kwargs,
+        using=using)
+    old_calendar_id = getattr(instance, '_old_calendar_id', None)
+    if old_calendar_id and old_calendar_id != instance.calendar_id:
+        # for the clients of the old calendar the event is gone
+        log_change(
+            Change.EVENT, instance, event_id=instance.pk,
+            calendar_id=old_calendar_id, deleted=True, using=using)
+
+
+@receiver(post_delete, sender=Occurrence)
+@receiver(post_save, sender=Occurrence)
+def log_occurrence_change(sender, instance, using, **kwargs):
+    if not CHANGE_LOG:
+        return
+    if Occurrence.event.is_cached(instance):
+        calendar_pk = instance.event.calendar_id
+    else:
+        calendar_pk = Event.objects.using(using).filter(
+            pk=instance.event_id).values_list('calendar_id', flat=True).first()
+    log_change(
+        Change.OCCURRENCE, instance, event_id=instance.event_id,
+        calendar_id=calendar_pk, deleted='created' not in kwargs, using=using)
+
+
+@receiver(post_delete, sender=Rule)
+@receiver(post_save, sender=Rule)
+def log_rule_change(sender, instance, using, **kwargs):
+    log_change(
+        Change.RULE, instance, deleted='created' not in kwargs, using=using)
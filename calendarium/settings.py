@@ -3,3 +3,20 @@ from django.conf import settings
 
 
 SHIFT_WEEKSTART = getattr(settings, 'CALENDARIUM_SHIFT_WEEKSTART', 0)
+
+READ_DB = getattr(settings, 'CALENDARIUM_READ_DB', None)
+
+PIN_READS_AFTER_WRITE = getattr(
+    settings, 'CALENDARIUM_PIN_READS_AFTER_WRITE', 0)
+
+CACHE_TIMEOUT = getattr(settings, 'CALENDARIUM_CACHE_TIMEOUT', 0)
+
+BATCH_SIZE = getattr(settings, 'CALENDARIUM_BATCH_SIZE', 1000)
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'CALENDARIUM_ARCHIVE_AFTER_DAYS', 365)
+
+CHANGE_LOG = getattr(settings, 'CALENDARIUM_CHANGE_LOG', False)
+
+FAST_GRID = getattr(settings, 'CALENDARIUM_FAST_GRID', False)
+
+CELL_LIMIT = getattr(settings, 'CALENDARIUM_CELL_LIMIT', 0)
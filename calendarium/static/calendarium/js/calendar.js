@@ -0,0 +1,13 @@
+/**
+ * Replaces the "+N more" link of a crowded cell of the month or week grid
+ * with the occurrences, that didn't fit into it.
+ */
+(function($) {
+    $(document).on('click', 'a.calendarium-more', function(event) {
+        var link = $(this);
+        event.preventDefault();
+        $.get(link.attr('href'), function(html) {
+            link.replaceWith(html);
+        });
+    });
+})(jQuery);
@@ -1,46 +1,103 @@
 """Templatetags for the ``calendarium`` project."""
-from django.urls import reverse
 from django import template
 from django.utils.timezone import datetime, now, timedelta, utc
 
-from ..models import Event, EventCategory
+from ..models import Calendar, Event, EventCategory
+from ..utils import format_url
 
 register = template.Library()
 
 
+def _get_scope(calendar):
+    if calendar:
+        return {'calendar': calendar.slug}
+    return {}
+
+
 @register.filter
-def get_week_URL(date, day=0):
+def get_week_URL(date, day=0, calendar=None):
     """
     Returns the week view URL for a given date.
 
     :param date: A date instance.
     :param day: Day number in a month.
+    :param calendar: Optional ``Calendar`` to scope the URL by.
 
     """
     if day < 1:
         day = 1
     date = datetime(year=date.year, month=date.month, day=day, tzinfo=utc)
-    return reverse('calendar_week', kwargs={'year': date.isocalendar()[0],
-                                            'week': date.isocalendar()[1]})
+    return format_url('calendar_week', year=date.isocalendar()[0],
+                      week=date.isocalendar()[1], **_get_scope(calendar))
+
+
+@register.filter
+def get_day_URL(date, day=0, calendar=None):
+    """
+    Returns the day view URL for a given date.
+
+    :param date: A date instance.
+    :param day: Optional day number in the month of the date.
+    :param calendar: Optional ``Calendar`` to scope the URL by.
+
+    """
+    return format_url(
+        'calendar_day', year=date.year, month=date.month,
+        day=day if day > 0 else date.day, **_get_scope(calendar))
+
+
+@register.filter
+def get_occurrence_URL(occurrence, calendar=None):
+    """Returns the detail view URL of an occurrence."""
+    return format_url(
+        'calendar_occurrence_detail', pk=occurrence.event_id,
+        year=occurrence.start.year, month=occurrence.start.month,
+        day=occurrence.start.day, **_get_scope(calendar))
+
+
+@register.simple_tag(takes_context=True)
+def calendar_week_url(context, date, day=0):
+    """Like ``get_week_URL``, but scoped by the ``current_calendar``."""
+    return get_week_URL(date, day, calendar=context.get('current_calendar'))
+
+
+@register.simple_tag(takes_context=True)
+def calendar_day_url(context, date, day=0):
+    """Like ``get_day_URL``, but scoped by the ``current_calendar``."""
+    return get_day_URL(date, day, calendar=context.get('current_calendar'))
+
+
+@register.simple_tag(takes_context=True)
+def calendar_occurrence_url(context, occurrence):
+    """Like ``get_occurrence_URL``, but scoped by the ``current_calendar``."""
+    return get_occurrence_URL(
+        occurrence, calendar=context.get('current_calendar'))
 
 
-def _get_upcoming_events(amount=5, category=None):
+def _get_upcoming_events(amount=5, category=None, using=None,
+                         calendar=None):
     if not isinstance(category, EventCategory):
         category = None
+    if not isinstance(calendar, Calendar):
+        calendar = None
     return Event.objects.get_occurrences(
-        now(), now() + timedelta(days=356), category)[:amount]
+        now(), now() + timedelta(days=356), category, using=using,
+        calendar=calendar)[:amount]
 
 
 @register.inclusion_tag('calendarium/upcoming_events.html')
-def render_upcoming_events(event_amount=5, category=None):
+def render_upcoming_events(event_amount=5, category=None, using=None,
+                           calendar=None):
     """Template tag to render a list of upcoming events."""
     return {
         'occurrences': _get_upcoming_events(
-            amount=event_amount, category=category),
+            amount=event_amount, category=category, using=using,
+            calendar=calendar),
     }
 
 
 @register.simple_tag
-def get_upcoming_events(amount=5, category=None):
+def get_upcoming_events(amount=5, category=None, using=None, calendar=None):
     """Returns a list of upcoming events."""
-    return _get_upcoming_events(amount=amount, category=category)
+    return _get_upcoming_events(
+        amount=amount, category=category, using=using, calendar=calendar)
@@ -0,0 +1,251 @@
+"""Tests for the management commands of the ``calendarium`` app."""
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.timezone import timedelta
+
+from mixer.backend.django import mixer
+from mock import patch
+
+from ..management.commands.calendarium_compact import (
+    get_series_end,
+    is_generated,
+)
+from ..models import ArchivedEvent, Change, Event, Occurrence, Rule
+from ..utils import now
+
+
+class RefreshNextOccurrencesTestCase(TestCase):
+    """Tests for the ``calendarium_refresh_next_occurrences`` command."""
+    longMessage = True
+
+    def setUp(self):
+        self.event = mixer.blend(
+            'calendarium.Event', start=now() - timedelta(days=3),
+            end=now() - timedelta(days=3), rule__frequency='DAILY',
+            rule__params=None, end_recurring_period=None)
+        Event.objects.filter(pk=self.event.pk).update(
+            next_occurrence_start=now() - timedelta(days=1))
+
+    def test_command(self):
+        call_command('calendarium_refresh_next_occurrences', verbosity=0)
+        self.event.refresh_from_db()
+        self.assertGreaterEqual(self.event.next_occurrence_start, now(), msg=(
+            'Passed values should be refreshed.'))
+
+        Event.objects.filter(pk=self.event.pk).update(
+            next_occurrence_start=None)
+        call_command('calendarium_refresh_next_occurrences', verbosity=0)
+        self.event.refresh_from_db()
+        self.assertIsNone(self.event.next_occurrence_start, msg=(
+            'Without ``--all`` only passed values should be refreshed.'))
+        call_command(
+            'calendarium_refresh_next_occurrences', all=True, verbosity=0)
+        self.event.refresh_from_db()
+        self.assertIsNotNone(self.event.next_occurrence_start, msg=(
+            'With ``--all`` all events should be refreshed.'))
+
+
+class ArchiveTestCase(TestCase):
+    """Tests for the ``calendarium_archive`` command."""
+    longMessage = True
+
+    def setUp(self):
+        self.event = mixer.blend(
+            'calendarium.Event', rule=None, start=now() - timedelta(days=10),
+            end=now() - timedelta(days=10))
+
+    def test_command(self):
+        call_command('calendarium_archive', verbosity=0)
+        self.assertEqual(Event.objects.count(), 1, msg=(
+            'By default only events older than a year should be archived.'))
+        call_command('calendarium_archive', days=7, verbosity=0)
+        self.assertEqual(Event.objects.count(), 0)
+        self.assertEqual(ArchivedEvent.objects.count(), 1)
+
+
+class CompactTestCase(TestCase):
+    """Tests for the ``calendarium_compact`` command."""
+    longMessage = True
+
+    def setUp(self):
+        self.start = now()
+        # a daily series over ten days
+        self.event = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), rule__frequency='DAILY',
+            rule__params=None, created_by=None,
+            end_recurring_period=self.start + timedelta(days=9))
+        occurrences = list(self.event.get_occurrences(
+            self.start, self.start + timedelta(days=10)))
+        # two occurrences, that equal the generated ones
+        occurrences[1].save()
+        occurrences[2].save()
+        # a changed one
+        occurrences[3].title = 'changed'
+        occurrences[3].save()
+        # the last three are cancelled
+        occurrences[7].cancelled = True
+        occurrences[7].save()
+        self.event.add_exdate(occurrences[8].start)
+        self.event.add_exdate(occurrences[9].start)
+        self.event.add_exdate(occurrences[5].start)
+        self.event.save()
+        self.last_start = occurrences[6].start
+
+    def test_command(self):
+        call_command('calendarium_compact', dry_run=True, verbosity=0)
+        self.assertEqual(Occurrence.objects.count(), 4, msg=(
+            'With ``--dry-run`` nothing should be deleted.'))
+
+        occurrences = Event.objects.get_occurrences(
+            self.start, self.start + timedelta(days=10))
+        call_command('calendarium_compact', batch_size=1, verbosity=0)
+        self.assertEqual(
+            list(Occurrence.objects.values_list('title', flat=True)),
+            ['changed'], msg=(
+                'No-op and trailing cancelled occurrences should be deleted.'))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.end_recurring_period, self.last_start,
+                         msg=('The series should end with its last occurrence'
+                              ' instead of cancellations.'))
+        self.assertEqual(len(self.event.get_exdates()), 1, msg=(
+            'Only the trailing exception dates should be removed.'))
+        self.assertEqual(
+            [occ.start for occ in Event.objects.get_occurrences(
+                self.start, self.start + timedelta(days=10))],
+            [occ.start for occ in occurrences], msg=(
+                'The occurrences should stay the same.'))
+
+    def test_helpers(self):
+        event = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), rule__frequency='WEEKLY',
+            rule__params=None,
+            end_recurring_period=self.start + timedelta(weeks=500))
+        late = self.start + timedelta(weeks=480)
+        self.assertTrue(is_generated(event, late, late + timedelta(hours=1)))
+        self.assertFalse(is_generated(
+            event, late + timedelta(days=1),
+            late + timedelta(days=1, hours=1)), msg=(
+                'Dates between the ones of the rule should not be generated.'))
+        cancelled = set(late + timedelta(weeks=weeks) for weeks in range(21))
+        self.assertEqual(
+            get_series_end(event, cancelled), late - timedelta(weeks=1),
+            msg=('Should find the last start before a long run of'
+                 ' cancellations.'))
+
+
+ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:weekly
+SUMMARY:Weekly
+DESCRIPTION:First line\\nsecond
+  line
+DTSTART:20160104T100000Z
+DTEND:20160104T110000Z
+RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL=20160201T100000Z
+EXDATE:20160111T100000Z
+BEGIN:VALARM
+ACTION:DISPLAY
+DESCRIPTION:Reminder
+END:VALARM
+END:VEVENT
+BEGIN:VEVENT
+UID:weekly
+RECURRENCE-ID:20160118T100000Z
+SUMMARY:Moved
+DTSTART:20160119T100000Z
+DTEND:20160119T110000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:weekly
+RECURRENCE-ID:20160125T100000Z
+STATUS:CANCELLED
+DTSTART:20160125T100000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:other
+SUMMARY:Other
+DTSTART;TZID=Europe/Berlin:20160105T100000
+DURATION:PT2H
+RRULE:FREQ=WEEKLY;BYDAY=MO
+END:VEVENT
+BEGIN:VEVENT
+UID:single
+SUMMARY:All day
+DTSTART;VALUE=DATE:20160110
+END:VEVENT
+BEGIN:VEVENT
+UID:hourly
+SUMMARY:Unsupported
+DTSTART:20160110T100000Z
+RRULE:FREQ=HOURLY
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+class ImportIcsTestCase(TestCase):
+    """Tests for the ``calendarium_import_ics`` command."""
+    longMessage = True
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.ics')
+        with os.fdopen(handle, 'w') as ics_file:
+            ics_file.write(ICS)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_command(self):
+        call_command(
+            'calendarium_import_ics', self.path, batch_size=1, verbosity=0)
+        self.assertEqual(Event.objects.count(), 3, msg=(
+            'All events with a supported rule should be imported.'))
+        self.assertEqual(Rule.objects.count(), 1, msg=(
+            'Equal rules should only be created once.'))
+
+        event = Event.objects.get(title='Weekly')
+        self.assertEqual(event.description, 'First line\nsecond line', msg=(
+            'Folded lines and escaped text should be read.'))
+        self.assertEqual(
+            event.end_recurring_period,
+            timezone.datetime(2016, 2, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(
+            event.exdates, '20160111T100000Z,20160125T100000Z', msg=(
+                'Exception dates and cancelled overrides should be stored'
+                ' as exdates.'))
+        occurrence = event.occurrences.get()
+        self.assertEqual(occurrence.title, 'Moved')
+        self.assertEqual(
+            occurrence.original_start,
+            timezone.datetime(2016, 1, 18, 10, tzinfo=timezone.utc))
+        days = [occ.start.day for occ in event.get_occurrences(
+            event.start, event.end_recurring_period + timedelta(hours=1))]
+        self.assertEqual(days, [4, 19, 1], msg=(
+            'The imported series should generate its occurrences.'))
+
+        other = Event.objects.get(title='Other')
+        self.assertEqual(
+            other.start,
+            timezone.datetime(2016, 1, 5, 9, tzinfo=timezone.utc), msg=(
+                'Times with a TZID should be converted.'))
+        self.assertEqual(other.end - other.start, timedelta(hours=2))
+        self.assertIsNotNone(other.next_occurrence_start, msg=(
+            'Bulk created events should get their next occurrence.'))
+
+        single = Event.objects.get(title='All day')
+        self.assertIsNone(single.rule)
+        self.assertEqual(single.end - single.start, timedelta(days=1))
+
+    @patch('calendarium.models.CHANGE_LOG', True)
+    def test_change_log(self):
+        call_command('calendarium_import_ics', self.path, verbosity=0)
+        self.assertEqual(
+            Change.objects.filter(model=Change.CALENDAR).count(), 1, msg=(
+                'Bulk imports should be logged as change of the calendar.'))
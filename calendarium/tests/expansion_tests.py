@@ -0,0 +1,108 @@
+"""Tests for the expansion of events in the database."""
+import json
+
+from django.test import TestCase
+from django.utils.timezone import datetime, timedelta, utc
+
+from mixer.backend.django import mixer
+
+from ..expansion import count_occurrences, get_sql_step, split_events
+from ..models import Event
+
+
+class CountOccurrencesTestCase(TestCase):
+    """Tests for the ``count_occurrences`` function."""
+    longMessage = True
+
+    def setUp(self):
+        self.start = datetime(2020, 3, 1, tzinfo=utc)
+        self.end = datetime(2020, 6, 1, tzinfo=utc)
+        self.category = mixer.blend('calendarium.EventCategory')
+        first = datetime(2020, 1, 6, 10, tzinfo=utc)
+
+        def blend(frequency, params=None, **kwargs):
+            kwargs.setdefault('start', first)
+            kwargs.setdefault('end', kwargs['start'] + timedelta(hours=1))
+            kwargs.setdefault('end_recurring_period', None)
+            kwargs.setdefault('category', self.category)
+            rule = None
+            if frequency:
+                rule = mixer.blend(
+                    'calendarium.Rule', frequency=frequency,
+                    params=json.dumps(params) if params else None)
+            return mixer.blend(
+                'calendarium.Event', rule=rule, calendar=None, **kwargs)
+
+        self.daily = blend(
+            'DAILY', end_recurring_period=datetime(2020, 4, 10, tzinfo=utc))
+        self.weekly = blend('WEEKLY', {'interval': 2})
+        self.monthly = blend('MONTHLY')
+        self.monthly_31 = blend(
+            'MONTHLY', start=datetime(2020, 1, 31, 10, tzinfo=utc))
+        self.byweekday = blend('WEEKLY', {'byweekday': [0, 2]})
+        self.single = blend(None, start=datetime(2020, 4, 1, 10, tzinfo=utc),
+                            category=None)
+        cancelled = datetime(2020, 3, 2, 10, tzinfo=utc)
+        mixer.blend(
+            'calendarium.Occurrence', event=self.weekly,
+            original_start=cancelled,
+            original_end=cancelled + timedelta(hours=1),
+            start=cancelled, end=cancelled + timedelta(hours=1),
+            cancelled=True)
+        self.monthly.add_exdate(datetime(2020, 4, 6, 10, tzinfo=utc))
+        self.monthly.save()
+        moved = datetime(2020, 3, 3, 10, tzinfo=utc)
+        mixer.blend(
+            'calendarium.Occurrence', event=self.daily, original_start=moved,
+            original_end=moved + timedelta(hours=1),
+            start=moved + timedelta(hours=3),
+            end=moved + timedelta(hours=4), cancelled=False)
+
+    def test_get_sql_step(self):
+        self.assertEqual(get_sql_step(self.weekly.rule), (14, 0))
+        self.assertEqual(get_sql_step(self.monthly.rule), (0, 1))
+        self.assertIsNone(get_sql_step(self.byweekday.rule), msg=(
+            'Rules with BY* parameters should not be expanded in SQL.'))
+
+    def test_split_events(self):
+        sql_events, python_events, steps = split_events(Event.objects.all())
+        self.assertEqual(
+            set(python_events), set([self.monthly_31, self.byweekday]), msg=(
+                'Complex rules and monthly rules after the 28th should fall'
+                ' back to Python.'))
+        self.assertEqual(sql_events.count(), 4)
+
+    def test_count_occurrences(self):
+        expected = {}
+        for event in Event.objects.all():
+            expected[event.pk] = len(list(
+                event.get_occurrences(self.start, self.end)))
+        self.assertEqual(
+            Event.objects.get_occurrence_counts(self.start, self.end),
+            sum(expected.values()), msg=(
+                'The database should count the same occurrences as Python.'))
+        self.assertEqual(
+            Event.objects.get_occurrence_counts(
+                self.start, self.end, group_by='category'),
+            {self.category.pk: sum(expected.values()) - 1, None: 1})
+        counts = Event.objects.get_occurrence_counts(
+            self.start, self.end, group_by='id')
+        self.assertEqual(counts[self.weekly.pk], expected[self.weekly.pk])
+        self.assertEqual(counts[self.monthly.pk], 2, msg=(
+            'Exception dates should not be counted.'))
+
+    def test_count_multi_day_occurrences(self):
+        start = datetime(2020, 4, 20, 10, tzinfo=utc)
+        event = mixer.blend(
+            'calendarium.Event', rule=None, calendar=None, category=None,
+            start=start, end=start + timedelta(days=3))
+        sql_events, python_events, steps = split_events(
+            Event.objects.filter(pk=event.pk))
+        self.assertEqual(list(python_events), [event], msg=(
+            'Events without a rule spanning several days should fall back'
+            ' to Python.'))
+        self.assertEqual(
+            count_occurrences(
+                Event.objects.filter(pk=event.pk), self.start, self.end),
+            len(list(event.get_occurrences(self.start, self.end))), msg=(
+                'A multi-day event should be counted once for each day.'))
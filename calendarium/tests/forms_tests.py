@@ -20,6 +20,7 @@ class OccurrenceFormTestCase(TestCase):
     def setUp(self):
         # single, not recurring event
         self.event = mixer.blend('calendarium.Event', rule=None,
+                                 start=now(), end=now() + timedelta(hours=1),
                                  end_recurring_period=None)
         self.event_occurrence = next(self.event.get_occurrences(
             self.event.start))
@@ -31,7 +32,7 @@ class OccurrenceFormTestCase(TestCase):
             params=json.dumps({'byweekday': 0}))
         self.rec_event = mixer.blend(
             'calendarium.Event',
-            rule=self.rule, start=now(),
+            rule=self.rule, start=now(), end=now() + timedelta(hours=1),
             end_recurring_period=now() + timedelta(days=41),
         )
         self.rec_occurrence_list = [
@@ -133,3 +134,58 @@ class OccurrenceFormTestCase(TestCase):
                 'The end recurring period of the new event should be the'
                 ' old end recurring period of the old event.'))
         # -> should yield 2 events, one newly created one altered
+
+    def test_save_series(self):
+        """Test if ``OccurrenceForm`` changes series with a few queries."""
+        for occ in self.rec_occurrence_list[:4]:
+            occ.title = 'moved'
+            occ.save()
+        occ_to_use = Occurrence.objects.get(pk=self.rec_occurrence_list[0].pk)
+        data = model_to_dict(occ_to_use)
+        initial = data.copy()
+        data.update({
+            'decision': OCCURRENCE_DECISIONS['all'],
+            'start': occ_to_use.start + timedelta(hours=1),
+            'end': occ_to_use.end + timedelta(hours=1)})
+        form = OccurrenceForm(data=data, initial=initial, instance=occ_to_use)
+        self.assertTrue(form.is_valid(), msg=(
+            'The OccurrenceForm should be valid'))
+        with self.assertNumQueries(6):
+            # a single update for all persistent occurrences
+            form.save()
+        for occ in self.rec_occurrence_list[:4]:
+            self.assertEqual(
+                Occurrence.objects.get(pk=occ.pk).start,
+                occ.start + timedelta(hours=1), msg=(
+                    'All persistent occurrences should be moved one hour.'))
+
+        occ_to_use = Occurrence.objects.get(
+            pk=self.rec_occurrence_list[2].pk)
+        data = model_to_dict(occ_to_use)
+        initial = data.copy()
+        data.update({
+            'decision': OCCURRENCE_DECISIONS['following'],
+            'start': occ_to_use.start + timedelta(hours=1),
+            'end': occ_to_use.end + timedelta(hours=1)})
+        form = OccurrenceForm(data=data, initial=initial, instance=occ_to_use)
+        self.assertTrue(form.is_valid(), msg=(
+            'The OccurrenceForm should be valid'))
+        form.save()
+        new_event = Event.objects.exclude(
+            pk__in=[self.rec_event.pk, self.event.pk]).get()
+        self.assertEqual(
+            Occurrence.objects.filter(event=new_event).count(), 2, msg=(
+                'The following occurrences should belong to the new event.'))
+        self.assertEqual(
+            Occurrence.objects.filter(event=self.rec_event).count(), 2, msg=(
+                'The previous occurrences should stay with the old event.'))
+        occ_list = list(new_event.get_occurrences(
+            new_event.start, new_event.end_recurring_period))
+        self.assertEqual(len([occ for occ in occ_list if occ.pk]), 2, msg=(
+            'The re-assigned occurrences should be part of the new series.'))
+        self.assertEqual(
+            len(occ_list),
+            len(set((occ.start - new_event.start).days // 7
+                    for occ in occ_list)), msg=(
+                'The re-assigned occurrences should replace the generated'
+                ' ones of the new series.'))
@@ -0,0 +1,217 @@
+"""Tests for the grid of the ``calendarium`` app."""
+import calendar
+from threading import Thread
+
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import translation
+from django.utils.timezone import datetime, timedelta, utc
+
+from mixer.backend.django import mixer
+
+from .. import views
+from ..grid import (
+    OccurrenceGrid,
+    get_month_skeleton,
+    get_weekday_headers,
+    render_month_grid,
+)
+from ..models import Event
+from ..utils import _get_url_pattern, format_url, now
+
+
+class OccurrenceGridTestCase(TestCase):
+    """Tests for the ``OccurrenceGrid`` class."""
+    longMessage = True
+
+    def setUp(self):
+        self.start = datetime(2016, 2, 1, tzinfo=utc)
+        self.end = datetime(2016, 3, 1, tzinfo=utc)
+        # a weekly series, whose occurrences last two days until midnight
+        self.series = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(days=2),
+            rule__frequency='WEEKLY', rule__params=None,
+            end_recurring_period=None)
+        # a single event over three days
+        self.single = mixer.blend(
+            'calendarium.Event', rule=None,
+            start=self.start + timedelta(days=9),
+            end=self.start + timedelta(days=11, hours=12))
+
+    def get_titles(self, grid, day):
+        return [occ.event.title for occ in grid.get_occurrences(
+            self.start + timedelta(days=day - 1))]
+
+    def test_grid(self):
+        occurrences = (
+            list(self.series.get_occurrences(self.start, self.end))
+            + list(self.single.get_occurrences(self.start, self.end)))
+        with self.assertNumQueries(0):
+            grid = OccurrenceGrid(occurrences, self.start, self.end)
+        self.assertEqual(self.get_titles(grid, 1), [self.series.title])
+        self.assertEqual(self.get_titles(grid, 2), [self.series.title], msg=(
+            'Occurrences should span all of their days.'))
+        self.assertEqual(self.get_titles(grid, 3), [], msg=(
+            'Occurrences should not cover the day they end at midnight.'))
+        self.assertEqual(
+            [self.get_titles(grid, day) for day in [10, 11, 12, 13]],
+            [[self.single.title]] * 3 + [[]], msg=(
+                'Events without a rule should appear once per day.'))
+        self.assertEqual(self.get_titles(grid, 29), [self.series.title])
+        self.assertEqual(grid.get_occurrences(self.end), [], msg=(
+            'Days after the grid should be empty.'))
+        self.assertTrue(
+            OccurrenceGrid([], self.start, self.end).is_today(now()))
+        self.assertFalse(grid.is_today(self.start))
+
+
+class GetCellTestCase(TestCase):
+    """Tests for the ``OccurrenceGrid.get_cell`` method."""
+    longMessage = True
+
+    def test_method(self):
+        start = datetime(2016, 2, 1, 9, tzinfo=utc)
+        for hour in range(3):
+            mixer.blend(
+                'calendarium.Event', rule=None,
+                start=start + timedelta(hours=hour),
+                end=start + timedelta(hours=hour, minutes=30))
+        end = start + timedelta(days=1)
+        grid = OccurrenceGrid(
+            Event.objects.get_occurrences(start, end), start, end)
+        cell = grid.get_cell(start, 2)
+        self.assertEqual((len(cell), cell.more), (2, 1), msg=(
+            'Only the given amount of occurrences should be shown.'))
+        cell = grid.get_cell(start)
+        self.assertEqual((len(cell), cell.more), (3, 0), msg=(
+            'Without a limit all occurrences should be shown.'))
+
+
+class GetMonthSkeletonTestCase(TestCase):
+    """Tests for the ``get_month_skeleton`` function."""
+    longMessage = True
+
+    def test_function(self):
+        self.assertEqual(get_month_skeleton(2016, 2, 0)[0], (
+            1, 2, 3, 4, 5, 6, 7))
+        self.assertEqual(get_month_skeleton(2016, 2, 6)[0], (
+            0, 1, 2, 3, 4, 5, 6), msg=(
+                'The weeks should start with the given weekday.'))
+        self.assertIs(
+            get_month_skeleton(2016, 2, 0), get_month_skeleton(2016, 2, 0),
+            msg=('Skeletons should be cached.'))
+
+        results = {}
+
+        def build(firstweekday):
+            for _ in range(200):
+                results.setdefault(firstweekday, set()).add(
+                    get_month_skeleton(2016, 2, firstweekday))
+                get_month_skeleton.cache_clear()
+
+        threads = [Thread(target=build, args=(day,)) for day in [0, 6]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            [len(results[0]), len(results[6])], [1, 1], msg=(
+                'Concurrent grids should not influence each other.'))
+        self.assertEqual(calendar.firstweekday(), 0, msg=(
+            'The global state of the calendar module should be untouched.'))
+
+
+class GetWeekdayHeadersTestCase(TestCase):
+    """Tests for the ``get_weekday_headers`` function."""
+    longMessage = True
+
+    def test_function(self):
+        with translation.override('en'):
+            self.assertEqual(get_weekday_headers(6)[:2], ('Sunday', 'Monday'))
+        with translation.override('de'):
+            self.assertEqual(get_weekday_headers(0)[0], 'Montag', msg=(
+                'The headers should be cached per language.'))
+
+
+class RenderMonthGridTestCase(TestCase):
+    """Tests for the ``render_month_grid`` function."""
+    longMessage = True
+
+    def test_function(self):
+        start = now().replace(day=1, hour=9)
+        category = mixer.blend('calendarium.EventCategory', color='00ff00')
+        mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=5),
+            category=category, title='Meet <Alice> & "Bob" for a long talk')
+        mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(days=2),
+            rule=None, category=None)
+        view = views.MonthView(fast_render=False, cell_limit=1)
+        view.setup(RequestFactory().get('/'), year=now().year,
+                   month=now().month)
+        view.year, view.month, view.calendar = now().year, now().month, None
+        ctx = view.get_context_data()
+        self.assertEqual(ctx['grid_categories'], [category])
+        html = render_month_grid(
+            ctx['month'], ctx['date'], ctx['weekdays'], ctx['grid_categories'])
+        self.assertEqual(
+            html, render_to_string(
+                'calendarium/partials/calendar_month_grid.html', ctx), msg=(
+                'The fast path should render the same HTML as the template.'))
+        self.assertIn('calendarium-category-{0}'.format(category.pk), html)
+        self.assertIn('calendarium-more', html, msg=(
+            'Crowded cells should link to their further occurrences.'))
+        self.assertNotIn('style="', html, msg=(
+            'Colors should be set by CSS classes, not inline styles.'))
+
+        calendar = mixer.blend('calendarium.Calendar', slug='team')
+        view.calendar = ctx['current_calendar'] = calendar
+        html = render_month_grid(
+            ctx['month'], ctx['date'], ctx['weekdays'], ctx['grid_categories'],
+            calendar=calendar)
+        self.assertEqual(
+            html, render_to_string(
+                'calendarium/partials/calendar_month_grid.html', ctx))
+        self.assertIn(reverse('calendar_week', kwargs={
+            'calendar': 'team', 'year': ctx['date'].isocalendar()[0],
+            'week': ctx['date'].replace(day=1).isocalendar()[1]}), html, msg=(
+                'The links should be scoped by the calendar.'))
+        for unscoped in ['href="/event/', 'week-link"><a href="/{0}/',
+                         'calendarium-date" href="/{0}/']:
+            self.assertNotIn(unscoped.format(ctx['date'].year), html)
+
+
+class FormatURLTestCase(TestCase):
+    """Tests for the ``format_url`` function."""
+    longMessage = True
+
+    def test_function(self):
+        for viewname, kwargs in [
+                ('calendar_day', {'year': 2016, 'month': 2, 'day': 9}),
+                ('calendar_week', {'year': 2016, 'week': 5}),
+                ('calendar_occurrence_detail', {
+                    'pk': 12, 'year': 2016, 'month': 12, 'day': 31}),
+                ('calendar_day', {
+                    'calendar': 'team', 'year': 2016, 'month': 2,
+                    'day': 9})]:
+            self.assertEqual(
+                format_url(viewname, **kwargs),
+                reverse(viewname, kwargs=kwargs), msg=(
+                    'Should return the reversed URL of {0}.'.format(
+                        viewname)))
+
+    @override_settings(ROOT_URLCONF='calendarium.tests.i18n_urls')
+    def test_i18n_patterns(self):
+        _get_url_pattern.cache_clear()
+        self.addCleanup(_get_url_pattern.cache_clear)
+        for language in ['en', 'de']:
+            with translation.override(language):
+                self.assertEqual(
+                    format_url('calendar_week', year=2016, week=5),
+                    '/{0}/2016/week/5/'.format(language), msg=(
+                        'The URL should have the prefix of the current'
+                        ' language.'))
@@ -0,0 +1,8 @@
+"""URLs to test the ``calendarium`` URLs inside of ``i18n_patterns``."""
+from django.conf.urls import include, url
+from django.conf.urls.i18n import i18n_patterns
+
+
+urlpatterns = i18n_patterns(
+    url(r'^', include('calendarium.urls')),
+)
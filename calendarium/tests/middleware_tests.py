@@ -0,0 +1,57 @@
+"""Tests for the middlewares of the ``calendarium`` app."""
+import time
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from mock import patch
+
+from .. import utils
+from ..middleware import PinReadsMiddleware
+
+
+class PinReadsMiddlewareTestCase(TestCase):
+    """Tests for the ``PinReadsMiddleware`` middleware."""
+    longMessage = True
+
+    def setUp(self):
+        patcher = patch('calendarium.settings.PIN_READS_AFTER_WRITE', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('calendarium.settings.READ_DB', 'replica')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.read_dbs = []
+
+    def get_response(self, request):
+        self.read_dbs.append(utils.get_read_db())
+        if request.method == 'POST':
+            utils.pin_reads_to_primary()
+        return HttpResponse()
+
+    def test_middleware(self):
+        middleware = PinReadsMiddleware(self.get_response)
+        response = middleware(RequestFactory().post('/'))
+        cookie = response.cookies.get(PinReadsMiddleware.cookie_name)
+        self.assertTrue(cookie, msg=(
+            'A pin set during the request should be stored in a cookie.'))
+        self.assertEqual(utils.get_read_db(), 'replica', msg=(
+            'The pin should not outlast the request in the thread.'))
+
+        request = RequestFactory().get('/')
+        request.COOKIES[PinReadsMiddleware.cookie_name] = cookie.value
+        response = middleware(request)
+        self.assertEqual(self.read_dbs[-1], 'default', msg=(
+            'The next request of the client should read from the primary.'))
+        self.assertNotIn(PinReadsMiddleware.cookie_name, response.cookies)
+
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(self.read_dbs[-1], 'replica', msg=(
+            'Other clients should read from the replica.'))
+
+        request = RequestFactory().get('/')
+        request.COOKIES[PinReadsMiddleware.cookie_name] = str(
+            time.time() - 1)
+        middleware(request)
+        self.assertEqual(self.read_dbs[-1], 'replica', msg=(
+            'An expired pin should be ignored.'))
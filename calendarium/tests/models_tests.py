@@ -1,12 +1,25 @@
 """Tests for the models of the ``calendarium`` app."""
+from django.db import connection
 from django.test import TestCase
-from django.utils.timezone import timedelta
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import datetime, timedelta, utc
 from django.template.defaultfilters import slugify
 
 from mixer.backend.django import mixer
-
-from ..models import Event, EventCategory, Occurrence, Rule
-from ..utils import now
+from mock import patch
+
+from ..models import (
+    ArchivedEvent,
+    ArchivedEventRelation,
+    ArchivedOccurrence,
+    Change,
+    Event,
+    EventCategory,
+    EventRelation,
+    Occurrence,
+    Rule,
+)
+from ..utils import is_next_occurrence_update_skipped, now
 
 
 class EventModelManagerTestCase(TestCase):
@@ -36,6 +49,334 @@ class EventModelManagerTestCase(TestCase):
             '``get_occurrences`` should return the correct amount of'
             ' occurrences for one day.'))
 
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), using='default')
+        self.assertEqual(len(occurrences), 1, msg=(
+            '``get_occurrences`` should read from the given database.'))
+
+    def test_get_occurrences_for_calendar(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now(),
+            end=now() + timedelta(hours=1), calendar=calendar)
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar)
+        self.assertEqual(len(occurrences), 1, msg=(
+            'Only the occurrences of the given calendar should be returned.'))
+        self.assertEqual(len(Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7))), 2, msg=(
+                'Without a calendar, all occurrences should be returned.'))
+
+    def test_get_upcoming(self):
+        soon = mixer.blend(
+            'calendarium.Event', rule=None, start=now() + timedelta(hours=2),
+            end=now() + timedelta(hours=3))
+        later = mixer.blend(
+            'calendarium.Event', rule=None, start=now() + timedelta(days=2),
+            end=now() + timedelta(days=3))
+        self.assertEqual(list(Event.objects.get_upcoming()), [soon, later])
+        self.assertEqual(list(Event.objects.get_upcoming(
+            until=now() + timedelta(days=1))), [soon], msg=(
+                'Should only return the events happening before ``until``.'))
+
+    def test_materialize(self):
+        start = now().replace(hour=0, minute=0)
+        end = start + timedelta(days=5)
+        calendar = mixer.blend('calendarium.Calendar')
+        event = mixer.blend(
+            'calendarium.Event', start=now(), end=now() + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None, calendar=calendar,
+            end_recurring_period=now() + timedelta(days=9))
+        override = list(event.get_occurrences(
+            now() + timedelta(days=1), now() + timedelta(days=2)))[0]
+        override.title = 'override'
+        override.save()
+        result = Event.objects.materialize(
+            start, end, calendar=calendar, batch_size=2)
+        occurrences = Event.objects.get_occurrences(
+            start, end, calendar=calendar)
+        self.assertEqual(result, len(occurrences) - 1, msg=(
+            'Should persist all occurrences, that were not persisted.'))
+        self.assertTrue(all(occ.pk for occ in occurrences))
+        self.assertEqual(Occurrence.objects.get(pk=override.pk).title,
+                         'override', msg=(
+                             'Should leave persisted occurrences untouched.'))
+        self.assertEqual(Event.objects.materialize(
+            start, end, calendar=calendar), 0, msg=(
+                'Should not create any duplicates.'))
+        self.assertEqual(event.occurrences.count(), len(occurrences))
+
+    def test_materialize_queries(self):
+        start = now().replace(hour=0, minute=0)
+        end = start + timedelta(days=5)
+        query_counts = []
+        for amount in [1, 4]:
+            calendar = mixer.blend('calendarium.Calendar')
+            for index in range(amount):
+                mixer.blend(
+                    'calendarium.Event', start=now(),
+                    end=now() + timedelta(hours=1), rule__frequency='DAILY',
+                    rule__params=None, calendar=calendar,
+                    end_recurring_period=now() + timedelta(days=9))
+            with CaptureQueriesContext(connection) as queries:
+                Event.objects.materialize(start, end, calendar=calendar)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1], msg=(
+            'The persisted occurrences of all events should be fetched at'
+            ' once.'))
+
+    @patch('calendarium.models.CACHE_TIMEOUT', 60)
+    def test_get_occurrences_cached(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        other_calendar = mixer.blend('calendarium.Calendar')
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar)
+        self.assertEqual(len(occurrences), 0)
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now(),
+            end=now() + timedelta(hours=1), calendar=other_calendar)
+        with self.assertNumQueries(0):
+            occurrences = Event.objects.get_occurrences(
+                now(), now() + timedelta(days=7), calendar=calendar)
+        self.assertEqual(len(occurrences), 0, msg=(
+            'Changes of another calendar should not invalidate the cache.'))
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now(),
+            end=now() + timedelta(hours=1), calendar=calendar)
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar)
+        self.assertEqual(len(occurrences), 1, msg=(
+            'Changes of the calendar should invalidate its cache.'))
+
+        event = Event.objects.get(calendar=calendar)
+        event.calendar = other_calendar
+        event.save()
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar)
+        self.assertEqual(len(occurrences), 0, msg=(
+            'Moving an event should invalidate the cache of its old'
+            ' calendar.'))
+
+    def test_get_occurrences_prefetch_relations(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        user = mixer.blend('auth.User')
+        event = mixer.blend(
+            'calendarium.Event', start=now(), end=now() + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=now() + timedelta(days=5),
+            calendar=calendar)
+        for relation_type, content_object in [
+                ('speaker', user), ('speaker', user), ('venue', calendar)]:
+            EventRelation.objects.create(
+                event=event, content_object=content_object,
+                relation_type=relation_type)
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar,
+            prefetch_relations=True)
+        self.assertGreater(len(occurrences), 1)
+        with self.assertNumQueries(0, msg=(
+                'Relations and content objects should be prefetched.')):
+            for occurrence in occurrences:
+                self.assertEqual(occurrence.event.relation_counts, {
+                    'speaker': 2, 'venue': 1})
+                self.assertEqual([
+                    relation.content_object for relation in
+                    occurrence.event.get_relations('speaker')], [user, user])
+                self.assertEqual(
+                    occurrence.event.get_relations('venue')[0].content_object,
+                    calendar)
+
+    @patch('calendarium.models.CACHE_TIMEOUT', 60)
+    def test_get_occurrences_prefetch_relations_cached(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        event = mixer.blend(
+            'calendarium.Event', start=now(), end=now() + timedelta(hours=1),
+            rule=None, calendar=calendar)
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar,
+            prefetch_relations=True)
+        self.assertEqual(occurrences[0].event.relation_counts, {})
+        relation = EventRelation.objects.create(
+            event=event, content_object=calendar, relation_type='venue')
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar,
+            prefetch_relations=True)
+        self.assertEqual(occurrences[0].event.relation_counts, {'venue': 1},
+                         msg=('New relations should invalidate the cache.'))
+        relation.delete()
+        occurrences = Event.objects.get_occurrences(
+            now(), now() + timedelta(days=7), calendar=calendar,
+            prefetch_relations=True)
+        self.assertEqual(occurrences[0].event.relation_counts, {}, msg=(
+            'Deleted relations should invalidate the cache.'))
+
+    def test_get_occurrences_for_categories(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        parent = mixer.blend('calendarium.EventCategory', parent=None)
+        child = mixer.blend('calendarium.EventCategory', parent=parent)
+        other = mixer.blend('calendarium.EventCategory', parent=None)
+        for category in [parent, child, other, None]:
+            mixer.blend(
+                'calendarium.Event', rule=None, start=now(),
+                end=now() + timedelta(hours=1), calendar=calendar,
+                category=category)
+        with self.assertNumQueries(3, msg=(
+                'The union of the categories should be queried at once.')):
+            occurrences = Event.objects.get_occurrences(
+                now(), now() + timedelta(days=1), [parent, other],
+                calendar=calendar)
+        self.assertEqual(len(occurrences), 3, msg=(
+            'Should return the occurrences of all categories and their sub'
+            ' categories.'))
+        self.assertEqual(
+            sorted([occ.event.category_id, [
+                category.pk for category in occ.matched_categories]]
+                for occ in occurrences),
+            sorted([
+                [parent.pk, [parent.pk]], [child.pk, [parent.pk]],
+                [other.pk, [other.pk]]]), msg=(
+                    'Each occurrence should be tagged with its categories.'))
+
+    def test_get_occurrences_for_windows(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        start = now().replace(hour=10, minute=0, second=0, microsecond=0)
+        mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=30),
+            calendar=calendar)
+        # an event over midnight, that reaches into the first window
+        mixer.blend(
+            'calendarium.Event', rule=None,
+            start=start + timedelta(days=2, hours=12),
+            end=start + timedelta(days=2, hours=16), calendar=calendar)
+        day = start.replace(hour=0)
+        windows = [
+            (day + timedelta(days=3), day + timedelta(days=4)),
+            (day, day + timedelta(days=1)),
+            (day + timedelta(days=20), day + timedelta(days=22)),
+        ]
+        with self.assertNumQueries(2, msg=(
+                'The events and their occurrences should be fetched once.')):
+            results = Event.objects.get_occurrences_for_windows(
+                windows, calendar=calendar)
+        self.assertEqual([len(result) for result in results], [2, 1, 2], msg=(
+            'Should return the occurrences of each window in the given'
+            ' order, including the ones reaching into a window.'))
+        for (window_start, window_end), result in zip(windows, results):
+            self.assertEqual(
+                [occ.start for occ in result],
+                [occ.start for occ in Event.objects.get_occurrences(
+                    window_start, window_end, calendar=calendar)], msg=(
+                        'Each window should equal a single query.'))
+        self.assertEqual(
+            Event.objects.get_occurrences_for_windows([]), [])
+
+    def test_get_upcoming_occurrences(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        start = datetime(2016, 1, 1, 9, tzinfo=utc)
+        daily = mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None, calendar=calendar,
+            end_recurring_period=start + timedelta(days=20))
+        mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=2),
+            rule__frequency='WEEKLY', rule__params=None, calendar=calendar,
+            end_recurring_period=start + timedelta(days=60))
+        mixer.blend(
+            'calendarium.Event', rule=None, calendar=calendar,
+            start=start + timedelta(days=5, hours=3),
+            end=start + timedelta(days=5, hours=4))
+        moved = list(daily.get_occurrences(
+            start + timedelta(days=3), start + timedelta(days=4)))[0]
+        moved.start = start + timedelta(days=30)
+        moved.end = moved.start + timedelta(hours=1)
+        moved.save()
+        daily.add_exdate(start + timedelta(days=4))
+        daily.save()
+
+        after = start + timedelta(days=2)
+        expected = sorted(
+            (occ.start, occ.event_id) for occ in Event.objects.get_occurrences(
+                start, start + timedelta(days=90), calendar=calendar)
+            if occ.start >= after)
+        keys = []
+        cursor = (after, 0)
+        while cursor:
+            with self.assertNumQueries(2, msg=(
+                    'Each page should cost the same amount of queries.')):
+                occurrences, cursor = Event.objects.get_upcoming_occurrences(
+                    4, cursor=cursor, calendar=calendar)
+            self.assertLessEqual(len(occurrences), 4)
+            keys.extend((occ.start, occ.event_id) for occ in occurrences)
+        self.assertEqual(keys, expected, msg=(
+            'The pages should contain all occurrences after the cursor in'
+            ' their order.'))
+        self.assertIn((moved.start, daily.pk), keys)
+        self.assertNotIn((start + timedelta(days=4), daily.pk), keys)
+
+    def test_iter_occurrences(self):
+        start = datetime(2016, 1, 1, 9, tzinfo=utc)
+        daily = mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=20))
+        mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(days=3),
+            rule__frequency='WEEKLY', rule__params=None,
+            end_recurring_period=start + timedelta(days=60))
+        period_start = start + timedelta(days=8)
+        period_end = start + timedelta(days=15)
+        occurrences = list(Event.objects.iter_occurrences(
+            period_start, period_end))
+        self.assertEqual(
+            [occ.start for occ in occurrences],
+            sorted(occ.start for occ in occurrences), msg=(
+                'The occurrences should be yielded in their order.'))
+        self.assertEqual(
+            sorted((occ.start, occ.event_id) for occ in occurrences),
+            sorted((occ.start, occ.event_id)
+                   for occ in Event.objects.get_occurrences(
+                       period_start, period_end)), msg=(
+                'The same occurrences as of get_occurrences should be'
+                ' yielded.'))
+        self.assertIn(start + timedelta(days=7), [
+            occ.start for occ in occurrences], msg=(
+                'Occurrences, that started before the period, but reach into'
+                ' it, should be yielded.'))
+        moved_in = daily.get_occurrence(start + timedelta(days=17))
+        moved_in.start = moved_in.end = start + timedelta(days=10, hours=2)
+        moved_in.save()
+        moved_out = daily.get_occurrence(start + timedelta(days=12))
+        moved_out.start = moved_out.end = start + timedelta(days=18)
+        moved_out.save()
+        starts = [
+            occ.start for occ in Event.objects.iter_occurrences(
+                period_start, period_end) if occ.event_id == daily.pk]
+        self.assertIn(moved_in.start, starts, msg=(
+            'Occurrences, that were moved into the period, should be'
+            ' yielded.'))
+        self.assertNotIn(moved_out.original_start, starts, msg=(
+            'Occurrences, that were moved out of the period, should not be'
+            ' yielded.'))
+
+
+class CalendarTestCase(TestCase):
+    """Tests for the ``Calendar`` model."""
+    longMessage = True
+
+    def setUp(self):
+        self.calendar = mixer.blend('calendarium.Calendar', name='Sales')
+
+    def test_model(self):
+        self.assertEqual(str(self.calendar), 'Sales')
+        self.assertIn(self.calendar.slug, self.calendar.get_absolute_url())
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now(),
+            end=now() + timedelta(hours=1), calendar=self.calendar)
+        self.assertEqual(len(self.calendar.get_occurrences(
+            now(), now() + timedelta(days=1))), 1)
+
 
 class EventTestCase(TestCase):
     """Tests for the ``Event`` model."""
@@ -107,6 +448,18 @@ class EventTestCase(TestCase):
             'The method ``_get_occurrence_list`` did not return the expected'
             ' amount of items.'))
 
+        # a series, that ends before the period, and one with a count
+        start = datetime(2016, 1, 1, 9, tzinfo=utc)
+        ended = mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params='{"count": 3}',
+            end_recurring_period=None)
+        self.assertEqual(list(ended._get_occurrence_gen(
+            start + timedelta(days=5), start + timedelta(days=10))), [], msg=(
+                'The generator should stop, when the rule has no more dates.'))
+        self.assertEqual(len(list(ended.get_occurrences(
+            start, start + timedelta(days=10)))), 3)
+
     def test_get_occurrences(self):
         occurrence_gen = self.event.get_occurrences(
             now(), now() + timedelta(days=7))
@@ -115,6 +468,131 @@ class EventTestCase(TestCase):
             'Method ``get_occurrences`` did not output the correct amount'
             ' of occurrences.'))
 
+    def test_get_rrule_object_after(self):
+        start = datetime(2016, 1, 31, 9, tzinfo=utc)
+        for frequency, params in [
+                ('DAILY', '{"interval": 3}'),
+                ('WEEKLY', '{"interval": 2, "byweekday": [0, 3]}'),
+                ('MONTHLY', None),
+                ('MONTHLY', '{"interval": 5}'),
+                ('MONTHLY', '{"byweekday": [4], "bysetpos": [-1]}'),
+                ('YEARLY', '{"interval": 2}'),
+                ('YEARLY', '{"byeaster": 0}')]:
+            event = mixer.blend(
+                'calendarium.Event', start=start, end=start,
+                rule__frequency=frequency, rule__params=params,
+                end_recurring_period=None)
+            full = event.get_rrule_object()
+            for after in [start + timedelta(days=days) for days in [
+                    1, 29, 61, 400, 1000, 3000]]:
+                self.assertEqual(
+                    event.get_rrule_object(after=after).after(
+                        after, inc=True),
+                    full.after(after, inc=True), msg=(
+                        'The seeked {0} rule {1} should generate the same'
+                        ' dates after {2}.'.format(frequency, params, after)))
+
+    def test_get_occurrence(self):
+        start = datetime(2016, 1, 4, 9, tzinfo=utc)
+        event = mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=3650))
+        date = (start + timedelta(days=3000)).date()
+        with self.assertNumQueries(2):
+            occurrence = event.get_occurrence(date)
+        self.assertIsNone(occurrence.pk)
+        self.assertEqual(occurrence.start, start + timedelta(days=3000), msg=(
+            'Should return the generated occurrence deep into the series.'))
+
+        occurrence.start = occurrence.start + timedelta(days=1, hours=1)
+        occurrence.end = occurrence.end + timedelta(days=1, hours=1)
+        occurrence.save()
+        self.assertIsNone(event.get_occurrence(date), msg=(
+            'A moved occurrence should not be found on its original date.'))
+        self.assertEqual(
+            event.get_occurrence(date + timedelta(days=1)).start,
+            start + timedelta(days=3001), msg=(
+                'Should return the earliest occurrence of the day.'))
+        occurrence.start = occurrence.start - timedelta(hours=2)
+        occurrence.save()
+        self.assertEqual(
+            event.get_occurrence(date + timedelta(days=1)), occurrence, msg=(
+                'Should return a persisted occurrence starting earlier.'))
+
+        event.add_exdate(start + timedelta(days=5))
+        event.save()
+        self.assertIsNone(event.get_occurrence(
+            (start + timedelta(days=5)).date()))
+        self.assertIsNone(event.get_occurrence(
+            (start + timedelta(days=3651)).date()), msg=(
+                'Should respect the end of the series.'))
+
+        single = mixer.blend(
+            'calendarium.Event', rule=None, start=start,
+            end=start + timedelta(days=1, hours=3))
+        self.assertEqual(
+            single.get_occurrence(start.date() + timedelta(days=1)).start,
+            start + timedelta(days=1))
+        self.assertIsNone(single.get_occurrence(
+            start.date() + timedelta(days=2)))
+
+    def test_get_next_occurrence_start(self):
+        event = mixer.blend(
+            'calendarium.Event', start=now() - timedelta(days=3),
+            end=now() - timedelta(days=3), rule__frequency='DAILY',
+            rule__params=None, end_recurring_period=None)
+        tomorrow = event.start + timedelta(days=4)
+        self.assertEqual(
+            event.get_next_occurrence_start(now() + timedelta(hours=1)),
+            tomorrow, msg=('Should return the next date of the rule.'))
+        self.assertIn(event.next_occurrence_start, [
+            event.start + timedelta(days=3), tomorrow], msg=(
+                'The next occurrence should be stored on save.'))
+
+        mixer.blend(
+            'calendarium.Occurrence', event=event, original_start=tomorrow,
+            start=tomorrow, end=tomorrow, cancelled=True)
+        event.refresh_from_db()
+        self.assertEqual(
+            event.get_next_occurrence_start(now() + timedelta(hours=1)),
+            tomorrow + timedelta(days=1), msg=(
+                'Cancelled occurrences should be skipped.'))
+
+        event.end_recurring_period = tomorrow
+        self.assertIsNone(
+            event.get_next_occurrence_start(now() + timedelta(hours=1)),
+            msg=('Should return None if the series has ended.'))
+        self.assertIsNone(self.not_found_event.next_occurrence_start)
+
+    def test_delete_series(self):
+        mixer.cycle(5).blend('calendarium.Occurrence', event=self.event)
+        mixer.cycle(2).blend('calendarium.EventRelation', event=self.event)
+        with patch('calendarium.models.CACHE_TIMEOUT', 60), patch(
+                'calendarium.settings.BATCH_SIZE', 2), patch(
+                    'calendarium.models.invalidate_occurrence_cache') as mock:
+            self.event.delete_series()
+        self.assertEqual(mock.call_count, 1, msg=(
+            'The cache should be invalidated once for the whole series.'))
+        self.assertFalse(Event.objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(Occurrence.objects.count(), 0, msg=(
+            'All occurrences should be deleted in batches.'))
+        self.assertEqual(EventRelation.objects.count(), 0, msg=(
+            'All relations should be deleted in batches.'))
+
+    def test_exdates(self):
+        self.assertEqual(self.event.get_exdates(), [])
+        exdate = self.event.start + timedelta(days=1)
+        self.event.add_exdate(exdate)
+        self.event.add_exdate(exdate)
+        self.assertEqual(self.event.get_exdates(), [exdate], msg=(
+            'Should store each exception date once.'))
+        occ_list = list(self.event._get_occurrence_gen(
+            now(), now() + timedelta(days=3)))
+        self.assertNotIn(exdate, [occ.start for occ in occ_list], msg=(
+            'Exception dates should never be generated.'))
+        self.assertEqual(len(occ_list), 2)
+
     def test_get_parent_category(self):
         """Tests for the ``get_parent_category`` method."""
         result = self.event.get_parent_category()
@@ -214,11 +692,12 @@ class OccurrenceTestCase(TestCase):
         occurrence_1 = mixer.blend(
             'calendarium.Occurrence', start=now(),
             end=now() + timedelta(days=1),
-            original_start=now() + timedelta(hours=1))
+            original_start=now() + timedelta(hours=1),
+            event__rule__frequency='DAILY', event__rule__params=None)
         occurrence_2 = mixer.blend(
             'calendarium.Occurrence', start=now(),
             end=now() + timedelta(days=1),
-            original_start=now() + timedelta(hours=1))
+            original_start=now() + timedelta(hours=2))
         occurrence_2.event = occurrence_1.event
         occurrence_2.save()
         occurrence_2.delete_period('this one')
@@ -230,13 +709,13 @@ class OccurrenceTestCase(TestCase):
         occurrence_3 = mixer.blend(
             'calendarium.Occurrence', start=now(),
             end=now() + timedelta(days=1),
-            original_start=now() + timedelta(hours=1))
+            original_start=now() + timedelta(hours=3))
         occurrence_3.event = occurrence_1.event
         occurrence_3.save()
         occurrence_4 = mixer.blend(
             'calendarium.Occurrence', start=now(),
             end=now() + timedelta(days=1),
-            original_start=now() + timedelta(hours=1))
+            original_start=now() + timedelta(hours=4))
         occurrence_4.event = occurrence_1.event
         occurrence_4.save()
         occurrence_3.delete_period('this one')
@@ -245,6 +724,150 @@ class OccurrenceTestCase(TestCase):
             'Should delete all occurrences with this start date.'))
 
 
+class OccurrenceDeletePeriodTestCase(TestCase):
+    """Tests for ``delete_period`` of occurrences of recurring events."""
+    longMessage = True
+
+    def setUp(self):
+        # a daily series without an end
+        self.event = mixer.blend(
+            'calendarium.Event', start=now(), end=now() + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=None)
+
+    def get_occurrence(self, days):
+        return list(self.event.get_occurrences(
+            now() + timedelta(days=days),
+            now() + timedelta(days=days + 1)))[0]
+
+    def test_get_adjacent_occurrence_starts(self):
+        start = self.event.start
+        self.assertEqual(
+            self.event.get_adjacent_occurrence_starts(start),
+            (None, start + timedelta(days=1)), msg=(
+                'The first occurrence should have no previous one.'))
+        self.event.end_recurring_period = start + timedelta(days=2)
+        self.assertEqual(
+            self.event.get_adjacent_occurrence_starts(
+                start + timedelta(days=2)),
+            (start + timedelta(days=1), None), msg=(
+                'The last occurrence should have no following one.'))
+        self.event.rule = None
+        self.assertEqual(
+            self.event.get_adjacent_occurrence_starts(start), (None, None),
+            msg=('An event without rule should have only one occurrence.'))
+
+    def test_delete_this_one(self):
+        occurrence = self.get_occurrence(2)
+        occurrence.delete_period('this one')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.get_exdates(), [occurrence.start], msg=(
+            'The cancellation should be stored as exception date.'))
+        self.assertEqual(Occurrence.objects.count(), 0, msg=(
+            'No cancelled occurrence should be persisted.'))
+        self.assertIsNone(self.event.end_recurring_period, msg=(
+            'The series should still have no end.'))
+
+    def test_delete_last_one(self):
+        self.event.end_recurring_period = now() + timedelta(days=3)
+        self.event.save()
+        occurrence = self.get_occurrence(3)
+        occurrence.save()
+        occurrence.delete_period('this one')
+        self.event.refresh_from_db()
+        self.assertEqual(
+            self.event.end_recurring_period,
+            occurrence.start - timedelta(days=1), msg=(
+                'Deleting the last occurrence should shorten the series.'))
+        self.assertEqual(Occurrence.objects.count(), 0)
+
+    def test_delete_following(self):
+        self.get_occurrence(5).save()
+        occurrence = self.get_occurrence(3)
+        occurrence.delete_period('following')
+        self.event.refresh_from_db()
+        self.assertEqual(
+            self.event.end_recurring_period,
+            occurrence.start - timedelta(days=1), msg=(
+                'The series should end with the previous occurrence.'))
+        self.assertEqual(Occurrence.objects.count(), 0, msg=(
+            'The following persistent occurrences should be deleted.'))
+
+        self.get_occurrence(0).delete_period('following')
+        self.assertEqual(Event.objects.count(), 0, msg=(
+            'Deleting all following occurrences from the first one should'
+            ' delete the event.'))
+
+    def test_delete_without_updates(self):
+        for days in range(3, 8):
+            self.get_occurrence(days).save()
+        with patch.object(Event, 'update_next_occurrence_start') as mock:
+            self.get_occurrence(2).delete_period('following')
+            self.assertEqual(mock.call_count, 0, msg=(
+                'The event should not be updated for each deleted'
+                ' occurrence.'))
+            self.get_occurrence(1).save()
+            mock.reset_mock()
+            event_pk = self.event.pk
+            self.event.delete()
+            self.assertEqual(mock.call_count, 0, msg=(
+                'Deleting the event should not update it for each of its'
+                ' occurrences.'))
+        self.assertFalse(is_next_occurrence_update_skipped(event_pk))
+
+
+class ArchiveTestCase(TestCase):
+    """Tests for archiving events."""
+    longMessage = True
+
+    def setUp(self):
+        self.start = now() - timedelta(days=400)
+        # a finished daily series with one changed occurrence and a relation
+        self.event = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), rule__frequency='DAILY',
+            rule__params=None,
+            end_recurring_period=self.start + timedelta(days=4))
+        occurrence = list(self.event.get_occurrences(
+            self.start + timedelta(days=1), self.start + timedelta(days=2)))[0]
+        occurrence.title = 'changed'
+        occurrence.save()
+        mixer.blend('calendarium.EventRelation', event=self.event)
+        # an event, that is not finished long enough
+        self.recent_event = mixer.blend(
+            'calendarium.Event', rule=None, start=now() - timedelta(days=3),
+            end=now() - timedelta(days=3))
+
+    def test_archive(self):
+        start = self.start.replace(hour=0, minute=0)
+        end = start + timedelta(days=7)
+        occurrences = Event.objects.get_occurrences(start, end)
+        self.assertEqual(Event.objects.archive(batch_size=1), 1, msg=(
+            'Should only archive the events, that ended long enough ago.'))
+        self.assertEqual(list(Event.objects.all()), [self.recent_event])
+        self.assertEqual(Occurrence.objects.count(), 0)
+        self.assertEqual(EventRelation.objects.count(), 0)
+        self.assertEqual(
+            ArchivedEvent.objects.get().pk, self.event.pk, msg=(
+                'Archived events should keep their primary key.'))
+        self.assertEqual(ArchivedEventRelation.objects.count(), 1)
+        self.assertEqual(ArchivedOccurrence.objects.count(), 1, msg=(
+            'Only the persisted occurrences should be archived.'))
+        self.assertEqual(
+            ArchivedEvent.objects.get().series_end, occurrences[-1].end)
+
+        self.assertEqual(Event.objects.get_occurrences(start, end), [], msg=(
+            'By default only live events should be queried.'))
+        archived = Event.objects.get_occurrences(
+            start, end, include_archived=True)
+        self.assertEqual(
+            [(occ.event.pk, occ.start, occ.end, occ.title)
+             for occ in archived],
+            [(occ.event.pk, occ.start, occ.end, occ.title)
+             for occ in occurrences], msg=(
+                'Should return the same occurrences as before archiving.'))
+
+
 class RuleTestCase(TestCase):
     """Tests for the ``Rule`` model."""
     longMessage = True
@@ -253,3 +876,75 @@ class RuleTestCase(TestCase):
         """Test for instantiation of the ``Rule`` model."""
         rule = Rule()
         self.assertTrue(rule)
+
+
+class ChangeTestCase(TestCase):
+    """Tests for the ``Change`` model and its manager."""
+    longMessage = True
+
+    def setUp(self):
+        patcher = patch('calendarium.models.CHANGE_LOG', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        start = datetime(2016, 1, 1, 9, tzinfo=utc)
+        self.calendar = mixer.blend('calendarium.Calendar')
+        self.event = mixer.blend(
+            'calendarium.Event', start=start,
+            end=start + timedelta(hours=1), calendar=self.calendar,
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=20))
+        self.other = mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule=None)
+        self.token = Change.objects.get_token()
+
+    def test_log(self):
+        self.assertTrue(self.token, msg=(
+            'Saving events should be logged.'))
+        occurrence = self.event.get_occurrence(self.event.start)
+        occurrence.title = 'Moved'
+        occurrence.save()
+        latest = Change.objects.get_token()
+        self.assertEqual(
+            Change.objects.get_changed_events(self.token, latest),
+            {self.event.pk}, msg=(
+                'Changed occurrences should mark their event as changed.'))
+        self.assertEqual(Change.objects.get_changed_events(
+            self.token, latest, calendar=self.calendar), {self.event.pk})
+
+        other_pk = self.other.pk
+        self.other.delete()
+        self.assertEqual(Change.objects.get_changed_events(
+            latest, Change.objects.get_token(), calendar=self.calendar),
+            set(), msg=(
+                'Changes of other calendars should be left out.'))
+        self.assertTrue(Change.objects.filter(
+            event_id=other_pk, deleted=True).exists())
+
+    def test_move(self):
+        other_calendar = mixer.blend('calendarium.Calendar')
+        self.event.calendar = other_calendar
+        self.event.save()
+        latest = Change.objects.get_token()
+        self.assertEqual(Change.objects.get_changed_events(
+            self.token, latest, calendar=self.calendar), {self.event.pk},
+            msg=('A moved event should be changed for its old calendar.'))
+        self.assertTrue(Change.objects.filter(
+            event_id=self.event.pk, calendar_id=self.calendar.pk,
+            deleted=True).exists(), msg=(
+                'The event should be deleted from the old calendar.'))
+        self.assertEqual(Change.objects.get_changed_events(
+            self.token, latest, calendar=other_calendar), {self.event.pk})
+
+    def test_rule(self):
+        self.event.rule.save()
+        self.assertEqual(Change.objects.get_changed_events(
+            self.token, Change.objects.get_token()), {self.event.pk}, msg=(
+                'A changed rule should mark its events as changed.'))
+
+    def test_calendar(self):
+        Change.objects.create(model=Change.CALENDAR, calendar_id=None)
+        self.assertIsNone(Change.objects.get_changed_events(
+            self.token, Change.objects.get_token()), msg=(
+                'After a change of a whole calendar everything should be'
+                ' synchronized again.'))
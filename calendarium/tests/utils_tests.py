@@ -0,0 +1,67 @@
+"""Tests for the utils of the ``calendarium`` app."""
+from django.test import TestCase
+from django.utils.timezone import datetime, utc
+
+from mock import patch
+
+from .. import utils
+
+
+class GetReadDBTestCase(TestCase):
+    """Tests for the ``get_read_db`` and ``pin_reads_to_primary`` utils."""
+    longMessage = True
+
+    def tearDown(self):
+        utils._local.pinned_until = 0
+
+    def test_util(self):
+        self.assertIsNone(utils.get_read_db(), msg=(
+            'Without a configured read database, the routers should decide.'))
+        self.assertEqual(utils.get_read_db('other'), 'other', msg=(
+            'An explicitly given alias should always be used.'))
+        with patch('calendarium.settings.READ_DB', 'replica'):
+            self.assertEqual(utils.get_read_db(), 'replica', msg=(
+                'Should return the ``CALENDARIUM_READ_DB`` setting.'))
+
+            utils.pin_reads_to_primary()
+            self.assertEqual(utils.get_read_db(), 'replica', msg=(
+                'Without ``CALENDARIUM_PIN_READS_AFTER_WRITE`` reads should'
+                ' not be pinned.'))
+
+            with patch('calendarium.settings.PIN_READS_AFTER_WRITE', 5):
+                utils.pin_reads_to_primary()
+            self.assertEqual(utils.get_read_db(), 'default', msg=(
+                'Right after a write, reads should go to the primary.'))
+
+
+class DeferOccurrenceCacheInvalidationTestCase(TestCase):
+    """Tests for the ``defer_occurrence_cache_invalidation`` util."""
+    longMessage = True
+
+    def test_util(self):
+        with patch('calendarium.utils._bump_cache_version') as bump:
+            with utils.defer_occurrence_cache_invalidation():
+                utils.invalidate_occurrence_cache(1)
+                utils.invalidate_occurrence_cache(1)
+                with utils.defer_occurrence_cache_invalidation():
+                    utils.invalidate_occurrence_cache(2)
+                self.assertEqual(bump.call_count, 0, msg=(
+                    'Nothing should be invalidated inside of the block.'))
+            self.assertEqual(
+                sorted(str(call[0][0]) for call in bump.call_args_list),
+                ['1', '2', 'all', 'all'], msg=(
+                    'Each calendar should be invalidated once at the end.'))
+
+
+class CursorTestCase(TestCase):
+    """Tests for the ``encode_cursor`` and ``decode_cursor`` utils."""
+    longMessage = True
+
+    def test_utils(self):
+        cursor = (datetime(2016, 2, 7, 10, 30, 0, 5, tzinfo=utc), 12)
+        self.assertEqual(
+            utils.decode_cursor(utils.encode_cursor(cursor)), cursor, msg=(
+                'A cursor should survive the round trip.'))
+        for token in ['foo', '', utils.encode_cursor(cursor)[:-3]]:
+            with self.assertRaises(ValueError):
+                utils.decode_cursor(token)
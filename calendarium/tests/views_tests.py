@@ -2,14 +2,19 @@
 # ! Never use the timezone now, import calendarium.utils.now instead always
 # inaccuracy on microsecond base can negatively influence your tests
 # from django.utils.timezone import now
-from django.utils.timezone import timedelta
+import gzip
+import json
+
+from django.urls import reverse
+from django.utils.timezone import datetime, timedelta, utc
 from django.test import TestCase
 
 from django_libs.tests.mixins import ViewRequestFactoryTestMixin
 from mixer.backend.django import mixer
+from mock import patch
 
-from .. import views
-from ..models import Event
+from .. import ics, views
+from ..models import Change, Event
 from ..utils import now
 
 
@@ -44,6 +49,32 @@ class MonthViewTestCase(ViewRequestFactoryTestMixin, TestCase):
         self.is_postable(data={'previous': True}, to_url_name='calendar_month')
         self.is_postable(data={'today': True}, to_url_name='calendar_month')
 
+        # with a limit of occurrences per cell
+        start = now().replace(day=1, hour=9)
+        for hour in range(3):
+            mixer.blend(
+                'calendarium.Event', rule=None,
+                start=start + timedelta(hours=hour),
+                end=start + timedelta(hours=hour, minutes=30))
+        with patch.object(views, 'CELL_LIMIT', 2):
+            resp = self.is_callable()
+        cell = [
+            occurrences for week in resp.context_data['month']
+            for day, occurrences, current in week if day == 1][0]
+        self.assertEqual((len(cell), cell.more), (2, 1), msg=(
+            'Crowded cells should only show the limited amount.'))
+        self.assertEqual(cell.more_url, '{0}?offset=2'.format(reverse(
+            'calendar_day', kwargs={
+                'year': start.year, 'month': start.month, 'day': 1})))
+
+        # rendered by the fast path
+        with patch.object(views, 'FAST_GRID', True):
+            resp = self.is_callable()
+        self.assertIn('month_grid', resp.context_data, msg=(
+            'The grid should be rendered without the template engine.'))
+        self.assertIn('id="calendar-month"', resp.render().content.decode(
+            'utf-8'))
+
         # called with a invalid category pk
         self.is_callable(data={'category': 'abc'})
 
@@ -54,9 +85,74 @@ class MonthViewTestCase(ViewRequestFactoryTestMixin, TestCase):
         category = mixer.blend('calendarium.EventCategory')
         self.is_callable(data={'category': category.pk})
 
+        # called with several categories
+        other_category = mixer.blend('calendarium.EventCategory')
+        resp = self.is_callable(
+            data={'category': [category.pk, other_category.pk]})
+        self.assertEqual(
+            set(resp.context_data['current_categories']),
+            set([category, other_category]), msg=(
+                'Repeated category params should all be used.'))
+
         # called with wrong values
         self.is_not_callable(kwargs={'year': 2000, 'month': 15})
 
+    def test_view_for_calendar(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        self.is_callable(kwargs={
+            'year': self.year, 'month': self.month,
+            'calendar': calendar.slug})
+        self.is_postable(kwargs={
+            'year': self.year, 'month': self.month,
+            'calendar': calendar.slug}, data={'next': True},
+            to_url_name='calendar_month')
+        self.is_not_callable(kwargs={
+            'year': self.year, 'month': self.month, 'calendar': 'foo'})
+
+
+class YearViewTestCase(ViewRequestFactoryTestMixin, TestCase):
+    """Tests for the ``YearView`` view class."""
+    longMessage = True
+    view_class = views.YearView
+
+    def get_view_kwargs(self):
+        return {'year': 2016}
+
+    def test_view(self):
+        start = datetime(2016, 3, 30, 9, tzinfo=utc)
+        category = mixer.blend('calendarium.EventCategory')
+        mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=3),
+            category=category)
+        with patch.object(
+                Event.objects, 'get_occurrences',
+                wraps=Event.objects.get_occurrences) as get_occurrences:
+            resp = self.is_callable()
+        self.assertEqual(get_occurrences.call_count, 1, msg=(
+            'The whole year should be expanded at once.'))
+        months = resp.context_data['months']
+        self.assertEqual(len(months), 12)
+        days = [
+            day for month_date, weeks in months for week in weeks
+            for day in week if day[1]]
+        self.assertEqual(
+            [(day, count, colors) for day, count, colors, current in days],
+            [(30, 1, [category.color]), (31, 1, [category.color]),
+             (1, 1, [category.color]), (2, 1, [category.color])], msg=(
+                'Each day should hold the amount and the colors of its'
+                ' occurrences.'))
+        resp = self.is_callable(ajax=True)
+        self.assertEqual(
+            resp.template_name[0], 'calendarium/partials/calendar_year.html')
+        self.assertIn('calendarium-dot', resp.render().content.decode(
+            'utf-8'))
+        self.is_postable(data={'next': True}, to_url_name='calendar_year')
+        self.is_postable(data={'previous': True}, to_url_name='calendar_year')
+        self.is_postable(data={'today': True}, to_url_name='calendar_year')
+        self.is_not_callable(kwargs={'year': 0})
+
 
 class WeekViewTestCase(ViewRequestFactoryTestMixin, TestCase):
     """Tests for the ``WeekView`` view class."""
@@ -86,6 +182,22 @@ class WeekViewTestCase(ViewRequestFactoryTestMixin, TestCase):
             msg=('Returned the wrong template for AJAX request.'))
         self.is_not_callable(kwargs={'year': self.year, 'week': '60'})
 
+    def test_categories(self):
+        category = mixer.blend('calendarium.EventCategory', color='00ff00')
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now(),
+            end=now() + timedelta(hours=1), category=category)
+        resp = self.is_callable()
+        self.assertEqual(resp.context_data['grid_categories'], [category])
+        content = resp.render().content.decode('utf-8')
+        self.assertIn(
+            '<style>.calendarium-category-{0}{{background-color:#00ff00}}'
+            '</style>'.format(category.pk), content, msg=(
+                'The colors of the categories in the week should be set.'))
+        self.assertIn(
+            'class="alert calendarium-category-{0}"'.format(category.pk),
+            content)
+
 
 class DayViewTestCase(ViewRequestFactoryTestMixin, TestCase):
     """Tests for the ``DayView`` view class."""
@@ -111,6 +223,25 @@ class DayViewTestCase(ViewRequestFactoryTestMixin, TestCase):
         self.is_not_callable(kwargs={'year': self.year, 'month': '14',
                                      'day': self.day})
 
+    def test_view_with_offset(self):
+        start = datetime(self.year, self.month, self.day, 9, tzinfo=utc)
+        for hour in range(3):
+            mixer.blend(
+                'calendarium.Event', rule=None,
+                start=start + timedelta(hours=hour),
+                end=start + timedelta(hours=hour, minutes=30))
+        resp = self.is_callable(ajax=True, data={'offset': 2})
+        self.assertEqual(
+            resp.template_name[0], 'calendarium/partials/calendar_day.html')
+        self.assertEqual(
+            [occ.start for occ in resp.context_data['occurrences']],
+            [start + timedelta(hours=2)], msg=(
+                'Only the occurrences after the offset should be rendered.'))
+        self.assertIn('class="alert"', resp.render().content.decode('utf-8'))
+        resp = self.is_callable(data={'offset': 2})
+        self.assertEqual(len(resp.context_data['occurrences']), 3, msg=(
+            'The full day view should show all occurrences.'))
+
 
 class EventUpdateViewTestCase(ViewRequestFactoryTestMixin, TestCase):
     """Tests for the ``EventUpdateView`` view class."""
@@ -140,6 +271,49 @@ class EventCreateViewTestCase(ViewRequestFactoryTestMixin, TestCase):
         self.assertEqual(Event.objects.all().count(), 0)
 
 
+class EventDeleteViewTestCase(ViewRequestFactoryTestMixin, TestCase):
+    """Tests for the ``EventDeleteView`` view class."""
+    view_class = views.EventDeleteView
+
+    def get_view_kwargs(self):
+        return {'pk': self.event.pk}
+
+    def setUp(self):
+        self.event = mixer.blend('calendarium.Event')
+        mixer.cycle(3).blend('calendarium.Occurrence', event=self.event)
+        self.user = mixer.blend('auth.User', is_superuser=True)
+
+    def test_view(self):
+        self.is_callable(user=self.user)
+        self.is_postable(user=self.user, to_url_name='calendar_current_month')
+        self.assertEqual(Event.objects.all().count(), 0, msg=(
+            'The event should be deleted along with its occurrences.'))
+
+
+class ArchiveViewTestCase(ViewRequestFactoryTestMixin, TestCase):
+    """Tests for the ``ArchiveView`` view class."""
+    view_class = views.ArchiveView
+
+    def setUp(self):
+        self.calendar = mixer.blend('calendarium.Calendar')
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now() - timedelta(days=10),
+            end=now() - timedelta(days=10), calendar=None)
+        Event.objects.archive(before=now())
+
+    def test_view(self):
+        mixer.blend(
+            'calendarium.Event', rule=None, start=now() - timedelta(days=10),
+            end=now() - timedelta(days=10), calendar=self.calendar)
+        Event.objects.archive(before=now())
+        resp = self.is_callable()
+        self.assertEqual(len(resp.context_data['object_list']), 2, msg=(
+            'Without a calendar the events of all calendars should be'
+            ' listed.'))
+        resp = self.is_callable(kwargs={'calendar': self.calendar.slug})
+        self.assertEqual(len(resp.context_data['object_list']), 1)
+
+
 class EventDetailViewTestCase(ViewRequestFactoryTestMixin, TestCase):
     """Tests for the ``EventDetailView`` view class."""
     view_class = views.EventDetailView
@@ -219,6 +393,17 @@ class OccurrenceDetailViewTestCase(
     """Tests for the ``OccurrenceDetailView`` view class."""
     view_class = views.OccurrenceDetailView
 
+    def test_calendar(self):
+        calendar = mixer.blend('calendarium.Calendar')
+        self.event.calendar = calendar
+        self.event.save()
+        kwargs = self.get_view_kwargs()
+        kwargs['calendar'] = calendar.slug
+        self.is_callable(kwargs=kwargs)
+        kwargs['calendar'] = mixer.blend('calendarium.Calendar').slug
+        self.is_not_callable(kwargs=kwargs, msg=(
+            'Events of other calendars should not be found.'))
+
 
 class OccurrenceUpdateViewTestCase(
         OccurrenceViewTestCaseMixin, ViewRequestFactoryTestMixin, TestCase):
@@ -236,6 +421,264 @@ class UpcomingEventsAjaxViewTestCase(ViewRequestFactoryTestMixin, TestCase):
     def test_view_with_count(self):
         self.is_callable(data={'count': 5})
 
+    def test_view_with_cursor(self):
+        mixer.blend(
+            'calendarium.Event', start=now() + timedelta(hours=1),
+            end=now() + timedelta(hours=2), rule__frequency='DAILY',
+            rule__params=None, end_recurring_period=None)
+        resp = self.is_callable(data={'count': 2})
+        cursor = resp.context_data['next_cursor']
+        self.assertTrue(cursor, msg=(
+            'A full page should link to the next one.'))
+        resp = self.is_callable(data={'count': 2, 'cursor': cursor})
+        self.assertGreater(
+            resp.context_data['occurrences'][0].start,
+            now() + timedelta(days=1), msg=(
+                'The next page should resume after the cursor.'))
+        self.is_not_callable(data={'cursor': 'foo'})
+
     def test_view_with_category(self):
         cat = mixer.blend('calendarium.EventCategory')
         self.is_callable(data={'category': cat.slug})
+
+
+class OccurrenceFeedViewTestCase(TestCase):
+    """Tests for the ``OccurrenceFeedView`` view class."""
+    longMessage = True
+
+    def setUp(self):
+        self.category = mixer.blend('calendarium.EventCategory')
+        self.event = mixer.blend(
+            'calendarium.Event', start=now(), end=now() + timedelta(hours=1),
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=now() + timedelta(days=10),
+            category=self.category)
+        self.url = reverse('calendar_occurrences_json')
+        self.data = {
+            'start': (now() - timedelta(days=1)).date().isoformat(),
+            'end': (now() + timedelta(days=3)).date().isoformat(),
+        }
+
+    def get_items(self, resp):
+        return json.loads(b''.join(resp.streaming_content).decode('utf-8'))
+
+    def test_view(self):
+        resp = self.client.get(self.url, self.data)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming, msg=(
+            'The feed should be streamed.'))
+        items = self.get_items(resp)
+        self.assertEqual(len(items), 3, msg=(
+            'Each occurrence of the period should be returned.'))
+        self.assertEqual(items[0]['groupId'], self.event.pk)
+        self.assertEqual(items[0]['color'], '#' + self.category.color)
+        self.assertEqual(items[0]['url'], reverse(
+            'calendar_occurrence_detail', kwargs={
+                'pk': self.event.pk, 'year': self.event.start.year,
+                'month': self.event.start.month,
+                'day': self.event.start.day}))
+
+        other = mixer.blend('calendarium.EventCategory')
+        resp = self.client.get(self.url, dict(self.data, category=other.pk))
+        self.assertEqual(self.get_items(resp), [], msg=(
+            'The feed should be filtered by the categories.'))
+
+        resp = self.client.get(self.url, {'start': 'foo'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_gzip(self):
+        resp = self.client.get(
+            self.url, self.data, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        items = json.loads(gzip.decompress(
+            b''.join(resp.streaming_content)).decode('utf-8'))
+        self.assertEqual(len(items), 3)
+
+    def test_conditional_get(self):
+        resp = self.client.get(self.url, self.data)
+        self.assertFalse(resp.has_header('ETag'), msg=(
+            'Without the occurrence cache changes cannot be told.'))
+        with patch.object(views, 'CACHE_TIMEOUT', 60):
+            resp = self.client.get(self.url, self.data)
+            etag = resp['ETag']
+            resp = self.client.get(
+                self.url, self.data, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304, msg=(
+                'An unchanged feed should not be sent again.'))
+
+
+class ICalendarFeedViewTestCase(TestCase):
+    """Tests for the ``ICalendarFeedView`` view class."""
+    longMessage = True
+
+    def setUp(self):
+        self.start = datetime(2016, 1, 1, 9, tzinfo=utc)
+        self.calendar = mixer.blend('calendarium.Calendar')
+        self.category = mixer.blend('calendarium.EventCategory')
+        self.event = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), calendar=self.calendar,
+            rule__frequency='WEEKLY', rule__params='{"byweekday": [0, 4]}',
+            end_recurring_period=self.start + timedelta(days=60),
+            category=self.category, title='Standup; daily, short')
+        self.event.add_exdate(self.start + timedelta(days=7))
+        self.event.save()
+        moved = self.event.get_occurrence(self.start + timedelta(days=3))
+        moved.start += timedelta(hours=2)
+        moved.end += timedelta(hours=2)
+        moved.save()
+        mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), rule=None)
+
+    def get_events(self, resp):
+        content = b''.join(resp.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        return list(ics.iter_events(content.splitlines(True)))
+
+    def test_view(self):
+        resp = self.client.get(reverse(
+            'calendar_ics', kwargs={'calendar': self.calendar.slug}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming, msg=(
+            'The file should be streamed.'))
+        master, override = self.get_events(resp)
+        self.assertEqual(
+            ics.get_value(master, 'UID')[1],
+            ics.get_value(override, 'UID')[1], msg=(
+                'Overrides should share the UID of their series.'))
+        self.assertEqual(
+            ics.unescape(ics.get_value(master, 'SUMMARY')[1]),
+            self.event.title)
+        frequency, params, until = ics.parse_rrule(
+            ics.get_value(master, 'RRULE')[1], utc)
+        self.assertEqual(
+            (frequency, params, until),
+            ('WEEKLY', {'byweekday': [0, 4]},
+             self.event.end_recurring_period), msg=(
+                'The rule should be written as RRULE.'))
+        self.assertEqual(ics.parse_datetimes(master['EXDATE'], utc), [
+            self.start + timedelta(days=7)])
+        self.assertEqual(
+            ics.parse_datetime(
+                ics.get_value(override, 'RECURRENCE-ID')[1], {}, utc),
+            self.start + timedelta(days=3))
+        self.assertEqual(
+            ics.parse_datetime(
+                ics.get_value(override, 'DTSTART')[1], {}, utc),
+            self.start + timedelta(days=3, hours=2))
+
+    def test_category(self):
+        resp = self.client.get(reverse(
+            'calendar_category_ics', kwargs={'category': self.category.slug}))
+        self.assertEqual(len(self.get_events(resp)), 2, msg=(
+            'Only the events of the category should be written.'))
+        resp = self.client.get(reverse('calendar_ics'))
+        self.assertEqual(len(self.get_events(resp)), 3)
+        resp = self.client.get(reverse(
+            'calendar_category_ics', kwargs={'category': 'foo'}))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_rdates(self):
+        event = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), calendar=self.calendar,
+            rule__frequency='YEARLY', rule__params='{"byeaster": 0}',
+            end_recurring_period=self.start + timedelta(days=3 * 365))
+        self.event.delete()
+        resp = self.client.get(reverse(
+            'calendar_ics', kwargs={'calendar': self.calendar.slug}))
+        master, = self.get_events(resp)
+        self.assertNotIn('RRULE', master)
+        self.assertEqual(
+            ics.parse_datetimes(master['RDATE'], utc),
+            [occ.start for occ in event.get_occurrences(
+                self.start + timedelta(days=1),
+                event.end_recurring_period)], msg=(
+                    'Rules without RRULE equivalent should be written as'
+                    ' RDATEs instead of leaving out the event.'))
+
+    def test_single_event_override(self):
+        event = mixer.blend(
+            'calendarium.Event', start=self.start,
+            end=self.start + timedelta(hours=1), calendar=self.calendar,
+            rule=None, title='Planned')
+        self.event.delete()
+        occurrence = event.get_occurrence(self.start)
+        occurrence.start += timedelta(hours=2)
+        occurrence.end += timedelta(hours=2)
+        occurrence.title = 'Moved'
+        occurrence.save()
+        resp = self.client.get(reverse(
+            'calendar_ics', kwargs={'calendar': self.calendar.slug}))
+        master, = self.get_events(resp)
+        self.assertEqual(
+            ics.parse_datetime(ics.get_value(master, 'DTSTART')[1], {}, utc),
+            self.start + timedelta(hours=2), msg=(
+                'A moved event without a rule should be written at its new'
+                ' start.'))
+        self.assertEqual(ics.get_value(master, 'SUMMARY')[1], 'Moved')
+
+
+class SyncViewTestCase(TestCase):
+    """Tests for the ``SyncView`` view class."""
+    longMessage = True
+
+    def setUp(self):
+        for name in ['calendarium.models.CHANGE_LOG',
+                     'calendarium.views.CHANGE_LOG']:
+            patcher = patch(name, True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        start = datetime(2016, 1, 1, 9, tzinfo=utc)
+        self.calendar = mixer.blend('calendarium.Calendar')
+        self.event = mixer.blend(
+            'calendarium.Event', start=start,
+            end=start + timedelta(hours=1), calendar=self.calendar,
+            rule__frequency='DAILY', rule__params=None,
+            end_recurring_period=start + timedelta(days=20))
+        self.other = mixer.blend(
+            'calendarium.Event', start=start, end=start + timedelta(hours=1),
+            rule=None, calendar=self.calendar)
+        self.url = reverse(
+            'calendar_sync', kwargs={'calendar': self.calendar.slug})
+
+    def sync(self, **data):
+        resp = self.client.get(self.url, data)
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(b''.join(resp.streaming_content).decode('utf-8'))
+
+    def test_view(self):
+        result = self.sync()
+        self.assertTrue(result['full'])
+        self.assertEqual(len(result['events']), 2, msg=(
+            'Without a token all events should be returned.'))
+        self.assertEqual(result['token'], str(Change.objects.get_token()))
+
+        occurrence = self.event.get_occurrence(self.event.start)
+        occurrence.title = 'Moved'
+        occurrence.save()
+        other_pk = self.other.pk
+        self.other.delete()
+        delta = self.sync(token=result['token'])
+        self.assertFalse(delta['full'])
+        self.assertEqual(
+            [event['id'] for event in delta['events']], [self.event.pk],
+            msg=('Only the changed series should be returned.'))
+        self.assertEqual(
+            [occ['title'] for occ in delta['events'][0]['overrides']],
+            ['Moved'])
+        self.assertEqual(delta['deleted'], [other_pk])
+
+        unchanged = self.sync(token=delta['token'])
+        self.assertEqual(
+            (unchanged['events'], unchanged['deleted']), ([], []), msg=(
+                'Nothing should be returned, if nothing has changed.'))
+
+        resp = self.client.get(self.url, {'token': 'foo'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_disabled(self):
+        with patch('calendarium.views.CHANGE_LOG', False):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 404)
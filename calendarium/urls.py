@@ -1,9 +1,61 @@
 """URLs for the ``calendarium`` app."""
-from django.conf.urls import url
+from django.conf.urls import include, url
 
 from . import views
 
 
+# calendar views
+calendar_urlpatterns = [
+    url(r'^(?P<year>\d+)/$',
+        views.YearView.as_view(),
+        name='calendar_year'),
+
+    url(r'^(?P<year>\d+)/(?P<month>\d+)/$',
+        views.MonthView.as_view(),
+        name='calendar_month'),
+
+    url(r'^(?P<year>\d+)/week/(?P<week>\d+)/$',
+        views.WeekView.as_view(),
+        name='calendar_week'),
+
+    url(r'^(?P<year>\d+)/(?P<month>\d+)/(?P<day>\d+)/$',
+        views.DayView.as_view(),
+        name='calendar_day'),
+
+    url(r'^event/(?P<pk>\d+)/date/(?P<year>\d+)/(?P<month>\d+)/(?P<day>\d+)/$',
+        views.OccurrenceDetailView.as_view(),
+        name='calendar_occurrence_detail'),
+
+    url(r'^get-events/$',
+        views.UpcomingEventsAjaxView.as_view(),
+        name='calendar_upcoming_events'),
+
+    url(r'^occurrences\.json$',
+        views.OccurrenceFeedView.as_view(),
+        name='calendar_occurrences_json'),
+
+    url(r'^events\.ics$',
+        views.ICalendarFeedView.as_view(),
+        name='calendar_ics'),
+
+    url(r'^category/(?P<category>[-\w]+)/events\.ics$',
+        views.ICalendarFeedView.as_view(),
+        name='calendar_category_ics'),
+
+    url(r'^sync/$',
+        views.SyncView.as_view(),
+        name='calendar_sync'),
+
+    url(r'^archive/$',
+        views.ArchiveView.as_view(),
+        name='calendar_archive'),
+
+    url(r'^$',
+        views.CalendariumRedirectView.as_view(),
+        name='calendar_current_month'),
+]
+
+
 urlpatterns = [
     # event views
     url(r'^event/create/$',
@@ -23,10 +75,6 @@ urlpatterns = [
         name='calendar_event_delete'),
 
     # occurrence views
-    url(r'^event/(?P<pk>\d+)/date/(?P<year>\d+)/(?P<month>\d+)/(?P<day>\d+)/$',
-        views.OccurrenceDetailView.as_view(),
-        name='calendar_occurrence_detail'),
-
     url(
         r'^event/(?P<pk>\d+)/date/(?P<year>\d+)/(?P<month>\d+)/(?P<day>\d+)/update/$',  # NOPEP8
         views.OccurrenceUpdateView.as_view(),
@@ -37,25 +85,8 @@ urlpatterns = [
         views.OccurrenceDeleteView.as_view(),
         name='calendar_occurrence_delete'),
 
-    # calendar views
-    url(r'^(?P<year>\d+)/(?P<month>\d+)/$',
-        views.MonthView.as_view(),
-        name='calendar_month'),
-
-    url(r'^(?P<year>\d+)/week/(?P<week>\d+)/$',
-        views.WeekView.as_view(),
-        name='calendar_week'),
-
-    url(r'^(?P<year>\d+)/(?P<month>\d+)/(?P<day>\d+)/$',
-        views.DayView.as_view(),
-        name='calendar_day'),
-
-    url(r'^get-events/$',
-        views.UpcomingEventsAjaxView.as_view(),
-        name='calendar_upcoming_events'),
-
-    url(r'^$',
-        views.CalendariumRedirectView.as_view(),
-        name='calendar_current_month'),
-
+    # calendar views scoped by a calendar
+    url(r'^calendar/(?P<calendar>[-\w]+)/', include(calendar_urlpatterns)),
 ]
+
+urlpatterns += calendar_urlpatterns
@@ -8,8 +8,24 @@ https://github.com/thauber/django-schedule/blob/master/schedule/utils.py
 
 
 """
+import hashlib
+import threading
 import time
-from django.utils import timezone
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils import timezone, translation
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import settings as calendarium_settings
+from .constants import CURSOR_FORMAT, EXDATE_FORMAT
+
+
+_local = threading.local()
 
 
 def now(**kwargs):
@@ -25,6 +41,114 @@ def now(**kwargs):
     return timezone.now(**kwargs).replace(second=0, microsecond=0)
 
 
+def parse_exdates(value):
+    """Returns the list of datetimes of a comma separated EXDATE string."""
+    if not value:
+        return []
+    return [
+        timezone.datetime.strptime(date, EXDATE_FORMAT).replace(
+            tzinfo=timezone.utc) for date in value.split(',')]
+
+
+def format_exdates(dates):
+    """Returns the sorted, comma separated EXDATE string of the dates."""
+    return ','.join(sorted(set(
+        date.astimezone(timezone.utc).strftime(EXDATE_FORMAT)
+        for date in dates)))
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """
+    Deletes the rows of the given queryset by raw ``DELETE`` queries for at
+    most ``batch_size`` rows each (default: ``CALENDARIUM_BATCH_SIZE``).
+
+    Neither instances are loaded nor signals are sent, so the caller has to
+    take care of related rows and of invalidating caches.
+
+    :returns: The amount of deleted rows.
+
+    """
+    batch_size = batch_size or calendarium_settings.BATCH_SIZE
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    sql = 'DELETE FROM {0} WHERE {1} IN ({{0}})'.format(
+        qn(queryset.model._meta.db_table), qn(queryset.model._meta.pk.column))
+    pks = queryset.values_list('pk', flat=True)
+    count = 0
+    while True:
+        batch = list(pks[:batch_size])
+        if not batch:
+            return count
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(', '.join(['%s'] * len(batch))), batch)
+        count += len(batch)
+
+
+def encode_cursor(cursor):
+    """
+    Returns the opaque token of a ``(start, event_id)`` cursor, e.g. of
+    ``Event.objects.get_upcoming_occurrences``.
+
+    """
+    start, event_id = cursor
+    value = '{0}:{1}'.format(
+        start.astimezone(timezone.utc).strftime(CURSOR_FORMAT), event_id)
+    return urlsafe_base64_encode(value.encode('utf-8'))
+
+
+def decode_cursor(token):
+    """
+    Returns the ``(start, event_id)`` cursor of a token.
+
+    :raises ValueError: If the token is invalid.
+
+    """
+    try:
+        value = urlsafe_base64_decode(token).decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError('Invalid cursor: {0}'.format(token))
+    start, _, event_id = value.partition(':')
+    return (
+        timezone.datetime.strptime(start, CURSOR_FORMAT).replace(
+            tzinfo=timezone.utc),
+        int(event_id))
+
+
+# numbers, that stand in for the URL arguments, when a pattern is reversed
+URL_SENTINEL = 918273640
+
+
+@lru_cache(maxsize=256)
+def _get_url_pattern(viewname, names, prefix, urlconf, language):
+    # the language is part of the key for the URL prefixes of i18n_patterns
+    sentinels = [
+        (name, str(URL_SENTINEL + index)) for index, name in enumerate(names)]
+    url = reverse(viewname, urlconf=urlconf, kwargs=dict(sentinels))
+    url = url.replace('{', '{{').replace('}', '}}')
+    for name, sentinel in sentinels:
+        url = url.replace(sentinel, '{{{0}}}'.format(name))
+    return url
+
+
+def format_url(viewname, **kwargs):
+    """
+    Returns the same URL as ``reverse(viewname, kwargs=kwargs)``, but only
+    reverses the URL pattern once and formats it with the given numbers from
+    then on.
+
+    All arguments have to be positive integers, like the pks and dates of the
+    calendar URLs, e.g. ``format_url('calendar_day', year=2016, month=2,
+    day=1)``, or slugs, like the ``calendar`` of the scoped URLs.
+
+    """
+    for name, value in kwargs.items():
+        if isinstance(value, str):
+            kwargs[name] = quote(value)
+    return _get_url_pattern(
+        viewname, tuple(sorted(kwargs)), get_script_prefix(), get_urlconf(),
+        translation.get_language()).format(**kwargs)
+
+
 def monday_of_week(year, week):
     """
     Returns a datetime for the monday of the given week of the given year.
@@ -40,6 +164,178 @@ def monday_of_week(year, week):
     return date
 
 
+def get_read_db(using=None):
+    """
+    Returns the database alias, that read-only calendar queries should use.
+
+    An explicitly given ``using`` always wins. Otherwise the
+    ``CALENDARIUM_READ_DB`` setting is used, unless the current thread has
+    recently written and reads are pinned to the primary database (see
+    ``pin_reads_to_primary``). ``None`` leaves the decision to the database
+    routers.
+
+    """
+    if using:
+        return using
+    if get_pinned_until() > time.time():
+        return DEFAULT_DB_ALIAS
+    return calendarium_settings.READ_DB
+
+
+def pin_reads_to_primary(until=None):
+    """
+    Routes the reads of the current thread to the primary database.
+
+    The pin lasts for ``CALENDARIUM_PIN_READS_AFTER_WRITE`` seconds, so that
+    the data written right before is not read back from a lagging replica.
+    It only covers the reads of the same thread, i.e. of the same request.
+    Add ``calendarium.middleware.PinReadsMiddleware`` to keep the following
+    requests of the same client pinned as well.
+
+    :param until: Optional timestamp to set the end of the pin to, e.g. the
+        one of a client. ``0`` removes the pin.
+
+    """
+    if until is not None:
+        _local.pinned_until = until
+    elif calendarium_settings.PIN_READS_AFTER_WRITE:
+        _local.pinned_until = (
+            time.time() + calendarium_settings.PIN_READS_AFTER_WRITE)
+
+
+def get_pinned_until():
+    """
+    Returns the timestamp, until which the reads of the current thread are
+    pinned to the primary database, or ``0``.
+
+    """
+    return getattr(_local, 'pinned_until', 0)
+
+
+def _get_cache_version(scope):
+    key = 'calendarium_version_{0}'.format(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _bump_cache_version(scope):
+    key = 'calendarium_version_{0}'.format(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def get_occurrences_cache_key(calendar_pk, *args):
+    """
+    Returns the cache key for a set of occurrences of one calendar.
+
+    The key contains a version for the calendar, so invalidating the cache of
+    one calendar never touches the cached occurrences of any other calendar.
+
+    :param calendar_pk: The pk of the ``Calendar`` or ``None`` for queries,
+        that are not scoped by a calendar.
+    :param args: Anything else, that identifies the query, e.g. its period.
+
+    """
+    scope = calendar_pk or 'all'
+    query = '_'.join([str(arg) for arg in args]).encode('utf-8')
+    return 'calendarium_occurrences_{0}_{1}_{2}_{3}'.format(
+        scope, _get_cache_version('global'), _get_cache_version(scope),
+        hashlib.md5(query).hexdigest())
+
+
+def invalidate_occurrence_cache(calendar_pk=None, everything=False):
+    """
+    Invalidates the cached occurrences of one calendar.
+
+    The cached occurrences of queries, that are not scoped by a calendar, are
+    always invalidated, since they contain the events of all calendars.
+
+    :param calendar_pk: The pk of the ``Calendar``, whose events have changed.
+    :param everything: If ``True``, the cached occurrences of all calendars
+        are invalidated, e.g. when a ``Rule`` has changed.
+
+    """
+    deferred = getattr(_local, 'deferred_invalidations', None)
+    if deferred is not None:
+        deferred.add((calendar_pk, everything))
+        return
+    _bump_cache_version('all')
+    if calendar_pk:
+        _bump_cache_version(calendar_pk)
+    if everything:
+        _bump_cache_version('global')
+
+
+@contextmanager
+def defer_occurrence_cache_invalidation():
+    """
+    Collects the cache invalidations inside of the block and runs each of
+    them only once at its end, e.g. while a bulk import saves many objects.
+
+    """
+    if getattr(_local, 'deferred_invalidations', None) is not None:
+        yield
+        return
+    _local.deferred_invalidations = set()
+    try:
+        yield
+    finally:
+        deferred = _local.deferred_invalidations
+        _local.deferred_invalidations = None
+        if any(everything for calendar_pk, everything in deferred):
+            invalidate_occurrence_cache(everything=True)
+        else:
+            for calendar_pk in set(pk for pk, everything in deferred):
+                invalidate_occurrence_cache(calendar_pk)
+
+
+def is_next_occurrence_update_skipped(event_pk):
+    """
+    Returns ``True``, if ``next_occurrence_start`` of the event with the
+    given pk is currently not updated on changes of its occurrences.
+
+    """
+    return event_pk in getattr(_local, 'skipped_updates', {})
+
+
+def skip_next_occurrence_update(event_pk, skip=True):
+    """
+    Starts or, if ``skip`` is ``False``, stops skipping the updates of
+    ``next_occurrence_start`` of the event with the given pk.
+
+    Calls are counted, so that nested blocks of the same event work.
+
+    """
+    skipped = getattr(_local, 'skipped_updates', None)
+    if skipped is None:
+        skipped = _local.skipped_updates = {}
+    count = skipped.get(event_pk, 0) + (1 if skip else -1)
+    if count > 0:
+        skipped[event_pk] = count
+    else:
+        skipped.pop(event_pk, None)
+
+
+@contextmanager
+def skip_next_occurrence_updates(event_pk):
+    """
+    Skips the updates of ``next_occurrence_start`` of the given event inside
+    of the block, e.g. while many of its occurrences are deleted and the
+    event is saved afterwards anyway.
+
+    """
+    skip_next_occurrence_update(event_pk)
+    try:
+        yield
+    finally:
+        skip_next_occurrence_update(event_pk, skip=False)
+
+
 class OccurrenceReplacer(object):
     """
     When getting a list of occurrences, the last thing that needs to be done
@@ -1,14 +1,28 @@
 """Views for the ``calendarium`` app."""
-import calendar
+import hashlib
+import json
+import logging
+from itertools import groupby
+from operator import attrgetter
+
 from dateutil.relativedelta import relativedelta
 
 from django.contrib.auth.decorators import permission_required
 from django.urls import reverse
 from django.forms.models import model_to_dict
-from django.http import Http404, HttpResponseRedirect
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
 from django.utils.timezone import datetime, now, timedelta, utc
-from django.utils.translation import ugettext_lazy as _
+from django.views.decorators.gzip import gzip_page
 from django.views.generic import (
     CreateView,
     DeleteView,
@@ -17,49 +31,150 @@ from django.views.generic import (
     RedirectView,
     TemplateView,
     UpdateView,
+    View,
 )
 
+from . import ics
 from .constants import OCCURRENCE_DECISIONS
 from .forms import OccurrenceForm
-from .models import EventCategory, Event, Occurrence
-from .settings import SHIFT_WEEKSTART
-from .utils import monday_of_week
+from .grid import (
+    OccurrenceGrid,
+    get_grid_categories,
+    get_month_skeleton,
+    get_weekday_headers,
+    render_month_grid,
+)
+from .models import (
+    ArchivedEvent,
+    Calendar,
+    Change,
+    EventCategory,
+    Event,
+    Occurrence,
+    get_category_filter,
+)
+from .settings import (
+    CACHE_TIMEOUT,
+    CELL_LIMIT,
+    CHANGE_LOG,
+    FAST_GRID,
+    SHIFT_WEEKSTART,
+)
+from .utils import (
+    decode_cursor,
+    encode_cursor,
+    get_occurrences_cache_key,
+    get_read_db,
+    monday_of_week,
+)
+
+
+logger = logging.getLogger(__name__)
 
 
 class CategoryMixin(object):
-    """Mixin to handle category filtering by category id."""
+    """
+    Mixin to handle category filtering by category id and the scoping by the
+    calendar slug in the URL.
+
+    The ``category`` parameter may be repeated to show the occurrences of
+    several categories at once, e.g. ``?category=1&category=2``.
+
+    :using: Optional database alias for the read-only queries of the view.
+        Defaults to the ``CALENDARIUM_READ_DB`` setting.
+
+    """
+    using = None
+
     def dispatch(self, request, *args, **kwargs):
-        if request.GET.get('category'):
+        self.calendar = None
+        if kwargs.get('calendar'):
+            try:
+                self.calendar = Calendar.objects.using(
+                    get_read_db(self.using)).get(slug=kwargs.get('calendar'))
+            except Calendar.DoesNotExist:
+                raise Http404
+        category_ids = []
+        for value in request.GET.getlist('category'):
             try:
-                category_id = int(request.GET.get('category'))
+                category_ids.append(int(value))
             except ValueError:
                 pass
-            else:
-                try:
-                    self.category = EventCategory.objects.get(pk=category_id)
-                except EventCategory.DoesNotExist:
-                    pass
+        if category_ids:
+            self.categories = list(EventCategory.objects.using(
+                get_read_db(self.using)).filter(pk__in=category_ids))
+            if len(self.categories) == 1:
+                self.category = self.categories[0]
         return super(CategoryMixin, self).dispatch(request, *args, **kwargs)
 
+    def get_categories(self):
+        """Returns the list of categories to filter by or ``None``."""
+        return getattr(self, 'categories', None) or None
+
     def get_category_context(self, **kwargs):
-        context = {'categories': EventCategory.objects.all()}
+        context = {'categories': EventCategory.objects.using(
+            get_read_db(self.using))}
         if hasattr(self, 'category'):
             context.update({'current_category': self.category})
+        if self.get_categories():
+            context.update({'current_categories': self.get_categories()})
+        if self.calendar:
+            context.update({'current_calendar': self.calendar})
         return context
 
 
+class GridMixin(CategoryMixin):
+    """
+    Mixin for the grid views, that limits the amount of occurrences shown in
+    each cell.
+
+    :cell_limit: The maximum amount of occurrences of a cell. Further ones
+        are loaded from the day view on demand. ``0`` shows all of them.
+        Defaults to the ``CALENDARIUM_CELL_LIMIT`` setting.
+
+    """
+    cell_limit = None
+
+    def get_cell_limit(self):
+        if self.cell_limit is None:
+            return CELL_LIMIT
+        return self.cell_limit
+
+    def get_cell(self, grid, date):
+        """Returns the ``GridCell`` of the given date."""
+        cell = grid.get_cell(date, self.get_cell_limit())
+        if cell.more:
+            kwargs = {'year': date.year, 'month': date.month, 'day': date.day}
+            if self.calendar:
+                kwargs['calendar'] = self.calendar.slug
+            query = [('offset', len(cell))] + [
+                ('category', category.pk)
+                for category in self.get_categories() or []]
+            cell.more_url = '{0}?{1}'.format(
+                reverse('calendar_day', kwargs=kwargs), urlencode(query))
+        return cell
+
+
 class CalendariumRedirectView(RedirectView):
     """View to redirect to the current month view."""
     permanent = False
 
     def get_redirect_url(self, **kwargs):
-        return reverse('calendar_month', kwargs={'year': now().year,
-                                                 'month': now().month})
+        kwargs.update({'year': now().year, 'month': now().month})
+        return reverse('calendar_month', kwargs=kwargs)
+
+
+class MonthView(GridMixin, TemplateView):
+    """
+    View to return all occurrences of an event for a whole month.
 
+    :fast_render: If ``True``, the grid is rendered by ``render_month_grid``
+        instead of the ``partials/calendar_month_grid.html`` template.
+        Defaults to the ``CALENDARIUM_FAST_GRID`` setting.
 
-class MonthView(CategoryMixin, TemplateView):
-    """View to return all occurrences of an event for a whole month."""
+    """
     template_name = 'calendarium/calendar_month.html'
+    fast_render = None
 
     def dispatch(self, request, *args, **kwargs):
         self.month = int(kwargs.get('month'))
@@ -88,48 +203,114 @@ class MonthView(CategoryMixin, TemplateView):
         return super(MonthView, self).dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
-        firstweekday = 0 + SHIFT_WEEKSTART
-        while firstweekday < 0:
-            firstweekday += 7
-        while firstweekday > 6:
-            firstweekday -= 7
-
         ctx = self.get_category_context()
-        month = [[]]
-        week = 0
         start = datetime(year=self.year, month=self.month, day=1, tzinfo=utc)
-        end = datetime(
-            year=self.year, month=self.month, day=1, tzinfo=utc
-        ) + relativedelta(months=1)
-
+        end = start + relativedelta(months=1)
         all_occurrences = Event.objects.get_occurrences(
-            start, end, ctx.get('current_category'))
-        cal = calendar.Calendar()
-        cal.setfirstweekday(firstweekday)
-        for day in cal.itermonthdays(self.year, self.month):
-            current = False
-            if day:
-                date = datetime(year=self.year, month=self.month, day=day,
-                                tzinfo=utc)
-                occurrences = filter(
-                    lambda occ, date=date: occ.start.replace(
-                        hour=0, minute=0, second=0, microsecond=0) == date,
-                    all_occurrences)
-                if date.date() == now().date():
-                    current = True
-            else:
-                occurrences = []
-            month[week].append((day, occurrences, current))
-            if len(month[week]) == 7:
-                month.append([])
-                week += 1
-        calendar.setfirstweekday(firstweekday)
-        weekdays = [_(header) for header in calendar.weekheader(10).split()]
-        ctx.update({'month': month, 'date': date, 'weekdays': weekdays})
+            start, end, self.get_categories(), using=self.using,
+            calendar=self.calendar)
+        grid = OccurrenceGrid(all_occurrences, start, end)
+        month = []
+        for days in get_month_skeleton(self.year, self.month):
+            week = []
+            for day in days:
+                current = False
+                if day:
+                    date = start.replace(day=day)
+                    occurrences = self.get_cell(grid, date)
+                    current = grid.is_today(date)
+                else:
+                    occurrences = []
+                week.append((day, occurrences, current))
+            month.append(week)
+        ctx.update({
+            'month': month,
+            'date': date,
+            'weekdays': get_weekday_headers(),
+            'grid_categories': get_grid_categories(all_occurrences),
+        })
+        fast_render = self.fast_render
+        if fast_render is None:
+            fast_render = FAST_GRID
+        if fast_render:
+            ctx['month_grid'] = render_month_grid(
+                month, date, ctx['weekdays'], ctx['grid_categories'],
+                calendar=self.calendar)
         return ctx
 
 
-class WeekView(CategoryMixin, TemplateView):
+class YearView(CategoryMixin, TemplateView):
+    """
+    View to return the amount of occurrences of each day of a whole year.
+
+    All occurrences of the year are expanded at once and bucketed by the
+    same grid as the month view, so the year costs the same queries as a
+    single month.
+
+    """
+    template_name = 'calendarium/calendar_year.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.year = int(kwargs.get('year'))
+        if not 1 <= self.year <= 9998:
+            raise Http404
+        if request.method == 'POST':
+            if request.POST.get('next'):
+                kwargs.update({'year': self.year + 1})
+                return HttpResponseRedirect(
+                    reverse('calendar_year', kwargs=kwargs))
+            elif request.POST.get('previous'):
+                kwargs.update({'year': self.year - 1})
+                return HttpResponseRedirect(
+                    reverse('calendar_year', kwargs=kwargs))
+            elif request.POST.get('today'):
+                kwargs.update({'year': now().year})
+                return HttpResponseRedirect(
+                    reverse('calendar_year', kwargs=kwargs))
+        if request.is_ajax():
+            self.template_name = 'calendarium/partials/calendar_year.html'
+        return super(YearView, self).dispatch(request, *args, **kwargs)
+
+    def get_day(self, grid, date):
+        """
+        Returns the day number, the amount of occurrences, the distinct
+        colors of their categories and whether it is today as tuple.
+
+        """
+        occurrences = grid.get_occurrences(date)
+        colors = []
+        for occurrence in occurrences:
+            category = occurrence.event.category
+            if category and category.color not in colors:
+                colors.append(category.color)
+        return date.day, len(occurrences), colors, grid.is_today(date)
+
+    def get_context_data(self, **kwargs):
+        ctx = self.get_category_context()
+        start = datetime(year=self.year, month=1, day=1, tzinfo=utc)
+        end = start + relativedelta(years=1)
+        grid = OccurrenceGrid(Event.objects.get_occurrences(
+            start, end, self.get_categories(), using=self.using,
+            calendar=self.calendar), start, end)
+        months = []
+        for month in range(1, 13):
+            date = start.replace(month=month)
+            weeks = []
+            for days in get_month_skeleton(self.year, month):
+                weeks.append([
+                    self.get_day(grid, date.replace(day=day)) if day
+                    else (0, 0, [], False) for day in days])
+            months.append((date, weeks))
+        ctx.update({
+            'months': months,
+            'date': start,
+            'year': self.year,
+            'weekdays': get_weekday_headers(),
+        })
+        return ctx
+
+
+class WeekView(GridMixin, TemplateView):
     """View to return all occurrences of an event for one week."""
     template_name = 'calendarium/calendar_week.html'
 
@@ -171,19 +352,20 @@ class WeekView(CategoryMixin, TemplateView):
         start = date
         end = date + relativedelta(days=7 + SHIFT_WEEKSTART)
         all_occurrences = Event.objects.get_occurrences(
-            start, end, ctx.get('current_category'))
+            start, end, self.get_categories(), using=self.using,
+            calendar=self.calendar)
+        grid = OccurrenceGrid(all_occurrences, start, end)
         while day < 7 + SHIFT_WEEKSTART:
-            current = False
-            occurrences = filter(
-                lambda occ, date=date: occ.start.replace(
-                    hour=0, minute=0, second=0, microsecond=0) == date,
-                all_occurrences)
-            if date.date() == now().date():
-                current = True
-            week.append((date, occurrences, current))
+            week.append((
+                date, self.get_cell(grid, date), grid.is_today(date)))
             day += 1
             date = date + timedelta(days=1)
-        ctx.update({'week': week, 'date': date, 'week_nr': self.week})
+        ctx.update({
+            'week': week,
+            'date': date,
+            'week_nr': self.week,
+            'grid_categories': get_grid_categories(all_occurrences),
+        })
         return ctx
 
 
@@ -230,18 +412,45 @@ class DayView(CategoryMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = self.get_category_context()
-        occurrences = Event.objects.get_occurrences(
-            self.date, self.date, ctx.get('current_category'))
+        grid = OccurrenceGrid(Event.objects.get_occurrences(
+            self.date, self.date, self.get_categories(),
+            using=self.using, calendar=self.calendar),
+            self.date, self.date + timedelta(days=1))
+        occurrences = grid.get_occurrences(self.date)
+        if self.request.is_ajax():
+            # only the occurrences, that didn't fit into the cell of a grid
+            try:
+                occurrences = occurrences[
+                    max(int(self.request.GET.get('offset', 0)), 0):]
+            except ValueError:
+                pass
         ctx.update({
             'date': self.date,
-            'occurrences': filter(
-                lambda occ, date=self.date: occ.start.replace(
-                    hour=0, minute=0, second=0, microsecond=0) == self.date,
-                occurrences),
+            'occurrences': occurrences,
         })
         return ctx
 
 
+class ArchiveView(CategoryMixin, ListView):
+    """Read-only view to list the archived events."""
+    model = ArchivedEvent
+    paginate_by = 20
+
+    def get_context_data(self, **kwargs):
+        ctx = super(ArchiveView, self).get_context_data(**kwargs)
+        ctx.update(self.get_category_context())
+        return ctx
+
+    def get_queryset(self):
+        qs = ArchivedEvent.objects.using(
+            get_read_db(self.using)).select_related('category')
+        if self.calendar:
+            qs = qs.filter(calendar=self.calendar)
+        if self.get_categories():
+            qs = qs.filter(get_category_filter(self.get_categories()))
+        return qs.order_by('-start')
+
+
 class EventDetailView(DetailView):
     """View to return information of an event."""
     model = Event
@@ -272,6 +481,12 @@ class EventCreateView(EventMixin, CreateView):
 
 class EventDeleteView(EventMixin, DeleteView):
     """View to delete an event."""
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        success_url = self.get_success_url()
+        self.object.delete_series()
+        return HttpResponseRedirect(success_url)
+
     def get_success_url(self):
         return reverse('calendar_current_month')
 
@@ -281,8 +496,11 @@ class OccurrenceViewMixin(object):
     form_class = OccurrenceForm
 
     def dispatch(self, request, *args, **kwargs):
+        events = Event.objects.all()
+        if kwargs.get('calendar'):
+            events = events.filter(calendar__slug=kwargs.get('calendar'))
         try:
-            self.event = Event.objects.get(pk=kwargs.get('pk'))
+            self.event = events.get(pk=kwargs.get('pk'))
         except Event.DoesNotExist:
             raise Http404
         year = int(kwargs.get('year'))
@@ -292,21 +510,10 @@ class OccurrenceViewMixin(object):
             date = datetime(year, month, day, tzinfo=utc)
         except (TypeError, ValueError):
             raise Http404
-        # this should retrieve the one single occurrence, that has a
-        # matching start date
-        try:
-            occ = Occurrence.objects.get(
-                start__year=year, start__month=month, start__day=day)
-        except Occurrence.DoesNotExist:
-            occ_gen = self.event.get_occurrences(self.event.start)
-            occ = next(occ_gen)
-            while occ.start.date() < date.date():
-                occ = next(occ_gen)
-        if occ.start.date() == date.date():
-            self.occurrence = occ
-        else:
+        occ = self.event.get_occurrence(date)
+        if occ is None:
             raise Http404
-        self.object = occ
+        self.occurrence = self.object = occ
         return super(OccurrenceViewMixin, self).dispatch(
             request, *args, **kwargs)
 
@@ -358,36 +565,411 @@ class OccurrenceUpdateView(OccurrenceViewMixin, UpdateView):
 
 
 class UpcomingEventsAjaxView(CategoryMixin, ListView):
+    """
+    Renders the upcoming occurrences as agenda list, one page at a time.
+
+    The ``cursor`` parameter holds the opaque token of the last occurrence of
+    the previous page, as given by the ``next_cursor`` of the context.
+
+    """
     template_name = 'calendarium/partials/upcoming_events.html'
     context_object_name = 'occurrences'
+    page_size = 20
 
     def dispatch(self, request, *args, **kwargs):
         if request.GET.get('category'):
-            self.category = EventCategory.objects.get(
-                slug=request.GET.get('category'))
+            self.category = EventCategory.objects.using(
+                get_read_db(self.using)).get(slug=request.GET.get('category'))
         else:
             self.category = None
         if request.GET.get('count'):
             self.count = int(request.GET.get('count'))
         else:
             self.count = None
+        self.cursor = None
+        if request.GET.get('cursor'):
+            try:
+                self.cursor = decode_cursor(request.GET.get('cursor'))
+            except ValueError:
+                raise Http404
         return super(UpcomingEventsAjaxView, self).dispatch(
             request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         ctx = super(UpcomingEventsAjaxView, self).get_context_data(**kwargs)
         ctx.update(self.get_category_context(**kwargs))
-        ctx.update({'show_excerpt': True, })
+        ctx.update({
+            'show_excerpt': True,
+            'agenda': [
+                (date, list(occurrences)) for date, occurrences in groupby(
+                    self.object_list,
+                    lambda occ: occ.start.astimezone(utc).date())],
+            'count': self.count,
+            'next_cursor': (
+                encode_cursor(self.next_cursor) if self.next_cursor else None),
+        })
         return ctx
 
     def get_queryset(self):
-        qs_kwargs = {
-            'start': now(),
-            'end': now() + timedelta(365),
+        occurrences, self.next_cursor = (
+            Event.objects.get_upcoming_occurrences(
+                self.count or self.page_size, cursor=self.cursor,
+                category=self.category, using=self.using,
+                calendar=self.calendar))
+        return occurrences
+
+
+def parse_feed_date(value):
+    """
+    Returns the aware datetime of a ``start`` or ``end`` parameter, which may
+    be a date or an ISO 8601 datetime. Naive values are taken as UTC.
+
+    """
+    try:
+        date = parse_datetime(value or '')
+        if date is None:
+            day = parse_date(value or '')
+            if day is None:
+                return None
+            date = datetime(day.year, day.month, day.day)
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=utc)
+    return date
+
+
+@method_decorator(gzip_page, name='dispatch')
+class OccurrenceFeedView(CategoryMixin, View):
+    """
+    Returns the occurrences of the ``start`` to ``end`` period as JSON list,
+    with the fields of FullCalendar's event objects.
+
+    The list is streamed while the series are expanded, so even large periods
+    never have to be held in memory. The response is compressed for clients,
+    that accept gzip. If ``CALENDARIUM_CACHE_TIMEOUT`` is set, the versions
+    of the occurrence cache are used as ETag, so that unchanged feeds are
+    answered with ``304 Not Modified``.
+
+    """
+    def get(self, request, *args, **kwargs):
+        self.start = parse_feed_date(request.GET.get('start'))
+        self.end = parse_feed_date(request.GET.get('end'))
+        if self.start is None or self.end is None or self.end <= self.start:
+            return HttpResponseBadRequest(
+                'Valid start and end parameters are required.')
+        etag = self.get_etag()
+        if etag:
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+        response = StreamingHttpResponse(
+            self.iter_json(), content_type='application/json')
+        if etag:
+            response['ETag'] = etag
+        return response
+
+    def get_etag(self):
+        """
+        Returns the ETag of the feed or ``None``, if changes can't be told.
+
+        The cache versions are only maintained, if the occurrence cache is
+        enabled.
+
+        """
+        if not CACHE_TIMEOUT:
+            return None
+        cache_key = get_occurrences_cache_key(
+            self.calendar.pk if self.calendar else None, 'feed',
+            self.start.isoformat(), self.end.isoformat(),
+            sorted(category.pk for category in self.get_categories() or []))
+        return '"{0}"'.format(hashlib.md5(
+            cache_key.encode('utf-8')).hexdigest())
+
+    def get_item(self, occurrence):
+        """Returns the FullCalendar event object of an occurrence."""
+        event = occurrence.event
+        item = {
+            'id': '{0}_{1}'.format(
+                event.pk, occurrence.original_start.isoformat()),
+            'groupId': event.pk,
+            'title': occurrence.title,
+            'start': occurrence.start,
+            'end': occurrence.end,
+            'allDay': False,
+            'url': occurrence.get_absolute_url(),
+        }
+        if event.category:
+            item['color'] = '#{0}'.format(event.category.color)
+        return item
+
+    def iter_json(self):
+        yield '['
+        occurrences = Event.objects.iter_occurrences(
+            self.start, self.end, category=self.get_categories(),
+            using=self.using, calendar=self.calendar)
+        for index, occurrence in enumerate(occurrences):
+            yield '{0}{1}'.format(',' if index else '', json.dumps(
+                self.get_item(occurrence), cls=DjangoJSONEncoder))
+        yield ']'
+
+
+def iter_series(events, using=None):
+    """
+    Yields each of the given events with the list of its persisted
+    occurrences.
+
+    Events and occurrences are read by two iterators ordered by the pk of the
+    event and merged, so neither of them is held in memory at once.
+
+    """
+    events = events.order_by('pk')
+    occurrences = Occurrence.objects.using(using).filter(
+        event__in=events.values('pk')).order_by('event_id', 'original_start')
+    overrides = groupby(occurrences.iterator(), attrgetter('event_id'))
+    pending = next(overrides, None)
+    for event in events.iterator():
+        while pending and pending[0] < event.pk:
+            pending = next(overrides, None)
+        if pending and pending[0] == event.pk:
+            yield event, list(pending[1])
+            pending = next(overrides, None)
+        else:
+            yield event, []
+
+
+@method_decorator(gzip_page, name='dispatch')
+class ICalendarFeedView(CategoryMixin, View):
+    """
+    Returns the events of a calendar or a category as iCalendar file, e.g. to
+    subscribe to them with any calendar client.
+
+    Each event is written as one VEVENT with its RRULE and EXDATEs. Persisted
+    occurrences of a series become VEVENTs with a RECURRENCE-ID, cancelled
+    ones EXDATEs. Occurrences are never expanded, so the size of the file
+    grows with the amount of series only. It is streamed event by event.
+
+    Rules, that have no RRULE equivalent, are written as RDATEs of their
+    starts instead. Series without an end are written up to
+    ``rdate_horizon`` ahead then.
+
+    """
+    rdate_horizon = timedelta(days=366)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.feed_category = None
+        if kwargs.get('category'):
+            try:
+                self.feed_category = EventCategory.objects.using(get_read_db(
+                    self.using)).get(slug=kwargs.get('category'))
+            except EventCategory.DoesNotExist:
+                raise Http404
+            self.categories = [self.feed_category]
+        return super(ICalendarFeedView, self).dispatch(
+            request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        feed = self.feed_category or self.calendar
+        response = StreamingHttpResponse(
+            self.iter_ics(), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="{0}.ics"'.format(
+            feed.slug if feed else 'calendar')
+        return response
+
+    def get_name(self):
+        feed = self.feed_category or self.calendar
+        return feed.name if feed else 'Calendar'
+
+    def get_events(self):
+        using = get_read_db(self.using)
+        events = Event.objects.using(using).select_related(
+            'rule', 'category')
+        if self.calendar:
+            events = events.filter(calendar=self.calendar)
+        if self.get_categories():
+            events = events.filter(get_category_filter(self.get_categories()))
+        return events.order_by('pk')
+
+    def iter_ics(self):
+        host = self.request.get_host()
+        yield ''.join([
+            ics.format_line('BEGIN', 'VCALENDAR'),
+            ics.format_line('VERSION', '2.0'),
+            ics.format_line('PRODID', '-//django-calendarium//EN'),
+            ics.format_line('CALSCALE', 'GREGORIAN'),
+            ics.format_line('X-WR-CALNAME', ics.escape(self.get_name())),
+        ])
+        for event, occurrences in iter_series(
+                self.get_events(), get_read_db(self.using)):
+            yield ''.join(self.get_event_lines(event, occurrences, host))
+        yield ics.format_line('END', 'VCALENDAR')
+
+    def get_vevent_lines(self, uid, event, start, end, title, description):
+        lines = [
+            ics.format_line('BEGIN', 'VEVENT'),
+            ics.format_line('UID', uid),
+            ics.format_line(
+                'DTSTAMP', ics.format_datetime(event.creation_date)),
+            ics.format_line('DTSTART', ics.format_datetime(start)),
+            ics.format_line('DTEND', ics.format_datetime(end)),
+            ics.format_line('SUMMARY', ics.escape(title)),
+            ics.format_line('URL', self.request.build_absolute_uri(
+                event.get_absolute_url())),
+        ]
+        if description:
+            lines.append(
+                ics.format_line('DESCRIPTION', ics.escape(description)))
+        if event.category:
+            lines.append(ics.format_line(
+                'CATEGORIES', ics.escape(event.category.name)))
+        return lines
+
+    def get_event_lines(self, event, occurrences, host):
+        """
+        Returns the lines of the VEVENTs of an event and its persisted
+        occurrences.
+
+        The persisted occurrence of an event without a rule replaces the
+        event, since there is no series to override.
+
+        """
+        uid = 'calendarium-event-{0}@{1}'.format(event.pk, host)
+        start, end = event.start, event.end
+        title, description = event.title, event.description
+        if not event.rule:
+            for occ in occurrences:
+                if occ.original_start != event.start:
+                    continue
+                if occ.cancelled:
+                    return []
+                start, end = occ.start, occ.end
+                title, description = occ.title or event.title, occ.description
+        lines = self.get_vevent_lines(
+            uid, event, start, end, title, description)
+        if event.rule:
+            try:
+                lines.append(ics.format_line('RRULE', ics.format_rrule(
+                    event.rule.frequency, event.rule.get_params(),
+                    event.end_recurring_period)))
+            except ValueError:
+                lines.extend(self.get_rdate_lines(event))
+            exdates = set(event.get_exdates()) | set(
+                occ.original_start for occ in occurrences if occ.cancelled)
+            if exdates:
+                lines.append(ics.format_line('EXDATE', ','.join(
+                    ics.format_datetime(date) for date in sorted(exdates))))
+        lines.append(ics.format_line('END', 'VEVENT'))
+        for occ in occurrences if event.rule else []:
+            if occ.cancelled:
+                continue
+            lines.extend(self.get_vevent_lines(
+                uid, event, occ.start, occ.end, occ.title or event.title,
+                occ.description))
+            lines.append(ics.format_line(
+                'RECURRENCE-ID', ics.format_datetime(occ.original_start)))
+            lines.append(ics.format_line('END', 'VEVENT'))
+        return lines
+
+    def get_rdate_lines(self, event):
+        """
+        Returns the RDATE line with the starts of a series, whose rule can't
+        be written as RRULE.
+
+        """
+        until = event.end_recurring_period
+        if until is None and 'count' not in event.rule.get_params():
+            until = now() + self.rdate_horizon
+            logger.warning(
+                'The rule of event %s has no RRULE equivalent and no end, so'
+                ' only its starts up to %s are written.', event.pk, until)
+        rr = event.get_rrule_object()
+        if until is None:
+            dates = list(rr)
+        else:
+            dates = rr.between(event.start, until, inc=True)
+        dates = [date for date in dates if date != event.start]
+        if not dates:
+            return []
+        return [ics.format_line('RDATE', ','.join(
+            ics.format_datetime(date) for date in dates))]
+
+
+@method_decorator(gzip_page, name='dispatch')
+class SyncView(CategoryMixin, View):
+    """
+    Returns the events, that have changed since the given ``token``, with
+    their persisted occurrences as JSON, in the spirit of the CalDAV
+    sync-collection report.
+
+    The response holds the ``token`` for the next request, the events and
+    the pks of the ``deleted`` ones. Without a token, or if the whole
+    calendar has changed since, all events are returned and ``full`` is
+    ``true``. Requires ``CALENDARIUM_CHANGE_LOG``.
+
+    The token isn't ordered by commits, see ``Change``, so clients should
+    make a full sync from time to time.
+
+    """
+    def get(self, request, *args, **kwargs):
+        if not CHANGE_LOG:
+            raise Http404
+        using = get_read_db(self.using)
+        latest = Change.objects.get_token(using=using)
+        token = request.GET.get('token')
+        changed = None
+        if token:
+            try:
+                token = int(token)
+            except ValueError:
+                token = -1
+            if not 0 <= token <= latest:
+                return HttpResponseBadRequest('Invalid sync token.')
+            changed = Change.objects.get_changed_events(
+                token, latest, calendar=self.calendar, using=using)
+        events = Event.objects.using(using).select_related('rule', 'category')
+        if self.calendar:
+            events = events.filter(calendar=self.calendar)
+        deleted = []
+        if changed is not None:
+            events = events.filter(pk__in=changed)
+            deleted = sorted(changed - set(
+                events.values_list('pk', flat=True)))
+        return StreamingHttpResponse(
+            self.iter_json(latest, changed is None, deleted, events),
+            content_type='application/json')
+
+    def get_item(self, event, occurrences):
+        """Returns the JSON object of an event and its occurrences."""
+        return {
+            'id': event.pk,
+            'title': event.title,
+            'description': event.description,
+            'start': event.start,
+            'end': event.end,
+            'calendar': event.calendar_id,
+            'category': event.category_id,
+            'rule': {
+                'frequency': event.rule.frequency,
+                'params': event.rule.get_params(),
+            } if event.rule else None,
+            'end_recurring_period': event.end_recurring_period,
+            'exdates': event.get_exdates(),
+            'url': self.request.build_absolute_uri(event.get_absolute_url()),
+            'overrides': [{
+                'original_start': occ.original_start,
+                'start': occ.start,
+                'end': occ.end,
+                'title': occ.title,
+                'description': occ.description,
+                'cancelled': occ.cancelled,
+            } for occ in occurrences],
         }
-        if self.category:
-            qs_kwargs.update({'category': self.category, })
-        qs = Event.objects.get_occurrences(**qs_kwargs)
-        if self.count:
-            return qs[:self.count]
-        return qs
+
+    def iter_json(self, token, full, deleted, events):
+        header = '{{"token": "{0}", "full": {1}, "deleted": {2}, "events": ['
+        yield header.format(token, json.dumps(full), json.dumps(deleted))
+        series = iter_series(events, get_read_db(self.using))
+        for index, (event, occurrences) in enumerate(series):
+            yield '{0}{1}'.format(',' if index else '', json.dumps(
+                self.get_item(event, occurrences), cls=DjangoJSONEncoder))
+        yield ']}'